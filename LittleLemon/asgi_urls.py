@@ -0,0 +1,15 @@
+"""LittleLemon URL Configuration used by asgi.py
+
+Same routes as urls.py, the API routes come from LittleLemonAPI.async_urls so the hot
+read endpoints are served by native async views.
+"""
+from django.contrib import admin
+from django.urls import path, include
+from LittleLemonAPI.views import LoginView, LogoutView
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('api/', include('LittleLemonAPI.async_urls')),
+    path('token/login/', LoginView.as_view()),
+    path('token/logout/', LogoutView.as_view()),
+]
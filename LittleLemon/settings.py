@@ -10,6 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -23,9 +26,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-%rx$*zv!5z(5lq02_f$%b70v)%q(^fr7kzltucii&$jou-u%@r'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# LITTLELEMON_DEBUG=0 runs the production profile (lean renderer set, see REST_FRAMEWORK below)
+DEBUG = os.environ.get('LITTLELEMON_DEBUG', '1') != '0'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.environ.get('LITTLELEMON_ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -45,6 +49,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # br / gzip compression of responses over COMPRESSION_MIN_SIZE, see LittleLemonAPI/middleware.py
+    'LittleLemonAPI.middleware.CompressionMiddleware',
+    # Reads of safe requests go to the read database, see LittleLemonAPI/database.py
+    'LittleLemonAPI.middleware.DatabaseRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -53,7 +61,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'LittleLemon.urls'
+# asgi.py switches to LittleLemon.asgi_urls, which serves the hot read endpoints with native async views
+ROOT_URLCONF = os.environ.get('LITTLELEMON_URLCONF', 'LittleLemon.urls')
 
 TEMPLATES = [
     {
@@ -77,13 +86,67 @@ WSGI_APPLICATION = 'LittleLemon.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# Run on every new connection, see LittleLemonAPI/database.py
+SQLITE_PRAGMAS = {
+    # In WAL mode NORMAL only syncs at checkpoints, a power loss can lose the last commits but never corrupts
+    'synchronous': 'NORMAL',
+    # Milliseconds a connection waits for the write lock before failing with "database is locked"
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Negative values are KiB: 64 MiB of page cache per connection
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# WAL (readers and the writer do not block each other) is stored in the database file, so it is opt-in:
+# LITTLELEMON_SQLITE_WAL=1 on a deployed database, the committed development database is left as is
+if os.environ.get('LITTLELEMON_SQLITE_WAL') == '1':
+    SQLITE_PRAGMAS['journal_mode'] = 'WAL'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'PRAGMAS': SQLITE_PRAGMAS,
+    },
+    # Read-only connection to the same file for the reads of safe requests
+    'read': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': 'file:%s?mode=ro' % (BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        # The journal mode is set by the primary and kept in the file
+        'PRAGMAS': {name: value for name, value in SQLITE_PRAGMAS.items() if name != 'journal_mode'},
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['LittleLemonAPI.database.ReadWriteRouter']
+READ_DATABASE = 'read'
+# Seconds a client reads from the primary after writing to its cart or orders
+READ_STICKY_SECONDS = 5
+
+# default is local to each worker process. shared is seen by every worker process of the host (a SQLite
+# deployment is a single host) and holds the state a worker must see right after another one wrote it.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('LITTLELEMON_SHARED_CACHE', BASE_DIR / 'cache'),
+    },
 }
 
+# Runs the tests against a shared cache of their own, see LittleLemon/testrunner.py
+TEST_RUNNER = 'LittleLemon.testrunner.TestRunner'
+
+# Delivered orders not updated for this many days are moved to the archive tables by
+# python manage.py archive_orders, see LittleLemonAPI/archive.py
+ORDER_ARCHIVE_DAYS = 90
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -126,25 +189,52 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-REST_FRAMEWORK = {
-    'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+# orjson encoder first, msgpack when installed, the browsable API and XML only while debugging
+RENDERER_CLASSES = ['LittleLemonAPI.renderers.FastJSONRenderer']
+if find_spec('msgpack'):
+    RENDERER_CLASSES.append('LittleLemonAPI.renderers.MessagePackRenderer')
+if DEBUG:
+    RENDERER_CLASSES += [
         'rest_framework.renderers.BrowsableAPIRenderer',
         'rest_framework_xml.renderers.XMLRenderer',
-    ],
+    ]
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': RENDERER_CLASSES,
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
+        # Opt-in signed tokens (Authorization: Bearer), see LittleLemonAPI/signedtokens.py
+        'LittleLemonAPI.authentication.SignedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         #'rest_framework.permissions.IsAuthenticated',
     ],
+    # Throttle counters are shared by every worker process, see LittleLemonAPI/throttling.py
+    'DEFAULT_THROTTLE_CLASSES': [
+        #'LittleLemonAPI.throttling.SharedAnonRateThrottle',
+        #'LittleLemonAPI.throttling.SharedUserRateThrottle',
+    ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '2/minute',
         'user': '5/minute',
+        'browse': '300/minute',
+        'checkout': '10/minute',
     }
 }
 
+# SQLite database (WAL mode) holding the shared throttle counters
+THROTTLE_DATABASE = BASE_DIR / 'throttle.sqlite3'
+
+# Smallest response body in bytes worth compressing
+COMPRESSION_MIN_SIZE = 1024
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'AUTH_HEADER_TYPES': ('Bearer',),
+}
+
 DJOSER = {
     'USER_ID_FIELD': 'username',
 }
\ No newline at end of file
@@ -0,0 +1,25 @@
+import tempfile
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+# Test runner keeping the shared cache of the test run apart
+# The shared cache is seen by every process of the host (settings.CACHES): the entries a test run writes
+# (roles of test users, read stickiness) and the clear() calls of the tests must not reach running servers.
+# The run gets its own shared cache in a temporary directory, removed at the end.
+
+class TestRunner(DiscoverRunner):
+
+  def setup_test_environment(self, **kwargs):
+    super().setup_test_environment(**kwargs)
+    self.shared_cache_directory = tempfile.TemporaryDirectory(prefix='littlelemon-cache-')
+    caches = {alias: dict(options) for alias, options in settings.CACHES.items()}
+    caches['shared']['LOCATION'] = self.shared_cache_directory.name
+    self.shared_cache_settings = override_settings(CACHES=caches)
+    self.shared_cache_settings.enable()
+
+  def teardown_test_environment(self, **kwargs):
+    self.shared_cache_settings.disable()
+    self.shared_cache_directory.cleanup()
+    super().teardown_test_environment(**kwargs)
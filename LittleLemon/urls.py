@@ -15,10 +15,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework.authtoken.views import obtain_auth_token
+from LittleLemonAPI.views import LoginView, LogoutView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('LittleLemonAPI.urls')),
-    path('token/login/', obtain_auth_token)
+    path('token/login/', LoginView.as_view()),
+    path('token/logout/', LogoutView.as_view()),
 ]
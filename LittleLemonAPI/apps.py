@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class LittlelemonapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'LittleLemonAPI'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .database import apply_pragmas
+        connection_created.connect(apply_pragmas)
+
+        from django.db.models.signals import pre_delete
+        from .models import Order
+        from .sales import remove_deleted_order_sales
+        pre_delete.connect(remove_deleted_order_sales, sender=Order)
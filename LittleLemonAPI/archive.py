@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+
+
+# Hot / cold split of the orders
+# Delivered orders not updated for settings.ORDER_ARCHIVE_DAYS days are moved with their items to
+# ArchivedOrder and ArchivedOrderItem, so Order and OrderItem only hold the recent and open orders and
+# their indexes stay small. Each batch of ids is one transaction: INSERT ... SELECT into the archive tables
+# and DELETE from the live ones, a fixed number of statements whatever the batch size.
+# Reads go through the OrderHistory and OrderHistoryItem views, which cover both, so archived orders keep
+# showing in lists, detail and order items. Archived orders are read-only, the sales rollups keep them.
+
+ARCHIVE_BATCH_SIZE = 500
+
+ORDER_COLUMNS = ['id', 'user_id', 'delivery_crew_id', 'status', 'total', 'date_created', 'date_updated']
+ORDER_ITEM_COLUMNS = ['id', 'order_id', 'menuitem_id', 'quantity', 'unit_price', 'price']
+
+
+def archive_cutoff(days=None):
+  return date.today() - timedelta(days=settings.ORDER_ARCHIVE_DAYS if days is None else days)
+
+
+# Copies the rows whose key column is in ids to the archive table, then deletes them, returns the row count
+def move_rows(model, archive_model, columns, key, ids):
+  table = connection.ops.quote_name(model._meta.db_table)
+  archive_table = connection.ops.quote_name(archive_model._meta.db_table)
+  placeholders = ', '.join(['%s'] * len(ids))
+
+  with connection.cursor() as cursor:
+    cursor.execute(
+      'INSERT INTO ' + archive_table + ' (' + ', '.join(columns) + ') SELECT ' + ', '.join(columns) +
+      ' FROM ' + table + ' WHERE ' + key + ' IN (' + placeholders + ')', ids,
+    )
+    cursor.execute('DELETE FROM ' + table + ' WHERE ' + key + ' IN (' + placeholders + ')', ids)
+    return cursor.rowcount
+
+
+# Moves the next batch of archivable orders, returns (orders, order items) moved
+def archive_batch(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+  with transaction.atomic():
+    order_ids = list(
+      Order.objects.select_for_update().filter(status=True, date_updated__lt=cutoff).order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+    if not order_ids:
+      return 0, 0
+
+    items = move_rows(OrderItem, ArchivedOrderItem, ORDER_ITEM_COLUMNS, 'order_id', order_ids)
+    orders = move_rows(Order, ArchivedOrder, ORDER_COLUMNS, 'id', order_ids)
+    return orders, items
+
+
+def archive_orders(days=None, batch_size=ARCHIVE_BATCH_SIZE):
+  cutoff = archive_cutoff(days)
+  total_orders = total_items = 0
+
+  while True:
+    orders, items = archive_batch(cutoff, batch_size)
+    if not orders:
+      return total_orders, total_items
+    total_orders += orders
+    total_items += items
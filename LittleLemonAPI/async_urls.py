@@ -0,0 +1,23 @@
+from django.urls import path
+from . import asyncviews, urls
+from .asyncviews import async_read_view
+
+
+# Routes of urls.py as served by LittleLemon/asgi.py
+# The hot read endpoints get their native async view, every other method of those routes
+# and every other route keep the DRF view.
+
+ASYNC_READ_VIEWS = {
+  'menu-items': asyncviews.menu_items,
+  'menu-items/<int:pk>': asyncviews.single_menu_item,
+  'menu-items/category': asyncviews.categories,
+  'cart/menu-items': asyncviews.cart,
+  'orders': asyncviews.orders,
+  'orders/<int:pk>': asyncviews.single_order,
+}
+
+urlpatterns = [
+  path(str(pattern.pattern), async_read_view(ASYNC_READ_VIEWS[str(pattern.pattern)], pattern.callback))
+  if str(pattern.pattern) in ASYNC_READ_VIEWS else pattern
+  for pattern in urls.urlpatterns
+]
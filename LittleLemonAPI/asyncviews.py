@@ -0,0 +1,272 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user
+from django.core.paginator import Paginator
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework import exceptions, status
+from rest_framework.authtoken.models import Token
+from .models import MenuItem, OrderHistory
+from .serializers import MenuItemsSerializerGet, CategorySerializer, CartItemsSerializerGet
+from .conditional import catalog_validators, not_modified, with_validators
+from .filters import MENU_ITEM_CURSOR_FIELDS, MenuFilterError
+from .fieldsets import FieldsetError, requested_fields
+from .valuesplan import read_rows, render_rows
+from .menucache import acatalog_version, menu_cache_key, aget_cached_menu, aset_cached_menu
+from .pagination import CursorError, PageError, page_rows, parse_ordering, acursor_paginate
+from .authentication import SignedTokenAuthentication
+from .signedtokens import revocations
+from .roles import arequest_roles
+from .search import fts_available
+from .renderers import FastJSONRenderer
+from .views import (
+  MENU_DEFAULT_PERPAGE, EMPTY_CART_MESSAGE, ORDER_NOT_OWNED_MESSAGE, category_queryset, menu_item_rows, menu_item_queryset,
+  cart_rows, order_serializer_class, order_list_queryset, no_orders_message, order_perpage, order_detail_queryset, order_hidden_from,
+)
+
+
+# Native async versions of the hot read endpoints, routed by async_urls.py when served with asgi.py
+# Only GET requests rendered as JSON for a token, signed token or session authenticated user are answered here.
+# Everything else (writes, other renderers, ?stream=1, failed authentication) falls through to the
+# DRF view of the same route, so bodies, status codes and error messages stay identical.
+# The querysets and parameter checks come from views.py, this module only awaits them: rows are fetched
+# with the async ORM before serializing and the read serializers never query.
+
+JSON_MEDIA_TYPES = ('application/json', '*/*')
+
+
+def async_read_view(read_view, drf_view):
+  drf_view_instance = drf_view.cls()
+  allow = ', '.join(drf_view_instance.allowed_methods)
+  fallback = sync_to_async(drf_view)
+
+  def throttled(request):
+    return not all(throttle.allow_request(request, drf_view_instance) for throttle in drf_view_instance.get_throttles())
+
+  async def view(request, *args, **kwargs):
+    if request.method == 'GET' and accepts_json(request):
+      user = await authenticate(request)
+
+      if user is not None:
+        request.user = user
+        # Throttled requests are left to the DRF view, which checks again and answers 429
+        # (rejected requests are not counted, so the second check does not count twice)
+        if await sync_to_async(throttled, thread_sensitive=False)(request):
+          return await fallback(request, *args, **kwargs)
+
+        request.accepted_media_type = JSON_MEDIA_TYPES[0]
+        try:
+          response = await read_view(request, *args, **kwargs)
+        except FieldsetError as error:
+          response = json_response(error.detail, error.status_code)
+
+        if response is not None:
+          response['Allow'] = allow
+          patch_vary_headers(response, ['Accept'])
+          return response
+
+    return await fallback(request, *args, **kwargs)
+
+  # CSRF is enforced by the SessionAuthentication of the DRF view on fallback, as for the DRF views themselves
+  view.csrf_exempt = True
+  return view
+
+
+def accepts_json(request):
+  if 'format' in request.GET:
+    return False
+
+  media_types = [media_type.strip() for media_type in request.headers.get('Accept', '').split(',') if media_type.strip()]
+  return all(media_type in JSON_MEDIA_TYPES for media_type in media_types)
+
+
+# Same outcome as the Token, SignedToken and Session authentication classes for a valid user,
+# None sends the request to the DRF view which answers with the exact authentication error
+async def authenticate(request):
+  auth = request.headers.get('Authorization', '').split()
+
+  if len(auth) == 2 and auth[0].lower() == 'bearer':
+    if revocations.due():
+      await sync_to_async(revocations.sync)()
+    try:
+      user_auth = SignedTokenAuthentication().authenticate(request)
+    except exceptions.AuthenticationFailed:
+      return None
+    return user_auth[0] if user_auth else None
+
+  if auth:
+    if len(auth) != 2 or auth[0].lower() != 'token':
+      return None
+    try:
+      token = await Token.objects.select_related('user').aget(key=auth[1])
+    except Token.DoesNotExist:
+      return None
+    user = token.user
+  else:
+    user = await sync_to_async(get_user)(request)
+
+  return user if user.is_authenticated and user.is_active else None
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+  return HttpResponse(FastJSONRenderer().render(data), status=status_code, content_type=JSON_MEDIA_TYPES[0])
+
+
+def not_found_response():
+  return json_response({'detail': exceptions.NotFound.default_detail}, status.HTTP_404_NOT_FOUND)
+
+
+# Raises PageError
+async def paginate(queryset, perpage, page):
+  paginator = Paginator(queryset, per_page=perpage)
+  # count is a cached property, filling it here keeps page() from running a synchronous COUNT
+  paginator.count = await queryset.acount()
+  rows = page_rows(paginator, page)
+  return rows if isinstance(rows, list) else [row async for row in rows]
+
+
+# http://127.0.0.1:8000/api/menu-items/category
+
+async def categories(request):
+  fields = requested_fields(CategorySerializer, request.GET)
+  catalog = await acatalog_version()
+  etag, last_modified = catalog_validators(request, 'categories', request.GET, catalog=catalog)
+  if not_modified(request, etag, last_modified):
+    return with_validators(json_response(None, status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+  categories = [category async for category in category_queryset(fields)]
+  serialized_item = CategorySerializer(categories, many=True, fields=fields)
+  return with_validators(json_response(serialized_item.data), etag, last_modified)
+
+
+# http://127.0.0.1:8000/api/menu-items
+
+async def menu_items(request):
+  fields = requested_fields(MenuItemsSerializerGet, request.GET)
+  catalog = await acatalog_version()
+  etag, last_modified = catalog_validators(request, 'menu-items', request.GET, catalog=catalog)
+  if not_modified(request, etag, last_modified):
+    return with_validators(json_response(None, status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+  cache_key = menu_cache_key('menu-items', request.GET, version=catalog[0])
+  cached_data = await aget_cached_menu(cache_key)
+  if cached_data is not None:
+    return with_validators(json_response(cached_data), etag, last_modified)
+
+  if request.GET.get('search'):
+    # The FTS lookup is memoized after one introspection query, run it outside the event loop
+    await sync_to_async(fts_available)()
+
+  try:
+    items = menu_item_rows(request.GET, fields)
+  except MenuFilterError as error:
+    return json_response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
+
+  perpage = request.GET.get('perpage', MENU_DEFAULT_PERPAGE)
+
+  if 'cursor' in request.GET:
+    try:
+      ordering_fields = parse_ordering(request.GET.get('ordering'), MENU_ITEM_CURSOR_FIELDS)
+      items, next_cursor, previous_cursor = await acursor_paginate(items, ordering_fields, request.GET.get('cursor'), perpage)
+    except CursorError as error:
+      return json_response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
+
+    data = {'next': next_cursor, 'previous': previous_cursor, 'results': render_rows(MenuItemsSerializerGet, items, fields)}
+  else:
+    try:
+      data = render_rows(MenuItemsSerializerGet, await paginate(items, perpage, request.GET.get('page', 1)), fields)
+    except PageError as error:
+      return json_response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
+
+  await aset_cached_menu(cache_key, data)
+  return with_validators(json_response(data), etag, last_modified)
+
+
+# http://127.0.0.1:8000/api/menu-items/4
+
+async def single_menu_item(request, pk):
+  fields = requested_fields(MenuItemsSerializerGet, request.GET)
+  catalog = await acatalog_version()
+  etag, last_modified = catalog_validators(request, 'menu-item', request.GET, pk=pk, catalog=catalog)
+  if not_modified(request, etag, last_modified):
+    return with_validators(json_response(None, status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+  cache_key = menu_cache_key('menu-item', request.GET, pk=pk, version=catalog[0])
+  cached_data = await aget_cached_menu(cache_key)
+  if cached_data is not None:
+    return with_validators(json_response(cached_data), etag, last_modified)
+
+  try:
+    item = await menu_item_queryset(fields).aget(pk=pk)
+  except MenuItem.DoesNotExist:
+    return not_found_response()
+
+  serialized_item = MenuItemsSerializerGet(item, fields=fields)
+  await aset_cached_menu(cache_key, serialized_item.data)
+  return with_validators(json_response(serialized_item.data), etag, last_modified)
+
+
+# http://127.0.0.1:8000/api/cart/menu-items
+
+async def cart(request):
+  fields = requested_fields(CartItemsSerializerGet, request.GET)
+  cart_items = [cart_item async for cart_item in cart_rows(request.user, fields)]
+
+  if cart_items:
+    return json_response(render_rows(CartItemsSerializerGet, cart_items, fields))
+
+  return json_response({'message': EMPTY_CART_MESSAGE})
+
+
+# http://127.0.0.1:8000/api/orders
+
+async def orders(request):
+  if request.GET.get('stream'):
+    # Streamed lists are written by the DRF view
+    return None
+
+  user_role = await arequest_roles(request)
+  serializer_class = order_serializer_class(request.GET)
+  fields = requested_fields(serializer_class, request.GET)
+  orders = order_list_queryset(request.user, user_role, serializer_class, fields)
+
+  if not await orders.aexists():
+    return json_response({'message': no_orders_message(user_role)}, status.HTTP_404_NOT_FOUND)
+
+  orders = read_rows(serializer_class, orders, fields, ['id'])
+
+  try:
+    perpage = order_perpage(request.GET)
+  except PageError as error:
+    return json_response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
+
+  if 'cursor' in request.GET:
+    try:
+      orders, next_cursor, previous_cursor = await acursor_paginate(orders, ['id'], request.GET.get('cursor'), perpage)
+    except CursorError as error:
+      return json_response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
+
+    return json_response({'next': next_cursor, 'previous': previous_cursor, 'results': render_rows(serializer_class, orders, fields)})
+
+  try:
+    return json_response(render_rows(serializer_class, await paginate(orders, perpage, request.GET.get('page', 1)), fields))
+  except PageError as error:
+    return json_response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
+
+
+# http://127.0.0.1:8000/api/orders/6
+
+async def single_order(request, pk):
+  serializer_class = order_serializer_class(request.GET)
+  fields = requested_fields(serializer_class, request.GET)
+  try:
+    order = await order_detail_queryset(serializer_class, fields).aget(pk=pk)
+  except OrderHistory.DoesNotExist:
+    return not_found_response()
+
+  user_role = await arequest_roles(request)
+
+  if order_hidden_from(request.user, user_role, order):
+    return json_response({'message': ORDER_NOT_OWNED_MESSAGE}, status.HTTP_401_UNAUTHORIZED)
+
+  serialized_item = serializer_class(order, fields=fields)
+  return json_response(serialized_item.data)
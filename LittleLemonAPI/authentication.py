@@ -0,0 +1,39 @@
+from django.contrib.auth.models import User
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from .signedtokens import ROLES_CLAIM, SESSION_CLAIM, revocations
+
+
+# Authentication with the signed access tokens of signedtokens.py: Authorization: Bearer <access>
+# The user is built from the token claims instead of being loaded, other headers are left to
+# TokenAuthentication and SessionAuthentication.
+
+class SignedTokenAuthentication(JWTAuthentication):
+
+  def get_user(self, validated_token):
+    if validated_token.get(SESSION_CLAIM) in revocations:
+      raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+
+    return token_user(validated_token)
+
+
+# Unsaved User carrying the claims: queries filtering on it, comparisons and request_roles work as
+# with a loaded user, fields that are not in the token (email, password, ...) are left empty
+def token_user(validated_token):
+  user = User(
+    id=validated_token[api_settings.USER_ID_CLAIM],
+    username=validated_token.get('username', ''),
+    is_staff=validated_token.get('is_staff', False),
+    is_superuser=validated_token.get('is_superuser', False),
+    is_active=True,
+  )
+
+  if ROLES_CLAIM in validated_token:
+    user.token_group_names = frozenset(validated_token[ROLES_CLAIM])
+
+  return user
+
+
+def is_token_user(user):
+  return hasattr(user, 'token_group_names')
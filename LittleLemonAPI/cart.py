@@ -0,0 +1,156 @@
+from decimal import Decimal
+from django.db import connection
+from django.db.models import Count, F, Sum
+from .models import Cart, CartSummary, MenuItem, Order
+
+
+# Batch add / upsert of cart lines
+# Every title is resolved with one query and all lines are written with a single
+# INSERT ... ON CONFLICT (menuitem_id, user_id) DO UPDATE, which adds to the quantity already
+# in the cart and recomputes the line price in the database. Adding N lines costs O(1) queries
+# and adding an item that is already in the cart never fails on the unique constraint.
+
+class CartLineError(ValueError):
+  pass
+
+
+# Bounds of the columns written by the upsert, checked before the SQL is built
+MAX_QUANTITY = 32767
+
+
+def max_amount(field):
+  return Decimal(10) ** (field.max_digits - field.decimal_places) - Decimal(10) ** -field.decimal_places
+
+
+MAX_LINE_PRICE = max_amount(Cart._meta.get_field('price'))
+# The cart is checked out into Order.total
+MAX_CART_TOTAL = max_amount(Order._meta.get_field('total'))
+
+
+def parse_cart_lines(data):
+  lines = data if isinstance(data, list) else data.get('items', [data])
+
+  if not isinstance(lines, list) or not lines:
+    raise CartLineError('Provide a menuitem and quantity, or a list of them')
+
+  quantities = {}
+  for line in lines:
+    if not isinstance(line, dict) or not isinstance(line.get('menuitem'), str) or not line['menuitem']:
+      raise CartLineError('Every cart line needs a menuitem title')
+    title = line['menuitem']
+
+    quantity = line.get('quantity', 1)
+    if isinstance(quantity, str) and quantity.strip().isdigit():
+      quantity = int(quantity)
+    if not isinstance(quantity, int) or isinstance(quantity, bool):
+      raise CartLineError('Invalid quantity for ' + title)
+
+    if quantity < 1:
+      raise CartLineError('Quantity must be at least 1 for ' + title)
+
+    # The same title twice in one request is merged into one line
+    quantities[title] = quantities.get(title, 0) + quantity
+    if quantities[title] > MAX_QUANTITY:
+      raise CartLineError('Quantity must be at most ' + str(MAX_QUANTITY) + ' for ' + title)
+
+  return quantities
+
+
+def resolve_menu_items(titles):
+  items = {}
+  for item_id, title, price in MenuItem.objects.filter(title__in=titles).order_by('-id').values_list('id', 'title', 'price'):
+    items[title] = (item_id, price)
+
+  missing = [title for title in titles if title not in items]
+  if missing:
+    raise CartLineError('Menu item not found: ' + ', '.join(str(title) for title in missing))
+
+  return items
+
+
+def upsert_cart_lines(user, quantities):
+  items = resolve_menu_items(list(quantities))
+  table = connection.ops.quote_name(Cart._meta.db_table)
+
+  existing = {
+    menuitem_id: (quantity, price)
+    for menuitem_id, quantity, price in Cart.objects.filter(user=user, menuitem_id__in=[item_id for item_id, price in items.values()])
+    .values_list('menuitem_id', 'quantity', 'price')
+  }
+
+  rows = []
+  params = []
+  added_lines = 0
+  added_total = Decimal(0)
+  for title, quantity in quantities.items():
+    item_id, unit_price = items[title]
+    rows.append('(%s, %s, %s, %s, %s)')
+    params += [user.id, item_id, quantity, str(unit_price), str(unit_price * quantity)]
+
+    # Same arithmetic as the ON CONFLICT clause below, used to move the cart summary
+    old_quantity, old_price = existing.get(item_id, (0, Decimal(0)))
+    if old_quantity + quantity > MAX_QUANTITY:
+      raise CartLineError('Quantity must be at most ' + str(MAX_QUANTITY) + ' for ' + title)
+    if (old_quantity + quantity) * unit_price > MAX_LINE_PRICE:
+      raise CartLineError('Price of ' + title + ' must be at most ' + str(MAX_LINE_PRICE))
+    if item_id not in existing:
+      added_lines += 1
+    added_total += (old_quantity + quantity) * unit_price - old_price
+
+  if cart_summary(user).total + added_total > MAX_CART_TOTAL:
+    raise CartLineError('Cart total must be at most ' + str(MAX_CART_TOTAL))
+
+  sql = (
+    'INSERT INTO ' + table + ' (user_id, menuitem_id, quantity, unit_price, price) VALUES ' + ', '.join(rows) +
+    ' ON CONFLICT (menuitem_id, user_id) DO UPDATE SET'
+    ' quantity = ' + table + '.quantity + excluded.quantity,'
+    ' unit_price = excluded.unit_price,'
+    ' price = ROUND((' + table + '.quantity + excluded.quantity) * excluded.unit_price, 2)'
+  )
+
+  with connection.cursor() as cursor:
+    cursor.execute(sql, params)
+
+  update_cart_summary(user, added_lines, sum(quantities.values()), added_total)
+
+  return [item_id for item_id, price in items.values()]
+
+
+# Cart summary (line count, item quantity and total) maintained next to Cart
+
+def build_cart_summary(user):
+  totals = Cart.objects.filter(user=user).aggregate(lines=Count('id'), quantity=Sum('quantity'), total=Sum('price'))
+  summary, created = CartSummary.objects.update_or_create(user=user, defaults={
+    'lines': totals['lines'],
+    'quantity': totals['quantity'] or 0,
+    'total': (totals['total'] or Decimal(0)).quantize(Decimal('0.01')),
+  })
+  return summary
+
+
+def cart_summary(user):
+  summary = CartSummary.objects.filter(user=user).first()
+  if summary is None:
+    summary = build_cart_summary(user)
+  return summary
+
+
+def update_cart_summary(user, lines, quantity, total):
+  updated = CartSummary.objects.filter(user=user).update(
+    lines=F('lines') + lines,
+    quantity=F('quantity') + quantity,
+    total=F('total') + total,
+  )
+  if not updated:
+    build_cart_summary(user)
+
+
+def clear_cart_summary(user):
+  if not CartSummary.objects.filter(user=user).update(lines=0, quantity=0, total=0):
+    CartSummary.objects.create(user=user)
+
+
+# Summaries of these users are rebuilt from Cart on their next read,
+# used when cart lines disappear through a cascade (e.g. a deleted menu item)
+def invalidate_cart_summaries(users):
+  CartSummary.objects.filter(user__in=users).delete()
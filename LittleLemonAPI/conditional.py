@@ -0,0 +1,40 @@
+import hashlib
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from .menucache import catalog_version, menu_cache_key
+
+
+# Conditional GET support for the catalog endpoints
+# ETags and Last-Modified are derived from the stored catalog version only,
+# so a 304 can be answered without loading or serializing any rows.
+
+# catalog is the (version, date_updated) pair, async callers pass the one they already loaded
+def catalog_validators(request, view_name, query_params=None, pk=None, catalog=None):
+  version, date_updated = catalog or catalog_version()
+  key = menu_cache_key(view_name, query_params, pk, version)
+  # The negotiated media type is part of the tag since JSON, XML and HTML bodies differ
+  digest = hashlib.md5((key + ':' + str(request.accepted_media_type)).encode()).hexdigest()
+  return quote_etag(digest), int(date_updated.timestamp())
+
+
+def not_modified(request, etag, last_modified):
+  if_none_match = request.headers.get('If-None-Match')
+
+  if if_none_match:
+    # Weak comparison: a compressed response carries the tag as W/"..."
+    etags = [tag.removeprefix('W/') for tag in parse_etags(if_none_match)]
+    return '*' in etags or etag in etags
+
+  if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+  return if_modified_since is not None and last_modified <= if_modified_since
+
+
+def not_modified_response(etag, last_modified):
+  return with_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+
+def with_validators(response, etag, last_modified):
+  response['ETag'] = etag
+  response['Last-Modified'] = http_date(last_modified)
+  return response
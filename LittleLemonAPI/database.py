@@ -0,0 +1,94 @@
+import hashlib
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# SQLite connection setup and read/write routing
+# Every new connection runs the PRAGMAS of its DATABASES entry (synchronous, busy_timeout, mmap, cache
+# size and WAL when opted in). Connections persist for CONN_MAX_AGE, so the pragmas run once per worker thread.
+# Reads of safe requests (GET, HEAD, OPTIONS) go to settings.READ_DATABASE, a read-only connection to
+# the same file: in WAL mode readers never wait for a checkout transaction and never block it.
+# Everything else goes to the primary: writes, reads of unsafe requests, reads inside a transaction
+# and every read of a request once it has written. A client whose cart or order write succeeded keeps
+# reading from the primary for READ_STICKY_SECONDS, so it always sees its own writes. The mark is kept
+# in the shared cache, whichever worker process serves the next request sees it.
+
+STICKY_PATHS = ('/api/cart/', '/api/orders')
+STICKY_CACHE = 'shared'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Alias the reads of the current request go to, None for the primary
+read_alias = ContextVar('read_alias', default=None)
+
+
+def apply_pragmas(sender, connection, **kwargs):
+  if connection.vendor != 'sqlite':
+    return
+  with connection.cursor() as cursor:
+    for name, value in connection.settings_dict.get('PRAGMAS', {}).items():
+      cursor.execute('PRAGMA %s = %s' % (name, value))
+
+
+def read_database():
+  alias = getattr(settings, 'READ_DATABASE', None)
+  if alias not in connections.settings:
+    return None
+  # Test runs point the read alias at the primary's database (TEST MIRROR): reads stay on the primary
+  # connection, the only one that sees the test case transaction
+  if connections.settings[alias]['NAME'] == connections.settings[DEFAULT_DB_ALIAS]['NAME']:
+    return None
+  return alias
+
+
+# Requests are told apart by their credentials: the Authorization header or the session cookie
+def client_key(request):
+  credentials = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+  if not credentials:
+    return None
+  return 'read-sticky:' + hashlib.md5(credentials.encode()).hexdigest()
+
+
+def is_sticky(request):
+  key = client_key(request)
+  return key is not None and caches[STICKY_CACHE].get(key) is not None
+
+
+def mark_sticky(request, response):
+  if request.method in SAFE_METHODS or response.status_code >= 400 or not request.path.startswith(STICKY_PATHS):
+    return
+  key = client_key(request)
+  if key is not None:
+    caches[STICKY_CACHE].set(key, True, settings.READ_STICKY_SECONDS)
+
+
+# Alias for the reads of a request, set in read_alias by DatabaseRoutingMiddleware
+def request_read_alias(request):
+  if request.method not in SAFE_METHODS:
+    return None
+  alias = read_database()
+  if alias is None or is_sticky(request):
+    return None
+  return alias
+
+
+class ReadWriteRouter:
+
+  def db_for_read(self, model, **hints):
+    alias = read_alias.get()
+    if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+      return DEFAULT_DB_ALIAS
+    return alias
+
+  def db_for_write(self, model, **hints):
+    # Reads after a write in the same request go to the primary
+    read_alias.set(None)
+    return DEFAULT_DB_ALIAS
+
+  def allow_relation(self, obj1, obj2, **hints):
+    # Both aliases are the same database
+    return True
+
+  def allow_migrate(self, db, app_label, model_name=None, **hints):
+    return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,122 @@
+import heapq
+from datetime import date
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, Q
+from rest_framework import serializers
+from .models import Order
+from .roles import DELIVERY_CREW_GROUP
+
+
+# Load balanced assignment of unassigned orders to the delivery crew
+# The open order load of every active crew member comes from one grouped query, unassigned orders are
+# locked and read with one query, then handed out one by one to the least loaded member (ties go to the
+# member with the lowest id). Orders are written with one UPDATE per crew member (per UPDATE_BATCH_SIZE
+# orders), so assigning hundreds of orders costs a number of queries that only depends on the size of the crew.
+# Must run inside a transaction.
+
+UPDATE_BATCH_SIZE = 500
+STATUS_MAX_ORDERS = 5000
+
+class DispatchError(ValueError):
+  pass
+
+
+def crew_loads():
+  return list(
+    User.objects.filter(groups__name=DELIVERY_CREW_GROUP, is_active=True)
+    .annotate(load=Count('delivery_crew', filter=Q(delivery_crew__status=False)))
+    .order_by('id')
+    .values_list('id', 'username', 'load')
+  )
+
+
+def balance(order_ids, loads):
+  heap = [(load, crew_id) for crew_id, load in loads.items()]
+  heapq.heapify(heap)
+  assignments = {crew_id: [] for crew_id in loads}
+
+  for order_id in order_ids:
+    load, crew_id = heapq.heappop(heap)
+    assignments[crew_id].append(order_id)
+    heapq.heappush(heap, (load + 1, crew_id))
+
+  return assignments
+
+
+# Returns [(username, assigned order ids, open orders after assignment)] for every crew member
+def auto_assign_orders(limit=None):
+  crew = crew_loads()
+  if not crew:
+    raise DispatchError('There are no delivery crew members to assign orders to')
+
+  orders = Order.objects.select_for_update().filter(delivery_crew__isnull=True, status=False).order_by('id').values_list('id', flat=True)
+  order_ids = list(orders[:limit] if limit else orders)
+
+  assignments = balance(order_ids, {crew_id: load for crew_id, username, load in crew})
+  for crew_id, assigned in assignments.items():
+    for start in range(0, len(assigned), UPDATE_BATCH_SIZE):
+      Order.objects.filter(id__in=assigned[start:start + UPDATE_BATCH_SIZE]).update(delivery_crew_id=crew_id, date_updated=date.today())
+
+  return [(username, assignments[crew_id], load + len(assignments[crew_id])) for crew_id, username, load in crew]
+
+
+# Bulk status update
+# Orders are updated with one UPDATE ... RETURNING id filtered on the ids and, for delivery crew, on the
+# crew member, so the role rules of SingleOrderView hold without loading the orders. Only ids that were not
+# updated are looked up again, to tell orders assigned to someone else from orders that do not exist.
+
+# SQLite integers are 64-bit
+MIN_ORDER_ID = -2 ** 63
+MAX_ORDER_ID = 2 ** 63 - 1
+
+
+# Only ints and digit strings, a float such as 1.9 is not silently read as order 1
+def parse_order_id(order_id):
+  if isinstance(order_id, str) and order_id.strip().lstrip('-').isdigit():
+    order_id = int(order_id)
+  if not isinstance(order_id, int) or isinstance(order_id, bool) or not MIN_ORDER_ID <= order_id <= MAX_ORDER_ID:
+    raise ValueError(order_id)
+  return order_id
+
+
+def parse_status_update(data):
+  # Form payloads repeat the orders field once per id
+  order_ids = data.getlist('orders') if hasattr(data, 'getlist') else data.get('orders')
+  if not isinstance(order_ids, list) or not order_ids:
+    raise DispatchError('Provide a list of order ids in orders')
+  if len(order_ids) > STATUS_MAX_ORDERS:
+    raise DispatchError('At most %d orders can be updated at once' % STATUS_MAX_ORDERS)
+
+  try:
+    # An id sent twice is only reported once
+    order_ids = list(dict.fromkeys(parse_order_id(order_id) for order_id in order_ids))
+    order_status = serializers.BooleanField().to_internal_value(data.get('status'))
+  except (TypeError, ValueError):
+    raise DispatchError('orders must be integers')
+  except serializers.ValidationError:
+    raise DispatchError('status must be 1 or 0')
+
+  return order_ids, order_status
+
+
+# Returns {order id: 'updated' | 'not_assigned_to_you' | 'not_found'}, crew limits the update to that crew member's orders
+def update_order_status(order_ids, order_status, crew=None):
+  table = connection.ops.quote_name(Order._meta.db_table)
+  sql = 'UPDATE ' + table + ' SET status = %s, date_updated = %s WHERE id IN (' + ', '.join(['%s'] * len(order_ids)) + ')'
+  params = [order_status, date.today()] + order_ids
+  if crew is not None:
+    sql += ' AND delivery_crew_id = %s'
+    params.append(crew.id)
+
+  with connection.cursor() as cursor:
+    cursor.execute(sql + ' RETURNING id', params)
+    updated = {row[0] for row in cursor.fetchall()}
+
+  missing = [order_id for order_id in order_ids if order_id not in updated]
+  existing = set(Order.objects.filter(id__in=missing).values_list('id', flat=True)) if missing else set()
+
+  return {
+    order_id: 'updated' if order_id in updated else 'not_assigned_to_you' if order_id in existing else 'not_found'
+    for order_id in order_ids
+  }
@@ -0,0 +1,116 @@
+from functools import lru_cache
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import exceptions, serializers
+
+
+# Sparse fieldsets for the read endpoints
+# ?fields=id,title keeps only the listed fields of every row, ?exclude=category drops the listed ones.
+# The SQL is narrowed to match: only() loads the columns of the kept fields, relations rendered through
+# __str__ are only joined when their field is kept and nested lists that are dropped are not prefetched.
+
+class FieldsetError(exceptions.ParseError):
+
+  def __init__(self, message):
+    super().__init__({'message': message})
+
+
+def split_fields(value):
+  return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+@lru_cache(maxsize=None)
+def serializer_fields(serializer_class):
+  return {name: field.source for name, field in serializer_class().fields.items()}
+
+
+# Names of the fields to render in serializer order, None when the request does not ask for a fieldset
+def requested_fields(serializer_class, query_params):
+  fields = split_fields(query_params.get('fields'))
+  exclude = split_fields(query_params.get('exclude'))
+  if not fields and not exclude:
+    return None
+
+  available = serializer_fields(serializer_class)
+  unknown = [name for name in fields + exclude if name not in available]
+  if unknown:
+    raise FieldsetError('Unknown fields: ' + ', '.join(unknown) + '. Available fields: ' + ', '.join(available))
+
+  return tuple(name for name in available if (not fields or name in fields) and name not in exclude)
+
+
+class SparseFieldsetSerializer(serializers.ModelSerializer):
+  # Field rendered through a relation: columns its __str__ reads, joined with select_related
+  related_columns = {}
+  # Field holding a nested list: lookup (or Prefetch) loading it with prefetch_related
+  prefetch_fields = {}
+
+  def __init__(self, *args, fields=None, **kwargs):
+    super().__init__(*args, **kwargs)
+
+    if fields is not None:
+      for name in list(self.fields):
+        if name not in fields:
+          self.fields.pop(name)
+
+  # Joins and prefetches every relation the kept fields render, so a list is serialized without
+  # one query per row. columns are loaded as well when only() is applied, e.g. cursor ordering fields.
+  @classmethod
+  def setup_eager_loading(cls, queryset, fields=None, columns=()):
+    sources = serializer_fields(cls)
+    select = []
+    prefetch = []
+    only = list(columns)
+
+    for name in sources if fields is None else fields:
+      if name in cls.prefetch_fields:
+        prefetch.append(cls.prefetch_fields[name])
+      elif name in cls.related_columns:
+        for column in cls.related_columns[name]:
+          select.append(column.rsplit('__', 1)[0])
+          only.append(column)
+      else:
+        only.append(sources[name])
+
+    if select:
+      queryset = queryset.select_related(*dict.fromkeys(select))
+    if prefetch:
+      queryset = queryset.prefetch_related(*prefetch)
+    if fields is not None:
+      queryset = narrow_columns(queryset, only)
+
+    return queryset
+
+
+def narrow_columns(queryset, columns):
+  opts = queryset.model._meta
+  concrete = []
+
+  for column in columns:
+    try:
+      field = opts.get_field(column.split('__', 1)[0])
+    except FieldDoesNotExist:
+      # Rendered from something that is not a column, load the whole row
+      return queryset
+    # Many to many and reverse relations have no column on the row
+    if field.concrete and not field.many_to_many:
+      concrete.append(column)
+
+  return queryset.only(*concrete or [opts.pk.name])
+
+
+# Sparse fieldsets for the GET requests of generic views
+class SparseFieldsetViewMixin:
+
+  def sparse_fields(self):
+    if self.request.method != 'GET':
+      return None
+    return requested_fields(self.get_serializer_class(), self.request.query_params)
+
+  def get_queryset(self):
+    queryset = super().get_queryset()
+    if self.request.method != 'GET':
+      return queryset
+    return self.get_serializer_class().setup_eager_loading(queryset, self.sparse_fields())
+
+  def get_serializer(self, *args, **kwargs):
+    return super().get_serializer(*args, fields=self.sparse_fields(), **kwargs)
@@ -0,0 +1,56 @@
+from decimal import Decimal, InvalidOperation
+from .search import search_menu_items
+
+
+# Query string filters of the menu items list
+# Shared by the DRF view and its async counterpart so both answer the same query the same way.
+
+MENU_ITEM_CURSOR_FIELDS = ('id', 'title', 'price', 'featured', 'category')
+MENU_ITEM_FEATURED_VALUES = {'1': True, 'true': True, '0': False, 'false': False}
+
+
+class MenuFilterError(ValueError):
+  pass
+
+
+def filter_menu_items(items, query_params):
+  category_name = query_params.get('category')
+  category_slug = query_params.get('category_slug')
+  to_price = query_params.get('to_price')
+  min_price = query_params.get('min_price')
+  max_price = query_params.get('max_price')
+  featured = query_params.get('featured')
+  search = query_params.get('search')
+  ordering = query_params.get('ordering')
+
+  if category_name:
+    items = items.filter(category__title__icontains=category_name)
+
+  if category_slug:
+    items = items.filter(category__slug=category_slug)
+
+  if to_price:
+    items = items.filter(price=to_price)
+
+  try:
+    if min_price:
+      items = items.filter(price__gte=Decimal(min_price))
+    if max_price:
+      items = items.filter(price__lte=Decimal(max_price))
+  except InvalidOperation:
+    raise MenuFilterError('min_price and max_price must be numbers')
+
+  if featured:
+    if featured.lower() not in MENU_ITEM_FEATURED_VALUES:
+      raise MenuFilterError('featured must be 1, 0, true or false')
+    # featured=True would be rendered as a bare boolean column, which SQLite cannot answer from an index
+    items = items.filter(featured__in=[MENU_ITEM_FEATURED_VALUES[featured.lower()]])
+
+  if search:
+    items = search_menu_items(items, search)
+
+  if ordering:
+    ordering_fields = [field.strip() for field in ordering.split(',') if field.strip()]
+    items = items.order_by(*ordering_fields)
+
+  return items
@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.archive import ARCHIVE_BATCH_SIZE, archive_cutoff, archive_orders
+
+
+# Move delivered orders older than --days to the archive tables
+# python manage.py archive_orders --days 90 --batch-size 500
+# --days defaults to settings.ORDER_ARCHIVE_DAYS and counts from the last update of the order.
+# Every batch of --batch-size orders is moved with its items in its own transaction, so checkout and
+# status updates are only blocked for one batch at a time. Safe to run again or from a scheduler.
+
+class Command(BaseCommand):
+  help = 'Move delivered orders and their items to the archive tables in batches'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--days', type=int, default=None, help='Archive delivered orders not updated for this many days')
+    parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help='Orders moved per transaction')
+
+  def handle(self, *args, **options):
+    start = time.perf_counter()
+    orders, items = archive_orders(options['days'], options['batch_size'])
+    elapsed = time.perf_counter() - start
+    self.stdout.write(self.style.SUCCESS('Archived %d orders and %d order items updated before %s in %.2fs' % (
+      orders, items, archive_cutoff(options['days']), elapsed,
+    )))
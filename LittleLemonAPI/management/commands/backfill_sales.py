@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from LittleLemonAPI.models import OrderHistory, OrderHistoryItem
+from LittleLemonAPI.sales import add_orders_sales, clear_sales
+
+
+# Rebuild the daily sales rollups from the existing orders, live and archived
+# python manage.py backfill_sales --batch-size 5000
+# The rollups are emptied, then orders are aggregated by ranges of --batch-size ids, each range in its own
+# transaction with two aggregate queries and one upsert per rollup table, so memory stays flat and writers
+# are only blocked for one batch at a time.
+# Orders created during the backfill are recorded by checkout and are above the id snapshot, so they are
+# counted once. An order deleted while the backfill runs can be subtracted before its range has been added:
+# run the backfill while order deletes are paused, or run it again afterwards.
+# The sales of deleted menu items are only in the rollups, their order items are gone: a backfill drops them.
+
+class Command(BaseCommand):
+  help = 'Rebuild the daily sales rollup tables from the orders in batches'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--batch-size', type=int, default=5000, help='Order ids aggregated per transaction')
+
+  def handle(self, *args, **options):
+    batch_size = options['batch_size']
+    last_order = OrderHistory.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    start = time.perf_counter()
+
+    clear_sales()
+    for first in range(1, last_order + 1, batch_size):
+      with transaction.atomic():
+        add_orders_sales(OrderHistory.objects.filter(id__range=(first, min(first + batch_size - 1, last_order))), OrderHistoryItem.objects)
+
+    elapsed = time.perf_counter() - start
+    orders = OrderHistory.objects.filter(id__lte=last_order).count()
+    self.stdout.write(self.style.SUCCESS('Backfilled %d orders in %.2fs (%.0f orders/s)' % (orders, elapsed, orders / elapsed if elapsed else 0)))
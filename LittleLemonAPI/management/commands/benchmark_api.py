@@ -0,0 +1,211 @@
+import json
+import platform
+import statistics
+import time
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from LittleLemonAPI import urls
+from LittleLemonAPI.models import MenuItem, Order
+from LittleLemonAPI.roles import MANAGER_GROUP, DELIVERY_CREW_GROUP
+
+
+# Per endpoint benchmark of every route in LittleLemonAPI/urls.py
+# python manage.py seed_data --scale 10
+# python manage.py benchmark_api --iterations 100 --output bench.json
+# python manage.py benchmark_api --compare bench.json
+# Requests go through the Django test client with token authentication. Every request runs inside
+# a transaction that is rolled back, so write endpoints can be measured repeatedly on the same data.
+# Reports p50 / p95 / p99 latency in ms, queries per request and response bytes.
+
+# (name, method, route, role, path kwargs, query params or payload)
+SCENARIOS = [
+  ('users.create', 'post', 'users', None, {}, lambda ctx, i: {'username': 'bench-user-%d' % i, 'email': 'bench@littlelemon.com', 'password': 'lemon@123!'}),
+  ('users.list', 'get', 'users/users/', 'admin', {}, None),
+  ('users.me', 'get', 'users/users/me/', 'customer', {}, None),
+  ('menu.list', 'get', 'menu-items', 'customer', {}, None),
+  ('menu.list.filtered', 'get', 'menu-items', 'customer', {}, lambda ctx, i: {'category_slug': ctx['category'].slug, 'min_price': 5, 'ordering': 'price'}),
+  ('menu.list.search', 'get', 'menu-items', 'customer', {}, lambda ctx, i: {'search': ctx['menuitem'].title.split()[0]}),
+  ('menu.list.fields', 'get', 'menu-items', 'customer', {}, lambda ctx, i: {'fields': 'id,title'}),
+  ('menu.list.cursor', 'get', 'menu-items', 'customer', {}, lambda ctx, i: {'cursor': '', 'ordering': '-price'}),
+  ('menu.create', 'post', 'menu-items', 'manager', {}, lambda ctx, i: {'title': 'Bench dish', 'category': ctx['category'].title, 'price': 9, 'featured': 0}),
+  ('menu.detail', 'get', 'menu-items/<int:pk>', 'customer', {'pk': 'menuitem'}, None),
+  ('menu.update', 'put', 'menu-items/<int:pk>', 'manager', {'pk': 'menuitem'}, lambda ctx, i: {'title': ctx['menuitem'].title, 'category': ctx['category'].title, 'price': 11, 'featured': 1}),
+  ('categories.list', 'get', 'menu-items/category', 'customer', {}, None),
+  ('categories.create', 'post', 'menu-items/category', 'manager', {}, lambda ctx, i: {'slug': 'bench', 'title': 'Bench'}),
+  ('groups.list', 'get', 'groups/', 'customer', {}, None),
+  ('managers.list', 'get', 'groups/manager/users', 'manager', {}, None),
+  ('managers.add', 'post', 'groups/manager/users', 'manager', {}, lambda ctx, i: {'username': ctx['customer'].username}),
+  ('managers.remove', 'delete', 'groups/manager/users/<int:pk>', 'admin', {'pk': 'manager'}, None),
+  ('crew.list', 'get', 'groups/delivery-crew/users', 'manager', {}, None),
+  ('crew.add', 'post', 'groups/delivery-crew/users', 'manager', {}, lambda ctx, i: {'username': ctx['customer'].username}),
+  ('crew.remove', 'delete', 'groups/delivery-crew/users/<int:pk>', 'admin', {'pk': 'crew'}, None),
+  ('cart.list', 'get', 'cart/menu-items', 'customer', {}, None),
+  ('cart.add', 'post', 'cart/menu-items', 'customer', {}, lambda ctx, i: {'menuitem': ctx['new_menuitem'].title, 'quantity': 2}),
+  ('cart.clear', 'delete', 'cart/menu-items', 'customer', {}, None),
+  ('cart.summary', 'get', 'cart/summary', 'customer', {}, None),
+  ('orders.list.customer', 'get', 'orders', 'customer', {}, None),
+  ('orders.list.manager', 'get', 'orders', 'manager', {}, None),
+  ('orders.list.items', 'get', 'orders', 'customer', {}, lambda ctx, i: {'include': 'items'}),
+  ('orders.list.crew', 'get', 'orders', 'crew', {}, None),
+  ('orders.checkout', 'post', 'orders', 'customer', {}, None),
+  ('orders.auto-assign', 'post', 'orders/assign', 'manager', {}, None),
+  ('order-items.list', 'get', 'orders/order-items', 'customer', {}, None),
+  ('orders.detail', 'get', 'orders/<int:pk>', 'customer', {'pk': 'order'}, None),
+  ('orders.assign', 'put', 'orders/<int:pk>', 'manager', {'pk': 'order'}, lambda ctx, i: {'delivery_crew': ctx['crew'].username, 'status': 0}),
+  ('orders.status', 'patch', 'orders/<int:pk>', 'crew', {'pk': 'crew_order'}, lambda ctx, i: {'status': 1}),
+  ('orders.status.bulk', 'patch', 'orders/status', 'crew', {}, lambda ctx, i: {'orders': [ctx['crew_order'].id], 'status': 1}),
+  ('orders.delete', 'delete', 'orders/<int:pk>', 'manager', {'pk': 'order'}, None),
+  ('reports.sales', 'get', 'reports/sales', 'manager', {}, None),
+  ('reports.sales.menuitem', 'get', 'reports/sales', 'manager', {}, lambda ctx, i: {'by': 'menuitem'}),
+]
+
+
+def percentile(samples, percent):
+  if len(samples) == 1:
+    return samples[0]
+  return statistics.quantiles(samples, n=100, method='inclusive')[percent - 1]
+
+
+class Command(BaseCommand):
+  help = 'Benchmark every API route and report latency percentiles, query counts and response sizes'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--only', help='Comma separated scenario name prefixes to run')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare against')
+
+  def handle(self, *args, **options):
+    ctx = self.load_context()
+    self.check_coverage()
+
+    scenarios = SCENARIOS
+    if options['only']:
+      prefixes = tuple(options['only'].split(','))
+      scenarios = [scenario for scenario in SCENARIOS if scenario[0].startswith(prefixes)]
+
+    results = {}
+    for scenario in scenarios:
+      results[scenario[0]] = self.run_scenario(ctx, scenario, options['iterations'], options['warmup'])
+
+    report = {
+      'meta': {
+        'date': now().isoformat(),
+        'iterations': options['iterations'],
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+      },
+      'results': results,
+    }
+
+    baseline = None
+    if options['compare']:
+      with open(options['compare']) as f:
+        baseline = json.load(f)['results']
+
+    self.print_report(results, baseline)
+
+    if options['output']:
+      with open(options['output'], 'w') as f:
+        json.dump(report, f, indent=2)
+      self.stdout.write('Results written to ' + options['output'])
+
+  def load_context(self):
+    users = User.objects.filter(is_active=True)
+    customer = users.filter(groups__isnull=True, is_superuser=False, order__isnull=False, cart__isnull=False).first()
+    manager = users.filter(groups__name=MANAGER_GROUP, is_superuser=False).first()
+    admin = users.filter(groups__name=MANAGER_GROUP, is_superuser=True, is_staff=True).first()
+    crew = users.filter(groups__name=DELIVERY_CREW_GROUP, delivery_crew__isnull=False).first()
+
+    if not (customer and manager and admin and crew):
+      raise CommandError('No suitable users found, run python manage.py seed_data first')
+
+    ctx = {
+      'customer': customer,
+      'manager': manager,
+      'admin': admin,
+      'crew': crew,
+      'menuitem': MenuItem.objects.select_related('category').order_by('-id').first(),
+      'new_menuitem': MenuItem.objects.exclude(cart__user=customer).first(),
+      'order': Order.objects.filter(user=customer).first(),
+      'crew_order': Order.objects.filter(delivery_crew=crew).first(),
+    }
+    ctx['category'] = ctx['menuitem'].category
+    ctx['tokens'] = {role: Token.objects.get_or_create(user=ctx[role])[0].key for role in ('customer', 'manager', 'admin', 'crew')}
+    return ctx
+
+  def check_coverage(self):
+    covered = {scenario[2] for scenario in SCENARIOS}
+    for pattern in urls.urlpatterns:
+      if str(pattern.pattern) not in covered:
+        self.stderr.write('No benchmark scenario for route ' + str(pattern.pattern))
+
+  def run_scenario(self, ctx, scenario, iterations, warmup):
+    name, method, route, role, path_kwargs, data = scenario
+    path = '/api/' + route
+    for kwarg, key in path_kwargs.items():
+      path = path.replace('<int:%s>' % kwarg, str(ctx[key].pk))
+
+    client = APIClient(SERVER_NAME='localhost')
+    if role:
+      client.credentials(HTTP_AUTHORIZATION='Token ' + ctx['tokens'][role])
+
+    timings = []
+    queries = []
+    sizes = []
+    statuses = set()
+
+    for i in range(warmup + iterations):
+      payload = data(ctx, i) if data else None
+
+      # The query log is capped, start every request with an empty one so counts stay exact
+      connection.queries_log.clear()
+
+      with transaction.atomic():
+        with CaptureQueriesContext(connection) as context:
+          start = time.perf_counter()
+          response = getattr(client, method)(path, payload)
+          body = b''.join(response.streaming_content) if response.streaming else response.content
+          elapsed = (time.perf_counter() - start) * 1000
+        transaction.set_rollback(True)
+
+      if i >= warmup:
+        timings.append(elapsed)
+        queries.append(len(context.captured_queries))
+        sizes.append(len(body))
+        statuses.add(response.status_code)
+
+    return {
+      'method': method.upper(),
+      'path': path,
+      'status': sorted(statuses),
+      'p50_ms': round(percentile(timings, 50), 3),
+      'p95_ms': round(percentile(timings, 95), 3),
+      'p99_ms': round(percentile(timings, 99), 3),
+      'queries': max(queries),
+      'bytes': max(sizes),
+    }
+
+  def print_report(self, results, baseline):
+    header = '%-22s %-7s %-10s %9s %9s %9s %8s %9s' % ('scenario', 'method', 'status', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'bytes')
+    if baseline:
+      header += ' %10s %12s' % ('p50 delta', 'queries was')
+    self.stdout.write(header)
+
+    for name, result in results.items():
+      line = '%-22s %-7s %-10s %9.2f %9.2f %9.2f %8d %9d' % (
+        name, result['method'], ','.join(str(code) for code in result['status']),
+        result['p50_ms'], result['p95_ms'], result['p99_ms'], result['queries'], result['bytes'],
+      )
+      if baseline and name in baseline and baseline[name]['p50_ms']:
+        delta = (result['p50_ms'] - baseline[name]['p50_ms']) / baseline[name]['p50_ms'] * 100
+        line += ' %+9.1f%% %12d' % (delta, baseline[name]['queries'])
+      self.stdout.write(line)
@@ -0,0 +1,126 @@
+import asyncio
+import statistics
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from .benchmark_api import Command as ApiBenchmarkCommand, percentile
+
+
+# WSGI against ASGI throughput of the hot read endpoints at high concurrency
+# python manage.py seed_data --scale 10
+# python manage.py benchmark_asgi --concurrency 64 --threads 8 --requests 2000
+# Both servers are driven in process by --concurrency clients issuing requests back to back:
+# wsgi runs the DRF views through the WSGI handler with at most --threads requests in flight (a threaded worker),
+# asgi runs LittleLemon.asgi_urls through the ASGI handler on one event loop (one async worker).
+# Reports requests per second and p50 / p99 latency in ms, queueing included.
+
+# (name, path, role, path object)
+SCENARIOS = [
+  ('menu.list', '/api/menu-items', 'customer', None),
+  ('menu.detail', '/api/menu-items/%d', 'customer', 'menuitem'),
+  ('categories.list', '/api/menu-items/category', 'customer', None),
+  ('cart.list', '/api/cart/menu-items', 'customer', None),
+  ('orders.list', '/api/orders', 'customer', None),
+  ('orders.detail', '/api/orders/%d', 'customer', 'order'),
+]
+
+MODES = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+  help = 'Compare WSGI and ASGI throughput and latency of the read endpoints under concurrent clients'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=8, help='Worker threads of the WSGI server')
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per scenario and mode')
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--only', help='Comma separated scenario name prefixes to run')
+
+  def handle(self, *args, **options):
+    modes = options['modes'].split(',')
+    if not set(modes) <= set(MODES):
+      raise CommandError('--modes must be a comma separated list of ' + ', '.join(MODES))
+
+    ctx = ApiBenchmarkCommand().load_context()
+
+    scenarios = SCENARIOS
+    if options['only']:
+      prefixes = tuple(options['only'].split(','))
+      scenarios = [scenario for scenario in SCENARIOS if scenario[0].startswith(prefixes)]
+
+    # Both test clients send Host: testserver
+    with override_settings(ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ['testserver']):
+      self.run_scenarios(ctx, scenarios, modes, options)
+
+  def run_scenarios(self, ctx, scenarios, modes, options):
+    self.stdout.write('%-16s %-5s %9s %9s %9s %7s' % ('scenario', 'mode', 'req/s', 'p50 ms', 'p99 ms', 'errors'))
+
+    for name, path, role, key in scenarios:
+      if key:
+        path = path % ctx[key].pk
+      token = 'Token ' + ctx['tokens'][role]
+
+      for mode in modes:
+        if mode == 'wsgi':
+          elapsed, timings, errors = self.run_wsgi(path, token, options)
+        else:
+          elapsed, timings, errors = asyncio.run(self.run_asgi(path, token, options))
+
+        self.stdout.write('%-16s %-5s %9.1f %9.2f %9.2f %7d' % (
+          name, mode, len(timings) / elapsed,
+          statistics.median(timings), percentile(timings, 99), errors,
+        ))
+
+  def run_wsgi(self, path, token, options):
+    workers = threading.Semaphore(options['threads'])
+    remaining = iter(range(options['requests']))
+    lock = threading.Lock()
+    timings = []
+    errors = []
+
+    def client_loop():
+      client = Client(HTTP_AUTHORIZATION=token)
+      while True:
+        with lock:
+          if next(remaining, None) is None:
+            break
+        start = time.perf_counter()
+        with workers:
+          response = client.get(path)
+        with lock:
+          timings.append((time.perf_counter() - start) * 1000)
+          if response.status_code != 200:
+            errors.append(response.status_code)
+      connection.close()
+
+    clients = [threading.Thread(target=client_loop) for i in range(options['concurrency'])]
+    start = time.perf_counter()
+    for client in clients:
+      client.start()
+    for client in clients:
+      client.join()
+    return time.perf_counter() - start, timings, len(errors)
+
+  async def run_asgi(self, path, token, options):
+    remaining = iter(range(options['requests']))
+    timings = []
+    errors = []
+
+    async def client_loop():
+      client = AsyncClient()
+      while next(remaining, None) is not None:
+        start = time.perf_counter()
+        response = await client.get(path, authorization=token)
+        timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+          errors.append(response.status_code)
+
+    with override_settings(ROOT_URLCONF='LittleLemon.asgi_urls'):
+      start = time.perf_counter()
+      await asyncio.gather(*[client_loop() for i in range(options['concurrency'])])
+      return time.perf_counter() - start, timings, len(errors)
@@ -0,0 +1,54 @@
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from LittleLemonAPI.models import Category, MenuItem
+from LittleLemonAPI.serializers import MenuItemsSerializerGet
+from LittleLemonAPI.middleware import compress, available_encodings
+from LittleLemonAPI.renderers import FastJSONRenderer, MessagePackRenderer, msgpack_available
+
+
+# Rendering time and body size of a large menu item list per renderer and content encoding
+# python manage.py benchmark_renderers --rows 10000 --repeat 5
+# --rows menu items are inserted in a transaction that is rolled back at the end and serialized once.
+# Reports the best render time of --repeat runs in ms for JSONRenderer, FastJSONRenderer and, when msgpack
+# is installed, MessagePackRenderer, then the body size in bytes as is and with every available encoding.
+
+class Command(BaseCommand):
+  help = 'Compare render time and response size of the JSON, fast JSON and binary renderers'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+
+  def handle(self, *args, **options):
+    with transaction.atomic():
+      category = Category.objects.create(slug='bench-renderers', title='Bench renderers')
+      MenuItem.objects.bulk_create([
+        MenuItem(title='Bench item %d' % i, price=Decimal(i % 3000) / 100, featured=i % 10 == 0, category=category)
+        for i in range(options['rows'])
+      ], batch_size=2000)
+      queryset = MenuItemsSerializerGet.setup_eager_loading(MenuItem.objects.filter(category=category).order_by('id'))
+      data = MenuItemsSerializerGet(queryset, many=True).data
+      transaction.set_rollback(True)
+
+    renderers = [JSONRenderer(), FastJSONRenderer()]
+    if msgpack_available():
+      renderers.append(MessagePackRenderer())
+    encodings = available_encodings()
+
+    self.stdout.write('%-20s %8s %10s %10s' % ('renderer', 'rows', 'ms', 'identity') + ''.join(' %10s' % encoding for encoding in encodings))
+    expected = JSONRenderer().render(data)
+
+    for renderer in renderers:
+      timings = []
+      for i in range(options['repeat']):
+        start = time.perf_counter()
+        body = renderer.render(data)
+        timings.append((time.perf_counter() - start) * 1000)
+
+      if renderer.format == 'json' and body != expected:
+        self.stderr.write(type(renderer).__name__ + ' output differs from JSONRenderer')
+      sizes = [len(compress(encoding, body)) for encoding in encodings]
+      self.stdout.write('%-20s %8d %10.1f %10d' % (type(renderer).__name__, len(data), min(timings), len(body)) + ''.join(' %10d' % size for size in sizes))
@@ -0,0 +1,116 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from LittleLemonAPI.models import Category, MenuItem
+from LittleLemonAPI.search import fts_available, search_menu_items
+
+
+# Benchmark menu search latency while the menu grows
+# python manage.py benchmark_search --scales 1000,10000,100000,1000000
+# Rows are inserted inside a transaction that is rolled back at the end, so the database is left untouched.
+# Two query mixes are timed. Every title carries a product code shared by CODE_ROWS items: code searches
+# match the same number of rows at every scale, like a catalog that grows with more brands. Word searches
+# look up one of the common title words, each in about 1 title in 20, so their matches grow with the menu.
+# bm25 ranks every match before the first page is cut, the cost of a word search grows with its matches.
+
+WORDS = (
+  'lemon', 'garlic', 'bread', 'pancake', 'waffle', 'salad', 'chicken', 'beef', 'lamb', 'falafel',
+  'hummus', 'pita', 'olive', 'feta', 'tomato', 'basil', 'pasta', 'risotto', 'soup', 'stew',
+  'grilled', 'roasted', 'spicy', 'smoked', 'crispy', 'honey', 'mint', 'yogurt', 'lentil', 'rice',
+  'shawarma', 'kebab', 'tart', 'cake', 'pudding', 'sorbet', 'espresso', 'latte', 'juice', 'tea',
+)
+
+CODE_ROWS = 50
+CODE_LETTERS = 'bcdfghjklmnpqrstvwxz'
+
+
+def p95(timings):
+  return statistics.quantiles(timings, n=20)[-1]
+
+
+def product_code(number):
+  code = ''
+  for i in range(6):
+    number, letter = divmod(number, len(CODE_LETTERS))
+    code += CODE_LETTERS[letter]
+  return code
+
+
+class Command(BaseCommand):
+  help = 'Measure menu search latency from 1k to 1M menu items'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--scales', default='1000,10000,100000,1000000')
+    parser.add_argument('--runs', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--compare', action='store_true', help='Also time the title__icontains scan')
+
+  def handle(self, *args, **options):
+    scales = sorted(int(scale) for scale in options['scales'].split(','))
+    random.seed(1)
+
+    if not fts_available():
+      raise CommandError('The menu item FTS5 index is not available, run migrate on a SQLite database with FTS5')
+
+    self.stdout.write('%10s %10s %10s %10s %10s %10s %12s' % (
+      'rows', 'code p50', 'code p95', 'word p50', 'word p95', 'word rows', 'icontains ms',
+    ))
+
+    with transaction.atomic():
+      category = Category.objects.create(slug='benchmark', title='Benchmark')
+      rows = MenuItem.objects.count()
+
+      for scale in scales:
+        rows = self.fill(category, rows, scale, options['batch_size'])
+        search = lambda term: search_menu_items(MenuItem.objects.all(), term)
+        codes = self.time_searches(self.code_terms(rows, options['runs']), search)
+        words = self.time_searches(self.word_terms(options['runs']), search)
+        word_rows = statistics.mean(search_menu_items(MenuItem.objects.all(), word).count() for word in WORDS[:5])
+        scan = ''
+
+        if options['compare']:
+          scan = '%.2f' % statistics.median(self.time_searches(self.code_terms(rows, 3), lambda term: MenuItem.objects.filter(title__icontains=term)))
+
+        self.stdout.write('%10d %10.2f %10.2f %10.2f %10.2f %10d %12s' % (
+          rows, statistics.median(codes), p95(codes), statistics.median(words), p95(words), word_rows, scan,
+        ))
+
+      transaction.set_rollback(True)
+
+  def fill(self, category, rows, scale, batch_size):
+    while rows < scale:
+      size = min(batch_size, scale - rows)
+      MenuItem.objects.bulk_create([
+        MenuItem(
+          title=' '.join(random.sample(WORDS, 2)) + ' ' + product_code((rows + i) // CODE_ROWS),
+          price=random.randint(100, 5000) / 100,
+          featured=False,
+          category=category,
+        )
+        for i in range(size)
+      ])
+      rows += size
+    return rows
+
+  # A code alone and with a word: at most CODE_ROWS matches whatever the scale
+  def code_terms(self, rows, runs):
+    terms = []
+    for run in range(runs):
+      code = product_code(random.randrange(rows // CODE_ROWS or 1))
+      terms += [code, random.choice(WORDS) + ' ' + code]
+    return terms
+
+  # One common word: about rows / 20 matches
+  def word_terms(self, runs):
+    return [random.choice(WORDS) for run in range(runs)]
+
+  def time_searches(self, terms, search):
+    timings = []
+    for term in terms:
+      start = time.perf_counter()
+      # First page, the shape of a real /api/menu-items?search= request
+      list(search(term)[:10])
+      timings.append((time.perf_counter() - start) * 1000)
+    return timings
@@ -0,0 +1,70 @@
+import time
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from LittleLemonAPI.models import Category, MenuItem, Order
+from LittleLemonAPI.serializers import MenuItemsSerializerGet, OrderSerializerGet
+from LittleLemonAPI.valuesplan import values_plan
+
+
+# Serialization time of large lists with the DRF serializers and with the values() fast path
+# python manage.py benchmark_serializers --rows 10000 --repeat 5
+# --rows menu items and orders are inserted in a transaction that is rolled back at the end.
+# Rows are read once, then only serialization is timed: Serializer(rows, many=True).data on model
+# instances against the values plan on values() rows. Reports the best time of --repeat runs in ms
+# and checks the rendered JSON of both paths is byte-identical.
+
+class Command(BaseCommand):
+  help = 'Compare list serialization time of the DRF serializers and the values() fast path'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+
+  def handle(self, *args, **options):
+    self.repeat = options['repeat']
+    self.stdout.write('%-24s %8s %12s %12s %9s %10s' % ('serializer', 'rows', 'drf ms', 'values ms', 'speedup', 'identical'))
+
+    with transaction.atomic():
+      self.create_rows(options['rows'])
+      self.compare(MenuItemsSerializerGet, MenuItem.objects.order_by('-id')[:options['rows']])
+      self.compare(OrderSerializerGet, Order.objects.order_by('-id')[:options['rows']])
+      transaction.set_rollback(True)
+
+  def create_rows(self, count):
+    category = Category.objects.create(slug='bench-serializers', title='Bench serializers')
+    user = User.objects.create(username='bench-serializers')
+    MenuItem.objects.bulk_create([
+      MenuItem(title='Bench item %d' % i, price=Decimal(i % 3000) / 100, featured=i % 10 == 0, category=category)
+      for i in range(count)
+    ], batch_size=2000)
+    Order.objects.bulk_create([
+      Order(user=user, delivery_crew=user if i % 2 else None, status=i % 3 == 0, total=Decimal(i % 9000) / 100)
+      for i in range(count)
+    ], batch_size=2000)
+
+  def best_time(self, render):
+    timings = []
+    for i in range(self.repeat):
+      start = time.perf_counter()
+      data = render()
+      timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), data
+
+  def compare(self, serializer_class, queryset):
+    plan = values_plan(serializer_class)
+    if plan is None:
+      raise CommandError(serializer_class.__name__ + ' has no values plan')
+
+    instances = list(serializer_class.setup_eager_loading(queryset))
+    rows = list(plan.values(serializer_class.setup_eager_loading(queryset)))
+
+    drf_ms, drf_data = self.best_time(lambda: serializer_class(instances, many=True).data)
+    values_ms, values_data = self.best_time(lambda: plan.render(rows))
+    identical = JSONRenderer().render(drf_data) == JSONRenderer().render(values_data)
+
+    self.stdout.write('%-24s %8d %12.1f %12.1f %8.1fx %10s' % (
+      serializer_class.__name__, len(rows), drf_ms, values_ms, drf_ms / values_ms, 'yes' if identical else 'NO',
+    ))
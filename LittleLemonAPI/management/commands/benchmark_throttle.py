@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.throttling import ThrottleStore
+from .benchmark_api import percentile
+
+
+# Contention benchmark of the shared throttle store
+# python manage.py benchmark_throttle --workers 16 --requests 5000 --limit 1000
+# --workers processes run --requests throttle checks each against one throttle database file,
+# all on the same key (every worker updates the same row) and on one key per worker.
+# Reports checks per second over all workers, p50 / p99 latency of one check in µs and the number of
+# checks allowed per key: the shared counter allows exactly --limit for the hot key whatever the
+# number of workers, where a per-process cache would allow --limit per worker.
+
+def run_worker(database, key, requests, limit, barrier, results):
+  store = ThrottleStore(database)
+  store.connection()
+  allowed = 0
+  timings = []
+  barrier.wait()
+
+  for i in range(requests):
+    start = time.perf_counter()
+    # Every check falls in the same window so the allowed count can be checked exactly
+    allowed += store.hit(key, 1, 1.0, limit)[0]
+    timings.append((time.perf_counter() - start) * 1000000)
+
+  results.put((allowed, timings))
+
+
+class Command(BaseCommand):
+  help = 'Measure throttle checks per second and latency with several worker processes sharing the counters'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=5000, help='Throttle checks per worker')
+    parser.add_argument('--limit', type=int, default=1000, help='Requests allowed per key')
+
+  def handle(self, *args, **options):
+    self.stdout.write('%-11s %8s %12s %9s %9s %9s' % ('keys', 'workers', 'checks/s', 'p50 µs', 'p99 µs', 'allowed'))
+
+    for keys in ('shared', 'per-worker'):
+      with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'throttle.sqlite3')
+        self.run(keys, database, options)
+
+  def run(self, keys, database, options):
+    workers = options['workers']
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(workers + 1)
+    results = context.Queue()
+
+    processes = [
+      context.Process(target=run_worker, args=(
+        database, 'hot' if keys == 'shared' else 'worker-%d' % i, options['requests'], options['limit'], barrier, results,
+      ))
+      for i in range(workers)
+    ]
+    for process in processes:
+      process.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    outcomes = [results.get() for process in processes]
+    elapsed = time.perf_counter() - start
+    for process in processes:
+      process.join()
+
+    allowed = sum(outcome[0] for outcome in outcomes)
+    timings = sorted(timing for outcome in outcomes for timing in outcome[1])
+    self.stdout.write('%-11s %8d %12.0f %9.1f %9.1f %9s' % (
+      keys, workers, len(timings) / elapsed,
+      percentile(timings, 50), percentile(timings, 99),
+      allowed if keys == 'shared' else '%d/key' % (allowed // workers),
+    ))
@@ -0,0 +1,58 @@
+import csv
+import json
+import sys
+import time
+from django.core.management.base import BaseCommand
+from LittleLemonAPI.models import MenuItem
+from ..menu_io import MENU_COLUMNS, MENU_FORMATS, detect_format
+
+
+# Stream the menu to CSV or NDJSON in constant memory
+# python manage.py export_menu menu.csv
+# python manage.py export_menu menu.ndjson
+# python manage.py export_menu - --format ndjson > menu.ndjson
+
+
+class Command(BaseCommand):
+  help = 'Export every menu item as CSV or NDJSON'
+
+  def add_arguments(self, parser):
+    parser.add_argument('path', help='Output file, - for stdout')
+    parser.add_argument('--format', choices=MENU_FORMATS, dest='menu_format')
+    parser.add_argument('--batch-size', type=int, default=2000)
+
+  def handle(self, *args, **options):
+    path = options['path']
+    menu_format = detect_format(path, options['menu_format'])
+    start = time.perf_counter()
+
+    rows = (
+      MenuItem.objects.order_by('id')
+      .values_list('id', 'title', 'price', 'featured', 'category__title')
+      .iterator(chunk_size=options['batch_size'])
+    )
+
+    if path == '-':
+      count = self.write(sys.stdout, rows, menu_format)
+    else:
+      with open(path, 'w', newline='', encoding='utf-8') as f:
+        count = self.write(f, rows, menu_format)
+
+    elapsed = time.perf_counter() - start
+    self.stderr.write('Exported %d menu items in %.2fs (%d rows/s)' % (count, elapsed, count / elapsed if elapsed else count))
+
+  def write(self, f, rows, menu_format):
+    count = 0
+
+    if menu_format == 'csv':
+      writer = csv.writer(f)
+      writer.writerow(MENU_COLUMNS)
+      for item_id, title, price, featured, category in rows:
+        writer.writerow((item_id, title, price, int(featured), category))
+        count += 1
+    else:
+      for item_id, title, price, featured, category in rows:
+        f.write(json.dumps({'id': item_id, 'title': title, 'price': str(price), 'featured': featured, 'category': category}, ensure_ascii=False) + '\n')
+        count += 1
+
+    return count
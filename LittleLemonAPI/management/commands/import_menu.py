@@ -0,0 +1,136 @@
+import sys
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import slugify
+from django.utils.timezone import now
+from LittleLemonAPI.models import Category, MenuItem
+from LittleLemonAPI.menucache import bump_menu_version
+from ..menu_io import MENU_FORMATS, RowError, clean_row, detect_format, read_rows
+
+
+# Stream a CSV or NDJSON menu into MenuItem in constant memory
+# python manage.py import_menu menu.csv --batch-size 2000
+# python manage.py import_menu menu.ndjson --create-categories
+# Rows are matched on id when given, otherwise on title, and written with INSERT ... ON CONFLICT(id) DO UPDATE.
+# Every batch runs in its own transaction with one category lookup, two lookups of existing items
+# and a bulk upsert split only by the database parameter limit.
+
+
+class Command(BaseCommand):
+  help = 'Import (upsert) menu items from CSV or NDJSON'
+
+  def add_arguments(self, parser):
+    parser.add_argument('path', help='Input file, - for stdin')
+    parser.add_argument('--format', choices=MENU_FORMATS, dest='menu_format')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--create-categories', action='store_true', help='Create categories that do not exist yet')
+
+  def handle(self, *args, **options):
+    path = options['path']
+    menu_format = detect_format(path, options['menu_format'])
+    self.create_categories = options['create_categories']
+    self.totals = {'created': 0, 'updated': 0, 'skipped': 0}
+    start = time.perf_counter()
+
+    if path == '-':
+      self.import_rows(read_rows(sys.stdin, menu_format), options['batch_size'])
+    else:
+      try:
+        with open(path, newline='', encoding='utf-8') as f:
+          self.import_rows(read_rows(f, menu_format), options['batch_size'])
+      except FileNotFoundError:
+        raise CommandError('File not found: ' + path)
+
+    if self.totals['created'] or self.totals['updated']:
+      bump_menu_version()
+
+    rows = sum(self.totals.values())
+    elapsed = time.perf_counter() - start
+    self.stdout.write('%d rows in %.2fs (%d rows/s): %d created, %d updated, %d skipped' % (
+      rows, elapsed, rows / elapsed if elapsed else rows, self.totals['created'], self.totals['updated'], self.totals['skipped'],
+    ))
+
+  def import_rows(self, rows, batch_size):
+    numbered = enumerate(rows, start=1)
+    while True:
+      batch = list(islice(numbered, batch_size))
+      if not batch:
+        break
+      self.import_batch(batch)
+
+  def import_batch(self, batch):
+    cleaned = []
+    for line, row in batch:
+      try:
+        cleaned.append((line, clean_row(row)))
+      except RowError as error:
+        self.skip(line, error)
+
+    with transaction.atomic():
+      categories = self.resolve_categories({row['category'] for line, row in cleaned})
+
+      by_id = {}
+      by_title = {}
+      for line, row in cleaned:
+        if row['category'] not in categories:
+          self.skip(line, 'unknown category ' + repr(row['category']))
+        elif row['id'] is not None:
+          by_id[row['id']] = (line, row)
+        else:
+          by_title[row['title']] = (line, row)
+
+      existing_ids = set(MenuItem.objects.filter(id__in=list(by_id)).values_list('id', flat=True))
+      title_ids = {}
+      for title, item_id in MenuItem.objects.filter(title__in=list(by_title)).order_by('-id').values_list('title', 'id'):
+        title_ids[title] = item_id
+
+      # Later rows win when the same item appears twice in a batch, by id or by title
+      targets = {}
+      new_rows = []
+      for line, row in sorted(list(by_id.values()) + list(by_title.values()), key=lambda entry: entry[0]):
+        item_id = row['id'] if row['id'] is not None else title_ids.get(row['title'])
+        if item_id is None:
+          new_rows.append(row)
+        else:
+          targets[item_id] = row
+
+      timestamp = now()
+      items = [self.menu_item(row, categories, timestamp, item_id) for item_id, row in targets.items()]
+      items += [self.menu_item(row, categories, timestamp) for row in new_rows]
+
+      MenuItem.objects.bulk_create(
+        items,
+        update_conflicts=True,
+        unique_fields=['id'],
+        update_fields=['title', 'price', 'featured', 'category', 'date_updated'],
+      )
+
+    updated = len(targets.keys() & (existing_ids | set(title_ids.values())))
+    self.totals['updated'] += updated
+    self.totals['created'] += len(items) - updated
+
+  def resolve_categories(self, titles):
+    categories = dict(Category.objects.filter(title__in=titles).values_list('title', 'id'))
+    missing = titles - set(categories)
+
+    if missing and self.create_categories:
+      for category in Category.objects.bulk_create([Category(slug=slugify(title), title=title) for title in missing]):
+        categories[category.title] = category.id
+
+    return categories
+
+  def menu_item(self, row, categories, timestamp, item_id=None):
+    return MenuItem(
+      id=item_id,
+      title=row['title'],
+      price=row['price'],
+      featured=row['featured'],
+      category_id=categories[row['category']],
+      date_updated=timestamp,
+    )
+
+  def skip(self, line, error):
+    self.totals['skipped'] += 1
+    self.stderr.write('Row %d skipped: %s' % (line, error))
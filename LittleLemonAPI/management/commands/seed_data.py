@@ -0,0 +1,162 @@
+import random
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from LittleLemonAPI.models import Category, MenuItem, Cart, CartSummary, Order, OrderItem
+from LittleLemonAPI.menucache import bump_menu_version
+from LittleLemonAPI.sales import add_orders_sales
+from LittleLemonAPI.roles import MANAGER_GROUP, DELIVERY_CREW_GROUP
+
+
+# Generate a realistic dataset for benchmarks and load tests
+# python manage.py seed_data --scale 10
+# --scale 1 gives 8 categories, 200 menu items, 100 customers, 5 managers, 10 delivery crew,
+# 1000 orders with 1 to 6 lines each and 50 non empty carts (with their cart summaries). Every count can be overridden.
+# All users get the password given by --password, one superuser (seed-admin) is also a manager.
+
+SCALE_DEFAULTS = {
+  'categories': 8,
+  'menu_items': 200,
+  'customers': 100,
+  'managers': 5,
+  'delivery_crew': 10,
+  'orders': 1000,
+  'carts': 50,
+}
+
+CATEGORY_NAMES = (
+  'Breakfast', 'Brunch', 'Lunch', 'Dinner', 'Desserts', 'Drinks', 'Salads', 'Sides', 'Mezze', 'Grill',
+  'Soups', 'Pastries', 'Seafood', 'Vegan', 'Kids', 'Specials',
+)
+
+DISH_WORDS = (
+  'Lemon', 'Garlic', 'Bread', 'Pancake', 'Waffle', 'Salad', 'Chicken', 'Beef', 'Lamb', 'Falafel',
+  'Hummus', 'Pita', 'Olive', 'Feta', 'Tomato', 'Basil', 'Pasta', 'Risotto', 'Soup', 'Stew',
+  'Grilled', 'Roasted', 'Spicy', 'Smoked', 'Crispy', 'Honey', 'Mint', 'Yogurt', 'Lentil', 'Rice',
+)
+
+
+class Command(BaseCommand):
+  help = 'Generate categories, menu items, users, carts and orders with bulk inserts'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--scale', type=float, default=1)
+    for name in SCALE_DEFAULTS:
+      parser.add_argument('--' + name.replace('_', '-'), type=int, dest=name)
+    parser.add_argument('--prefix', default='seed', help='Prefix of generated usernames')
+    parser.add_argument('--password', default='lemon@123!')
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+
+  def handle(self, *args, **options):
+    random.seed(options['seed'])
+    counts = {
+      name: options[name] if options[name] is not None else max(int(default * options['scale']), 1)
+      for name, default in SCALE_DEFAULTS.items()
+    }
+    self.prefix = options['prefix']
+    self.batch_size = options['batch_size']
+
+    if User.objects.filter(username__startswith=self.prefix + '-').exists():
+      raise CommandError('Users prefixed with ' + self.prefix + '- already exist, pass another --prefix')
+
+    with transaction.atomic():
+      categories = self.create_categories(counts['categories'])
+      menu_items = self.create_menu_items(categories, counts['menu_items'])
+      customers, managers, crew = self.create_users(counts, make_password(options['password']))
+      self.create_orders(customers, crew, menu_items, counts['orders'])
+      self.create_carts(customers, menu_items, counts['carts'])
+
+    bump_menu_version()
+
+    for name, count in counts.items():
+      self.stdout.write('%-14s %d' % (name, count))
+    self.stdout.write(self.style.SUCCESS('Dataset created'))
+
+  def create_categories(self, count):
+    categories = []
+    for i in range(count):
+      title = CATEGORY_NAMES[i % len(CATEGORY_NAMES)]
+      if i >= len(CATEGORY_NAMES):
+        title += ' ' + str(i // len(CATEGORY_NAMES) + 1)
+      categories.append(Category(slug='%s-%s' % (self.prefix, title.lower().replace(' ', '-')), title='%s %s' % (self.prefix.title(), title)))
+    return Category.objects.bulk_create(categories, batch_size=self.batch_size)
+
+  def create_menu_items(self, categories, count):
+    return MenuItem.objects.bulk_create([
+      MenuItem(
+        title=' '.join(random.sample(DISH_WORDS, 2)) + ' ' + str(i + 1),
+        price=Decimal(random.randint(150, 3000)) / 100,
+        featured=random.random() < 0.1,
+        category=random.choice(categories),
+      )
+      for i in range(count)
+    ], batch_size=self.batch_size)
+
+  def create_users(self, counts, password):
+    def users(role, count, **fields):
+      return [
+        User(username='%s-%s-%d' % (self.prefix, role, i + 1), email='%s-%s-%d@littlelemon.com' % (self.prefix, role, i + 1), password=password, **fields)
+        for i in range(count)
+      ]
+
+    customers = User.objects.bulk_create(users('customer', counts['customers']), batch_size=self.batch_size)
+    managers = User.objects.bulk_create(users('manager', counts['managers']), batch_size=self.batch_size)
+    crew = User.objects.bulk_create(users('crew', counts['delivery_crew']), batch_size=self.batch_size)
+    admin = User.objects.create(username=self.prefix + '-admin', email=self.prefix + '-admin@littlelemon.com', password=password, is_staff=True, is_superuser=True)
+
+    managers_group, created = Group.objects.get_or_create(name=MANAGER_GROUP)
+    delivery_crew_group, created = Group.objects.get_or_create(name=DELIVERY_CREW_GROUP)
+    Membership = User.groups.through
+    Membership.objects.bulk_create(
+      [Membership(user_id=user.id, group_id=managers_group.id) for user in managers + [admin]]
+      + [Membership(user_id=user.id, group_id=delivery_crew_group.id) for user in crew],
+      batch_size=self.batch_size,
+    )
+
+    return customers, managers, crew
+
+  def create_orders(self, customers, crew, menu_items, count):
+    first_order = Order.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    for start in range(0, count, self.batch_size):
+      lines = []
+      orders = []
+
+      for i in range(min(self.batch_size, count - start)):
+        order_lines = [(item, random.randint(1, 3)) for item in random.sample(menu_items, min(random.randint(1, 6), len(menu_items)))]
+        assigned = random.random() < 0.7
+        orders.append(Order(
+          user=random.choice(customers),
+          delivery_crew=random.choice(crew) if assigned else None,
+          status=assigned and random.random() < 0.6,
+          total=sum(item.price * quantity for item, quantity in order_lines),
+        ))
+        lines.append(order_lines)
+
+      orders = Order.objects.bulk_create(orders)
+      OrderItem.objects.bulk_create([
+        OrderItem(order=order, menuitem=item, quantity=quantity, unit_price=item.price, price=item.price * quantity)
+        for order, order_lines in zip(orders, lines)
+        for item, quantity in order_lines
+      ], batch_size=self.batch_size)
+
+    # Orders are bulk inserted without going through checkout, add them to the sales rollups in one pass
+    add_orders_sales(Order.objects.filter(id__gt=first_order))
+
+  def create_carts(self, customers, menu_items, count):
+    carts = Cart.objects.bulk_create([
+      Cart(user=user, menuitem=item, quantity=quantity, unit_price=item.price, price=item.price * quantity)
+      for user in random.sample(customers, min(count, len(customers)))
+      for item, quantity in [(item, random.randint(1, 3)) for item in random.sample(menu_items, min(random.randint(1, 5), len(menu_items)))]
+    ], batch_size=self.batch_size)
+
+    summaries = {}
+    for cart in carts:
+      summary = summaries.setdefault(cart.user_id, CartSummary(user_id=cart.user_id, total=Decimal(0)))
+      summary.lines += 1
+      summary.quantity += cart.quantity
+      summary.total += cart.price
+    CartSummary.objects.bulk_create(summaries.values(), batch_size=self.batch_size)
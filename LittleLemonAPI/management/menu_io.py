@@ -0,0 +1,77 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from ..cart import max_amount
+from ..models import MenuItem
+
+
+# Shared helpers of the import_menu / export_menu commands
+# Menus are exchanged as CSV (with a header row) or NDJSON (one JSON object per line) with the columns below.
+# category is the category title.
+
+MENU_COLUMNS = ('id', 'title', 'price', 'featured', 'category')
+MENU_FORMATS = ('csv', 'ndjson')
+
+FEATURED_VALUES = {'1': True, 'true': True, 'yes': True, '0': False, 'false': False, 'no': False, '': False}
+
+MAX_PRICE = max_amount(MenuItem._meta.get_field('price'))
+
+
+def detect_format(path, menu_format):
+  if menu_format:
+    return menu_format
+  if path.endswith('.ndjson') or path.endswith('.jsonl'):
+    return 'ndjson'
+  return 'csv'
+
+
+class RowError(ValueError):
+  pass
+
+
+# A malformed NDJSON line is yielded as its RowError, clean_row raises it and only that row is skipped
+def read_rows(f, menu_format):
+  if menu_format == 'csv':
+    yield from csv.DictReader(f)
+  else:
+    for line in f:
+      if line.strip():
+        try:
+          yield json.loads(line)
+        except ValueError as error:
+          yield RowError('invalid JSON: ' + str(error))
+
+
+def clean_row(row):
+  if isinstance(row, RowError):
+    raise row
+  if not isinstance(row, dict):
+    raise RowError('expected an object, got ' + type(row).__name__)
+
+  title = str(row.get('title') or '').strip()
+  category = str(row.get('category') or '').strip()
+  if not title or not category:
+    raise RowError('title and category are required')
+
+  try:
+    price = Decimal(str(row.get('price'))).quantize(Decimal('0.01'))
+  except InvalidOperation:
+    raise RowError('invalid price ' + repr(row.get('price')))
+  if not price.is_finite() or price < 0 or price > MAX_PRICE:
+    raise RowError('invalid price ' + repr(row.get('price')))
+
+  featured = str(row.get('featured', '')).strip().lower()
+  if featured not in FEATURED_VALUES:
+    raise RowError('invalid featured ' + repr(row.get('featured')))
+
+  item_id = str(row.get('id') or '').strip()
+  if item_id and not item_id.isdigit():
+    raise RowError('invalid id ' + repr(row.get('id')))
+
+  return {
+    'id': int(item_id) if item_id else None,
+    'title': title,
+    'price': price,
+    'featured': FEATURED_VALUES[featured],
+    'category': category,
+  }
@@ -0,0 +1,112 @@
+import hashlib
+from django.core.cache import cache
+from django.db.models import F
+from django.utils.timezone import now
+from .models import CatalogVersion
+
+
+# Versioned response cache for the menu views
+# Every cache key embeds the current menu version, so bumping the version on a write
+# invalidates all cached menu responses at once without scanning or deleting keys.
+# Stale entries simply expire after MENU_CACHE_TIMEOUT.
+# The version itself is stored in the CatalogVersion table and only cached for a few seconds,
+# so every worker process picks up a bump quickly.
+
+CATALOG_VERSION_PK = 1
+CATALOG_VERSION_KEY = 'catalog-version'
+CATALOG_VERSION_TIMEOUT = 5
+MENU_CACHE_TIMEOUT = 60 * 10
+
+MENU_QUERY_PARAMS = (
+  'category', 'category_slug', 'to_price', 'min_price', 'max_price', 'featured',
+  'search', 'ordering', 'perpage', 'page', 'cursor', 'fields', 'exclude',
+)
+MENU_QUERY_DEFAULTS = {'perpage': '10', 'page': '1'}
+
+
+# Returns (version, date_updated) of the menu catalog
+def catalog_version():
+  catalog = cache.get(CATALOG_VERSION_KEY)
+
+  if catalog is None:
+    row, created = CatalogVersion.objects.get_or_create(pk=CATALOG_VERSION_PK)
+    catalog = (row.version, row.date_updated)
+    cache.set(CATALOG_VERSION_KEY, catalog, CATALOG_VERSION_TIMEOUT)
+
+  return catalog
+
+
+async def acatalog_version():
+  catalog = await cache.aget(CATALOG_VERSION_KEY)
+
+  if catalog is None:
+    row, created = await CatalogVersion.objects.aget_or_create(pk=CATALOG_VERSION_PK)
+    catalog = (row.version, row.date_updated)
+    await cache.aset(CATALOG_VERSION_KEY, catalog, CATALOG_VERSION_TIMEOUT)
+
+  return catalog
+
+
+def menu_version():
+  return catalog_version()[0]
+
+
+def bump_menu_version():
+  updated = CatalogVersion.objects.filter(pk=CATALOG_VERSION_PK).update(version=F('version') + 1, date_updated=now())
+  if not updated:
+    CatalogVersion.objects.create(pk=CATALOG_VERSION_PK, version=2)
+  cache.delete(CATALOG_VERSION_KEY)
+
+
+def normalize_menu_query(query_params):
+  normalized = []
+
+  for name in MENU_QUERY_PARAMS:
+    if name == 'cursor' and name in query_params:
+      normalized.append((name, query_params.get(name)))
+      continue
+
+    value = (query_params.get(name) or '').strip()
+
+    if name in ('ordering', 'fields', 'exclude'):
+      value = ','.join(field.strip() for field in value.split(',') if field.strip())
+    elif name in ('category', 'search', 'featured'):
+      value = value.lower()
+
+    value = value or MENU_QUERY_DEFAULTS.get(name, '')
+    if value:
+      normalized.append((name, value))
+
+  return normalized
+
+
+# version defaults to the current menu version, async callers pass the one they already loaded
+def menu_cache_key(view_name, query_params=None, pk=None, version=None):
+  parts = [view_name]
+
+  if pk is not None:
+    parts.append(str(pk))
+
+  if query_params is not None:
+    parts += ['%s=%s' % item for item in normalize_menu_query(query_params)]
+
+  digest = hashlib.md5('&'.join(parts).encode()).hexdigest()
+  if version is None:
+    version = menu_version()
+  return 'menu:%s:%s' % (version, digest)
+
+
+def get_cached_menu(key):
+  return cache.get(key)
+
+
+def set_cached_menu(key, data):
+  cache.set(key, data, MENU_CACHE_TIMEOUT)
+
+
+async def aget_cached_menu(key):
+  return await cache.aget(key)
+
+
+async def aset_cached_menu(key, data):
+  await cache.aset(key, data, MENU_CACHE_TIMEOUT)
@@ -0,0 +1,130 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+from .database import mark_sticky, read_alias, request_read_alias
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+
+# Response compression negotiated from Accept-Encoding
+# Brotli (br) when the brotli package is installed, gzip otherwise, picked by the client's q-values with
+# br preferred on a tie. Bodies under settings.COMPRESSION_MIN_SIZE bytes are sent as is: the headers
+# and compression time cost more than the bytes saved. Streamed lists are compressed chunk by chunk.
+# Like GZipMiddleware, a strong ETag is made weak on a compressed response, conditional requests
+# compare tags weakly (see conditional.not_modified).
+
+BROTLI_QUALITY = 5
+
+
+def compression_min_size():
+  return getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+
+def available_encodings():
+  return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+# Accept-Encoding: gzip;q=0.8, br  ->  {'gzip': 0.8, 'br': 1.0}
+def parse_accept_encoding(header):
+  qualities = {}
+  for part in header.split(','):
+    coding, *params = [value.strip() for value in part.split(';')]
+    if not coding:
+      continue
+    quality = 1.0
+    for param in params:
+      name, _, value = param.partition('=')
+      if name.strip().lower() == 'q':
+        try:
+          quality = float(value)
+        except ValueError:
+          quality = 0.0
+    qualities[coding.lower()] = quality
+  return qualities
+
+
+def negotiate_encoding(header, encodings):
+  qualities = parse_accept_encoding(header or '')
+  default = qualities.get('*', 0.0)
+  best = None
+  for encoding in encodings:
+    quality = qualities.get(encoding, default)
+    if quality > 0 and (best is None or quality > best[1]):
+      best = (encoding, quality)
+  return best[0] if best else None
+
+
+def brotli_sequence(sequence):
+  compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+  for item in sequence:
+    yield compressor.process(item) + compressor.flush()
+  yield compressor.finish()
+
+
+def compress(encoding, content):
+  if encoding == 'br':
+    return brotli.compress(content, quality=BROTLI_QUALITY)
+  return compress_string(content)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+
+  def process_response(self, request, response):
+    if not response.streaming and len(response.content) < compression_min_size():
+      return response
+    if response.has_header('Content-Encoding'):
+      return response
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+
+    encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING'), available_encodings())
+    if encoding is None:
+      return response
+
+    if response.streaming:
+      sequence = brotli_sequence if encoding == 'br' else compress_sequence
+      response.streaming_content = sequence(response.streaming_content)
+      del response.headers['Content-Length']
+    else:
+      compressed = compress(encoding, response.content)
+      if len(compressed) >= len(response.content):
+        return response
+      response.content = compressed
+      response.headers['Content-Length'] = str(len(compressed))
+
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+      response.headers['ETag'] = 'W/' + etag
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+# Sends the reads of the request to the read database or the primary, see LittleLemonAPI/database.py
+# Streamed bodies are read after the view returns, from the primary
+class DatabaseRoutingMiddleware(MiddlewareMixin):
+
+  def __call__(self, request):
+    # Under ASGI the rest of the chain is async, as in MiddlewareMixin.__call__
+    if self._is_coroutine:
+      return self.__acall__(request)
+    token = read_alias.set(request_read_alias(request))
+    try:
+      response = self.get_response(request)
+    finally:
+      read_alias.reset(token)
+    mark_sticky(request, response)
+    return response
+
+  async def __acall__(self, request):
+    token = read_alias.set(await sync_to_async(request_read_alias)(request))
+    try:
+      response = await self.get_response(request)
+    finally:
+      read_alias.reset(token)
+    await sync_to_async(mark_sticky)(request, response)
+    return response
@@ -0,0 +1,70 @@
+# Full-text search index for MenuItem titles
+# An external content FTS5 table is kept in sync with LittleLemonAPI_menuitem by triggers,
+# so every write path (views, admin, bulk inserts, raw SQL) updates the index.
+# Only created on SQLite builds that ship FTS5; search falls back to icontains elsewhere.
+
+from django.db import migrations
+
+
+CREATE_SQL = [
+    '''CREATE VIRTUAL TABLE "LittleLemonAPI_menuitem_fts" USING fts5(
+        title,
+        content='LittleLemonAPI_menuitem',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )''',
+    '''CREATE TRIGGER "LittleLemonAPI_menuitem_fts_ai" AFTER INSERT ON "LittleLemonAPI_menuitem" BEGIN
+        INSERT INTO "LittleLemonAPI_menuitem_fts"(rowid, title) VALUES (new.id, new.title);
+    END''',
+    '''CREATE TRIGGER "LittleLemonAPI_menuitem_fts_ad" AFTER DELETE ON "LittleLemonAPI_menuitem" BEGIN
+        INSERT INTO "LittleLemonAPI_menuitem_fts"("LittleLemonAPI_menuitem_fts", rowid, title) VALUES ('delete', old.id, old.title);
+    END''',
+    '''CREATE TRIGGER "LittleLemonAPI_menuitem_fts_au" AFTER UPDATE OF title ON "LittleLemonAPI_menuitem" BEGIN
+        INSERT INTO "LittleLemonAPI_menuitem_fts"("LittleLemonAPI_menuitem_fts", rowid, title) VALUES ('delete', old.id, old.title);
+        INSERT INTO "LittleLemonAPI_menuitem_fts"(rowid, title) VALUES (new.id, new.title);
+    END''',
+    '''INSERT INTO "LittleLemonAPI_menuitem_fts"("LittleLemonAPI_menuitem_fts") VALUES ('rebuild')''',
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS "LittleLemonAPI_menuitem_fts_au"',
+    'DROP TRIGGER IF EXISTS "LittleLemonAPI_menuitem_fts_ad"',
+    'DROP TRIGGER IF EXISTS "LittleLemonAPI_menuitem_fts_ai"',
+    'DROP TABLE IF EXISTS "LittleLemonAPI_menuitem_fts"',
+]
+
+
+def has_fts5(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(value)')
+        except Exception:
+            return False
+        cursor.execute('DROP TABLE temp.fts5_probe')
+        return True
+
+
+def create_fts(apps, schema_editor):
+    if has_fts5(schema_editor.connection):
+        for sql in CREATE_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0019_catalogversion_category_date_updated_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Order history views: the live orders and order items followed by the archived ones
+ORDER_COLUMNS = 'id, user_id, delivery_crew_id, status, total, date_created, date_updated'
+ORDER_ITEM_COLUMNS = 'id, order_id, menuitem_id, quantity, unit_price, price'
+
+CREATE_SQL = [
+    'CREATE VIEW "LittleLemonAPI_orderhistory" AS SELECT ' + ORDER_COLUMNS + ' FROM "LittleLemonAPI_order" '
+    'UNION ALL SELECT ' + ORDER_COLUMNS + ' FROM "LittleLemonAPI_archivedorder"',
+    'CREATE VIEW "LittleLemonAPI_orderhistoryitem" AS SELECT ' + ORDER_ITEM_COLUMNS + ' FROM "LittleLemonAPI_orderitem" '
+    'UNION ALL SELECT ' + ORDER_ITEM_COLUMNS + ' FROM "LittleLemonAPI_archivedorderitem"',
+]
+
+DROP_SQL = [
+    'DROP VIEW IF EXISTS "LittleLemonAPI_orderhistoryitem"',
+    'DROP VIEW IF EXISTS "LittleLemonAPI_orderhistory"',
+]
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('LittleLemonAPI', '0024_daily_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.BooleanField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('date_created', models.DateField()),
+                ('date_updated', models.DateField()),
+            ],
+            options={
+                'db_table': 'LittleLemonAPI_orderhistory',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderHistoryItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.SmallIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+            ],
+            options={
+                'db_table': 'LittleLemonAPI_orderhistoryitem',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.BooleanField(default=1)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('date_created', models.DateField()),
+                ('date_updated', models.DateField()),
+                ('delivery_crew', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_deliveries', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.SmallIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('menuitem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='LittleLemonAPI.menuitem')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='LittleLemonAPI.archivedorder')),
+            ],
+            options={
+                'unique_together': {('order', 'menuitem')},
+            },
+        ),
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
@@ -8,6 +8,7 @@ from django.utils.timezone import now
 class Category(models.Model):
   slug = models.SlugField()
   title = models.CharField(max_length=255, db_index=True)
+  date_updated = models.DateTimeField(auto_now=True)
   
   def __str__(self) -> str:
     return self.title
@@ -18,11 +19,30 @@ class MenuItem(models.Model):
   price = models.DecimalField(max_digits=6, decimal_places=2, db_index=True)
   featured = models.BooleanField(db_index=True)
   category = models.ForeignKey(Category, on_delete=models.PROTECT)
+  date_updated = models.DateTimeField(auto_now=True)
+  
+  # Composite indexes backing the menu_items filters (category, featured, min_price / max_price)
+  class Meta:
+    indexes = [
+      models.Index(fields=['category', 'featured', 'price'], name='menuitem_cat_feat_price_idx'),
+      models.Index(fields=['category', 'price'], name='menuitem_cat_price_idx'),
+      models.Index(fields=['featured', 'price'], name='menuitem_feat_price_idx'),
+    ]
   
   def __str__(self) -> str:
     return self.title
 
 
+# Single row table holding the version of the whole menu catalog (menu items and categories)
+# Bumped on every catalog write, used for response cache keys and ETag / Last-Modified headers
+class CatalogVersion(models.Model):
+  version = models.PositiveBigIntegerField(default=1)
+  date_updated = models.DateTimeField(default=now)
+  
+  def __str__(self) -> str:
+    return f'Catalog version {self.version}'
+
+
 class Cart(models.Model):
   user = models.ForeignKey(User, on_delete=models.CASCADE)
   menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -37,6 +57,18 @@ class Cart(models.Model):
     return self.menuitem.title
     
     
+# Per user cart totals, updated on every cart write and at checkout so the cart badge
+# and the order total never need to scan Cart. A missing row is rebuilt from Cart on read.
+class CartSummary(models.Model):
+  user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+  lines = models.PositiveIntegerField(default=0)
+  quantity = models.PositiveIntegerField(default=0)
+  total = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+  
+  def __str__(self) -> str:
+    return f'{self.user.username} has {self.quantity} items in cart'
+    
+    
 class Order(models.Model):
   user = models.ForeignKey(User, on_delete=models.CASCADE)
   delivery_crew = models.ForeignKey(
@@ -59,4 +91,112 @@ class OrderItem(models.Model):
   price = models.DecimalField(max_digits=6, decimal_places=2)
   
   class Meta:
-    unique_together = ('order', 'menuitem')
\ No newline at end of file
+    unique_together = ('order', 'menuitem')
+
+
+# Delivered orders moved out of Order and OrderItem by LittleLemonAPI/archive.py
+# Rows keep their ids: Order ids are AUTOINCREMENT and never handed out again
+class ArchivedOrder(models.Model):
+  id = models.BigIntegerField(primary_key=True)
+  user = models.ForeignKey(User, on_delete=models.CASCADE)
+  delivery_crew = models.ForeignKey(
+    User, on_delete=models.SET_NULL,related_name='archived_deliveries', null=True
+  )
+  status = models.BooleanField(default=1)
+  total = models.DecimalField(max_digits=6, decimal_places=2)
+  date_created = models.DateField()
+  date_updated = models.DateField()
+  
+  def __str__(self) -> str:
+    return f'{self.user.username} is the customer'
+  
+  
+class ArchivedOrderItem(models.Model):
+  id = models.BigIntegerField(primary_key=True)
+  order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE)
+  menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+  quantity = models.SmallIntegerField()
+  unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+  price = models.DecimalField(max_digits=6, decimal_places=2)
+  
+  class Meta:
+    unique_together = ('order', 'menuitem')
+
+
+# Read-only views over the live and the archived orders (UNION ALL), created in migration 0025
+# SQLite flattens the views, a lookup by id or user searches the index of each table
+class OrderHistory(models.Model):
+  user = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name='+')
+  delivery_crew = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name='+', null=True)
+  status = models.BooleanField()
+  total = models.DecimalField(max_digits=6, decimal_places=2)
+  date_created = models.DateField()
+  date_updated = models.DateField()
+  
+  class Meta:
+    managed = False
+    db_table = 'LittleLemonAPI_orderhistory'
+    
+  def __str__(self) -> str:
+    return f'{self.user.username} is the customer'
+  
+  
+class OrderHistoryItem(models.Model):
+  order = models.ForeignKey(OrderHistory, on_delete=models.DO_NOTHING)
+  menuitem = models.ForeignKey(MenuItem, on_delete=models.DO_NOTHING, related_name='+')
+  quantity = models.SmallIntegerField()
+  unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+  price = models.DecimalField(max_digits=6, decimal_places=2)
+  
+  class Meta:
+    managed = False
+    db_table = 'LittleLemonAPI_orderhistoryitem'
+
+# Revoked signed token sessions (jti of the refresh token), mirrored in memory by every process
+# Rows are only needed until the refresh token expires and are pruned after that
+class RevokedToken(models.Model):
+  sid = models.CharField(max_length=255, unique=True)
+  expires_at = models.DateTimeField(db_index=True)
+  
+  def __str__(self) -> str:
+    return f'Revoked session {self.sid}'
+
+
+# Daily sales rollups maintained by LittleLemonAPI/sales.py, read by the sales report instead of OrderItem
+class DailySales(models.Model):
+  date = models.DateField(unique=True)
+  orders = models.IntegerField(default=0)
+  quantity = models.IntegerField(default=0)
+  revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+  
+  def __str__(self) -> str:
+    return f'Sales of {self.date}'
+  
+  
+# The title is copied at every sale: the rows, and the report, outlive the menu item or category
+class DailyMenuItemSales(models.Model):
+  date = models.DateField()
+  menuitem = models.ForeignKey(MenuItem, on_delete=models.SET_NULL, null=True)
+  title = models.CharField(max_length=255)
+  quantity = models.IntegerField(default=0)
+  revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+  
+  class Meta:
+    unique_together = ('date', 'menuitem')
+    
+  def __str__(self) -> str:
+    return f'Sales of {self.title} on {self.date}'
+  
+  
+class DailyCategorySales(models.Model):
+  date = models.DateField()
+  category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
+  title = models.CharField(max_length=255)
+  quantity = models.IntegerField(default=0)
+  revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+  
+  class Meta:
+    unique_together = ('date', 'category')
+    
+  def __str__(self) -> str:
+    return f'Sales of {self.title} on {self.date}'
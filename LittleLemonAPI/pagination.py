@@ -0,0 +1,163 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, PageNotAnInteger
+from django.db.models import Q
+
+
+# Keyset (cursor) pagination for list views
+# Pages are located with a WHERE clause on the ordering values of the last row seen instead of an OFFSET,
+# so deep pages cost the same as the first one and no COUNT(*) is needed.
+# Cursors are opaque tokens carrying the ordering, the keyset values and the direction of travel.
+
+class CursorError(ValueError):
+  pass
+
+
+# Page number pagination (?perpage=&page=), kept for the clients that do not follow cursors
+class PageError(ValueError):
+  pass
+
+
+# Rows of a Paginator page, [] past the last page
+def page_rows(paginator, number):
+  try:
+    return paginator.page(number=number).object_list
+  except PageNotAnInteger:
+    raise PageError('page must be an integer')
+  except EmptyPage:
+    return []
+
+
+# Cursor values go to SQL parameters, SQLite integers are 64-bit
+MIN_INTEGER = -2 ** 63
+MAX_INTEGER = 2 ** 63 - 1
+
+
+def is_cursor_value(value):
+  if isinstance(value, int) and not isinstance(value, bool):
+    return MIN_INTEGER <= value <= MAX_INTEGER
+  return isinstance(value, (bool, float, str)) or value is None
+
+
+def parse_ordering(ordering, allowed_fields):
+  ordering_fields = [field.strip() for field in ordering.split(',') if field.strip()] if ordering else []
+
+  for field in ordering_fields:
+    if field.lstrip('-') not in allowed_fields:
+      raise CursorError('Cannot paginate with a cursor on ' + field.lstrip('-'))
+
+  # id is always appended as a tie breaker so every row has a unique position
+  if not any(field.lstrip('-') == 'id' for field in ordering_fields):
+    ordering_fields.append('id')
+
+  return ordering_fields
+
+
+def encode_cursor(ordering_fields, values, reverse):
+  payload = json.dumps({'o': ordering_fields, 'v': values, 'r': reverse}, separators=(',', ':'))
+  return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, ordering_fields):
+  try:
+    padding = '=' * (-len(cursor) % 4)
+    payload = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    values, reverse = payload['v'], payload['r']
+  except (ValueError, TypeError, KeyError):
+    raise CursorError('Invalid cursor')
+
+  if payload.get('o') != ordering_fields or not isinstance(values, list) or len(values) != len(ordering_fields):
+    raise CursorError('Cursor does not match the requested ordering')
+
+  if not all(is_cursor_value(value) for value in values):
+    raise CursorError('Invalid cursor')
+
+  return values, bool(reverse)
+
+
+def keyset_filter(ordering_fields, values, reverse):
+  # (a, b, id) > (x, y, z) expanded as a > x OR (a = x AND b > y) OR (a = x AND b = y AND id > z),
+  # each comparison flipped for descending fields and when walking backwards
+  condition = Q()
+  equal = Q()
+
+  for field, value in zip(ordering_fields, values):
+    name = field.lstrip('-')
+    descending = field.startswith('-') != reverse
+    lookup = name + ('__lt' if descending else '__gt')
+    condition |= equal & Q(**{lookup: value})
+    equal &= Q(**{name: value})
+
+  return condition
+
+
+def cursor_value(value):
+  if isinstance(value, (bool, int, str)) or value is None:
+    return value
+  return str(value)
+
+
+# cursor_paginate is split in two so acursor_paginate can fetch the rows with the async ORM:
+# cursor_page_queryset builds the page query, cursor_page turns the fetched rows into the page and its cursors
+
+def cursor_paginate(queryset, ordering_fields, cursor, perpage):
+  queryset, perpage, reverse = cursor_page_queryset(queryset, ordering_fields, cursor, perpage)
+  return cursor_page(list(queryset), ordering_fields, cursor, perpage, reverse)
+
+
+async def acursor_paginate(queryset, ordering_fields, cursor, perpage):
+  queryset, perpage, reverse = cursor_page_queryset(queryset, ordering_fields, cursor, perpage)
+  return cursor_page([row async for row in queryset], ordering_fields, cursor, perpage, reverse)
+
+
+def cursor_page_queryset(queryset, ordering_fields, cursor, perpage):
+  try:
+    perpage = int(perpage)
+  except (TypeError, ValueError):
+    raise CursorError('perpage must be an integer')
+
+  if perpage < 1:
+    raise CursorError('perpage must be greater than 0')
+
+  reverse = False
+
+  if cursor:
+    values, reverse = decode_cursor(cursor, ordering_fields)
+    # Cursors come from the client, a value the field cannot take is a tampered cursor
+    try:
+      queryset = queryset.filter(keyset_filter(ordering_fields, values, reverse))
+    except (ValueError, TypeError, ValidationError):
+      raise CursorError('Invalid cursor')
+
+  if reverse:
+    order_by = [field[1:] if field.startswith('-') else '-' + field for field in ordering_fields]
+  else:
+    order_by = ordering_fields
+
+  # One extra row tells us whether there is another page in the direction of travel
+  return queryset.order_by(*order_by)[:perpage + 1], perpage, reverse
+
+
+def cursor_page(rows, ordering_fields, cursor, perpage, reverse):
+  has_more = len(rows) > perpage
+  rows = rows[:perpage]
+
+  if reverse:
+    rows.reverse()
+
+  # Rows are model instances or values() dicts holding the ordering fields
+  def row_cursor(row, to_reverse):
+    values = [cursor_value(row[field.lstrip('-')] if isinstance(row, dict) else row.serializable_value(field.lstrip('-'))) for field in ordering_fields]
+    return encode_cursor(ordering_fields, values, to_reverse)
+
+  next_cursor = None
+  previous_cursor = None
+
+  if rows:
+    if has_more or reverse:
+      next_cursor = row_cursor(rows[-1], False)
+    if cursor and (has_more or not reverse):
+      previous_cursor = row_cursor(rows[0], True)
+
+  return rows, next_cursor, previous_cursor
@@ -0,0 +1,57 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+try:
+  import msgpack
+except ImportError:
+  msgpack = None
+
+
+# Production renderers
+# FastJSONRenderer encodes with orjson: dicts, lists, str, int, bool and None in C, everything else
+# (Decimal, date, datetime, lazy strings) through the DRF encoder, so the body is byte-identical to
+# JSONRenderer's. Without orjson, or when the client asks for indented JSON, JSONRenderer renders it.
+# MessagePackRenderer is the compact binary format (Accept: application/msgpack or ?format=msgpack),
+# served only when msgpack is installed.
+
+# DRF renders Decimal as a float and datetimes in ISO 8601 with UTC as Z
+encode_default = JSONEncoder().default
+
+if orjson is not None:
+  ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def dumps(data):
+  if orjson is None:
+    return JSONRenderer().render(data)
+  # Line and paragraph separators are escaped as JSONRenderer does, they end JavaScript string literals
+  return orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS).replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONRenderer(JSONRenderer):
+
+  def render(self, data, accepted_media_type=None, renderer_context=None):
+    if data is None or orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+      return super().render(data, accepted_media_type, renderer_context)
+    return dumps(data)
+
+
+class MessagePackRenderer(BaseRenderer):
+  media_type = 'application/msgpack'
+  format = 'msgpack'
+  charset = None
+  render_style = 'binary'
+
+  def render(self, data, accepted_media_type=None, renderer_context=None):
+    if data is None:
+      return b''
+    return msgpack.packb(data, default=encode_default)
+
+
+def msgpack_available():
+  return msgpack is not None
@@ -0,0 +1,101 @@
+from django.core.cache import caches
+from .todict import dotdict
+
+
+# Role resolution shared by the menu, group and order views
+# Group names are loaded with a single query per user and kept in the shared cache (settings.CACHES),
+# the resolved roles are then attached to the request so they are only built once.
+# Every worker process of the host reads the same entries, so invalidate_user_roles takes effect on all
+# of them at once. A per-process cache would keep serving the old roles for ROLES_CACHE_TIMEOUT.
+# The a-prefixed variants do the same through the async cache and ORM APIs for the async views.
+
+MANAGER_GROUP = 'Manager'
+DELIVERY_CREW_GROUP = 'Delivery crew'
+
+ROLES_CACHE = 'shared'
+ROLES_CACHE_KEY = 'user-roles:{}'
+ROLES_CACHE_TIMEOUT = 60 * 5
+
+
+def user_group_names(user):
+  if not user.is_authenticated:
+    return frozenset()
+
+  # Users authenticated by a signed token carry their group names in the token
+  if hasattr(user, 'token_group_names'):
+    return user.token_group_names
+
+  key = ROLES_CACHE_KEY.format(user.pk)
+  group_names = caches[ROLES_CACHE].get(key)
+
+  if group_names is None:
+    group_names = frozenset(user.groups.values_list('name', flat=True))
+    caches[ROLES_CACHE].set(key, group_names, ROLES_CACHE_TIMEOUT)
+
+  return group_names
+
+
+async def auser_group_names(user):
+  if not user.is_authenticated:
+    return frozenset()
+
+  if hasattr(user, 'token_group_names'):
+    return user.token_group_names
+
+  key = ROLES_CACHE_KEY.format(user.pk)
+  group_names = await caches[ROLES_CACHE].aget(key)
+
+  if group_names is None:
+    group_names = frozenset([name async for name in user.groups.values_list('name', flat=True)])
+    await caches[ROLES_CACHE].aset(key, group_names, ROLES_CACHE_TIMEOUT)
+
+  return group_names
+
+
+def user_roles(user):
+  return group_roles(user, user_group_names(user))
+
+
+async def auser_roles(user):
+  return group_roles(user, await auser_group_names(user))
+
+
+def group_roles(user, group_names):
+  is_manager = MANAGER_GROUP in group_names
+  is_delivery_crew = DELIVERY_CREW_GROUP in group_names
+  is_admin = user.is_superuser
+  is_customer = (is_manager == False and is_delivery_crew == False and is_admin == False)
+
+  user_role = {
+    'is_manager': is_manager,
+    'is_delivery_crew': is_delivery_crew,
+    'is_admin': is_admin,
+    'is_customer': is_customer,
+  }
+
+  return dotdict(user_role)
+
+
+def request_roles(request):
+  roles = getattr(request, 'user_roles', None)
+
+  if roles is None:
+    roles = user_roles(request.user)
+    request.user_roles = roles
+
+  return roles
+
+
+async def arequest_roles(request):
+  roles = getattr(request, 'user_roles', None)
+
+  if roles is None:
+    roles = await auser_roles(request.user)
+    request.user_roles = roles
+
+  return roles
+
+
+# Must be called whenever the group membership of a user changes
+def invalidate_user_roles(user):
+  caches[ROLES_CACHE].delete(ROLES_CACHE_KEY.format(user.pk))
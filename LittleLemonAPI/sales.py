@@ -0,0 +1,116 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import connection
+from django.db.models import Count, Sum
+from .models import DailySales, DailyMenuItemSales, DailyCategorySales, OrderItem
+
+
+# Daily sales rollups: totals per day, per day and menu item and per day and category
+# The rollup tables are moved by deltas when orders are created or deleted, every change is a fixed number
+# of INSERT ... ON CONFLICT DO UPDATE statements adding to the stored counts, so the sales report never
+# reads Order or OrderItem. add_orders_sales aggregates existing orders in the database for backfills.
+# Sales stay in the rollups when a menu item or category is deleted later: its rows keep the title it was
+# sold under. Deleting an order subtracts the lines it still has, from every table alike, so the day totals
+# keep matching the sums of the menu item and category rows.
+
+UPSERT_BATCH_SIZE = 500
+
+
+# rows hold the key, then the snapshot and the value columns. Snapshot columns are overwritten, values added.
+def upsert_increments(model, key_columns, value_columns, rows, snapshot_columns=()):
+  table = connection.ops.quote_name(model._meta.db_table)
+  columns = key_columns + list(snapshot_columns) + value_columns
+  placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+
+  for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+    batch = rows[start:start + UPSERT_BATCH_SIZE]
+    sql = (
+      'INSERT INTO ' + table + ' (' + ', '.join(columns) + ') VALUES ' + ', '.join([placeholder] * len(batch)) +
+      ' ON CONFLICT (' + ', '.join(key_columns) + ') DO UPDATE SET ' +
+      ', '.join([column + ' = excluded.' + column for column in snapshot_columns] +
+                [column + ' = ' + table + '.' + column + ' + excluded.' + column for column in value_columns])
+    )
+    with connection.cursor() as cursor:
+      cursor.execute(sql, [value if isinstance(value, int) else str(value) for row in batch for value in row])
+
+
+def cents(value):
+  return Decimal(value or 0).quantize(Decimal('0.01'))
+
+
+# days: {date: (orders, revenue)}
+# lines: [(date, menuitem_id, category_id, menuitem title, category title, quantity, revenue)]
+def add_sales(days, lines, sign=1):
+  day_quantities = defaultdict(int)
+  items = defaultdict(lambda: [0, Decimal(0)])
+  categories = defaultdict(lambda: [0, Decimal(0)])
+  titles = {}
+
+  for date, menuitem_id, category_id, menuitem_title, category_title, quantity, revenue in lines:
+    day_quantities[date] += quantity
+    titles['menuitem', menuitem_id] = menuitem_title
+    titles['category', category_id] = category_title
+    for totals in (items[date, menuitem_id], categories[date, category_id]):
+      totals[0] += quantity
+      totals[1] += cents(revenue)
+
+  upsert_increments(DailySales, ['date'], ['orders', 'quantity', 'revenue'], [
+    (date, sign * orders, sign * day_quantities[date], sign * cents(revenue))
+    for date, (orders, revenue) in days.items()
+  ])
+  upsert_increments(DailyMenuItemSales, ['date', 'menuitem_id'], ['quantity', 'revenue'], [
+    (date, menuitem_id, titles['menuitem', menuitem_id], sign * quantity, sign * revenue)
+    for (date, menuitem_id), (quantity, revenue) in items.items()
+  ], snapshot_columns=['title'])
+  upsert_increments(DailyCategorySales, ['date', 'category_id'], ['quantity', 'revenue'], [
+    (date, category_id, titles['category', category_id], sign * quantity, sign * revenue)
+    for (date, category_id), (quantity, revenue) in categories.items()
+  ], snapshot_columns=['title'])
+
+
+# Values of a cart line or order item read by the rollups
+SALE_LINE_COLUMNS = ('menuitem_id', 'menuitem__category_id', 'menuitem__title', 'menuitem__category__title', 'quantity', 'price')
+
+
+# lines: [{SALE_LINE_COLUMNS}] as read from the cart at checkout
+def record_order_sales(order, lines):
+  add_sales({order.date_created: (1, order.total)}, [
+    (order.date_created,) + tuple(line[column] for column in SALE_LINE_COLUMNS)
+    for line in lines
+  ])
+
+
+# Must be called before the order is deleted, while its items still exist
+# Order items go with a deleted menu item, their sales stay in every table: the day revenue subtracted is
+# the one of the remaining lines, not the order total
+def remove_order_sales(order):
+  lines = [(order.date_created,) + line for line in OrderItem.objects.filter(order=order).values_list(*SALE_LINE_COLUMNS)]
+  add_sales({order.date_created: (1, sum(cents(line[-1]) for line in lines))}, lines, sign=-1)
+
+
+# pre_delete receiver of Order, connected in apps.py: orders deleted from the API, the admin or by the
+# cascade of a deleted user all leave the rollups. pre_delete runs before any row of the delete goes,
+# so the order items are still there. Archiving moves orders with raw SQL and keeps their sales.
+def remove_deleted_order_sales(sender, instance, **kwargs):
+  remove_order_sales(instance)
+
+
+# Adds every order of the queryset to the rollups with two aggregate queries
+# order_items holds the lines of those orders: OrderItem, or OrderHistoryItem for OrderHistory
+def add_orders_sales(orders, order_items=OrderItem.objects):
+  days = {
+    row['date_created']: (row['orders'], row['revenue'])
+    for row in orders.order_by().values('date_created').annotate(orders=Count('id'), revenue=Sum('total'))
+  }
+  lines = (
+    order_items.filter(order__in=orders.order_by().values('id'))
+    .values_list('order__date_created', 'menuitem_id', 'menuitem__category_id', 'menuitem__title', 'menuitem__category__title')
+    .annotate(quantity=Sum('quantity'), revenue=Sum('price'))
+    .order_by()
+  )
+  add_sales(days, list(lines))
+
+
+def clear_sales():
+  for model in (DailySales, DailyMenuItemSales, DailyCategorySales):
+    model.objects.all().delete()
@@ -0,0 +1,44 @@
+import re
+from django.db import connection
+
+
+# Full-text search over menu item titles
+# Uses the FTS5 index created in migration 0020 when it is available, every search term is
+# matched as a word prefix and results default to bm25 relevance order.
+# Other databases, or SQLite builds without FTS5, fall back to title__icontains.
+
+MENU_ITEM_FTS_TABLE = 'LittleLemonAPI_menuitem_fts'
+
+_fts_tables = {}
+
+
+def fts_available():
+  if connection.vendor != 'sqlite':
+    return False
+
+  key = connection.settings_dict['NAME']
+  if key not in _fts_tables:
+    _fts_tables[key] = MENU_ITEM_FTS_TABLE in connection.introspection.table_names()
+  return _fts_tables[key]
+
+
+def fts_query(search):
+  terms = re.findall(r'\w+', search)
+  return ' '.join('"' + term + '"*' for term in terms)
+
+
+def search_menu_items(items, search):
+  query = fts_query(search)
+
+  if not query or not fts_available():
+    return items.filter(title__icontains=search)
+
+  fts_table = '"' + MENU_ITEM_FTS_TABLE + '"'
+  menu_table = '"' + items.model._meta.db_table + '"'
+
+  return items.extra(
+    select={'search_rank': fts_table + '.rank'},
+    tables=[MENU_ITEM_FTS_TABLE],
+    where=[fts_table + '.rowid = ' + menu_table + '.id', fts_table + ' MATCH %s'],
+    params=[query],
+  ).order_by('search_rank', 'id')
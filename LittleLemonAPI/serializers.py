@@ -1,42 +1,54 @@
 from rest_framework import serializers
-from .models import Category, MenuItem, Cart, Order, OrderItem
+from .models import Category, MenuItem, Cart, CartSummary, Order, OrderItem, OrderHistory, OrderHistoryItem, DailySales, DailyMenuItemSales, DailyCategorySales
 from django.contrib.auth.models import User, Group
+from django.db.models import Prefetch
+from .fieldsets import SparseFieldsetSerializer
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetSerializer):
+  prefetch_fields = {'groups': 'groups'}
+
   class Meta:
     model = User
     fields = ['id', 'username', 'email', 'password', 'groups', ]
     
 
-class UserGroupSerializer(serializers.ModelSerializer):
+class UserGroupSerializer(SparseFieldsetSerializer):
   class Meta:
     model = Group
     fields = '__all__'
 
  
-class CategorySerializer(serializers.ModelSerializer):  
+class CategorySerializer(SparseFieldsetSerializer):  
   class Meta:
     model = Category
     fields = ['id', 'slug', 'title']
 
   
-class MenuItemsSerializerGet(serializers.ModelSerializer):
+# Read serializers render related objects through StringRelatedField (__str__),
+# related_columns lists the columns those __str__ methods read so setup_eager_loading
+# joins them and a list is serialized from the main query alone, without one query per row.
+
+class MenuItemsSerializerGet(SparseFieldsetSerializer):
   category = serializers.StringRelatedField()
+  related_columns = {'category': ['category__title']}
+
+  # date_updated is internal, it only feeds the catalog version
   class Meta:
     model = MenuItem
-    fields = '__all__'
+    fields = ['id', 'title', 'price', 'featured', 'category']
     
 
 class MenuItemsSerializer(serializers.ModelSerializer):
   class Meta:
     model = MenuItem
-    fields = '__all__'
+    fields = ['id', 'title', 'price', 'featured', 'category']
     
 
-class CartItemsSerializerGet(serializers.ModelSerializer):
+class CartItemsSerializerGet(SparseFieldsetSerializer):
   user = serializers.StringRelatedField()
   menuitem = serializers.StringRelatedField()
+  related_columns = {'user': ['user__username'], 'menuitem': ['menuitem__title']}
   
   class Meta:
     model = Cart
@@ -49,9 +61,17 @@ class CartItemsSerializer(serializers.ModelSerializer):
     fields = '__all__'
     
     
-class OrderSerializerGet(serializers.ModelSerializer):
+class CartSummarySerializer(SparseFieldsetSerializer):
+  
+  class Meta:
+    model = CartSummary
+    fields = ['lines', 'quantity', 'total']
+    
+    
+class OrderSerializerGet(SparseFieldsetSerializer):
   user = serializers.StringRelatedField()
   delivery_crew = serializers.StringRelatedField()
+  related_columns = {'user': ['user__username'], 'delivery_crew': ['delivery_crew__username']}
   
   class Meta:
     model = Order
@@ -59,6 +79,22 @@ class OrderSerializerGet(serializers.ModelSerializer):
     
 
 
+# Order line embedded in OrderWithItemsSerializerGet, the order itself is the parent
+class OrderLineSerializer(serializers.ModelSerializer):
+  menuitem = serializers.StringRelatedField()
+  
+  class Meta:
+    model = OrderItem
+    fields = ['id', 'menuitem', 'quantity', 'unit_price', 'price']
+
+
+# Order with its lines, the lines of a whole page of orders are loaded with one prefetch query
+class OrderWithItemsSerializerGet(OrderSerializerGet):
+  items = OrderLineSerializer(source='orderitem_set', many=True, read_only=True)
+  prefetch_fields = {'items': Prefetch('orderitem_set', queryset=OrderItem.objects.select_related('menuitem').order_by('id'))}
+
+
+
 class OrderSerializer(serializers.ModelSerializer):
   
   class Meta:
@@ -66,9 +102,11 @@ class OrderSerializer(serializers.ModelSerializer):
     fields = '__all__'
 
 
-class OrderItemsSerializerGet(serializers.ModelSerializer):
+class OrderItemsSerializerGet(SparseFieldsetSerializer):
   order = serializers.StringRelatedField()
   menuitem = serializers.StringRelatedField()
+  # Order.__str__ reads order.user.username
+  related_columns = {'order': ['order__user__username'], 'menuitem': ['menuitem__title']}
   
   class Meta:
     model = OrderItem
@@ -81,3 +119,49 @@ class OrderItemsSerializer(serializers.ModelSerializer):
     model = OrderItem
     fields = '__all__'
 
+
+# Read serializers of the order history views, live and archived orders render the same
+class OrderHistorySerializerGet(OrderSerializerGet):
+
+  class Meta(OrderSerializerGet.Meta):
+    model = OrderHistory
+
+
+class OrderHistoryLineSerializer(OrderLineSerializer):
+
+  class Meta(OrderLineSerializer.Meta):
+    model = OrderHistoryItem
+
+
+class OrderHistoryWithItemsSerializerGet(OrderHistorySerializerGet):
+  items = OrderHistoryLineSerializer(source='orderhistoryitem_set', many=True, read_only=True)
+  prefetch_fields = {'items': Prefetch('orderhistoryitem_set', queryset=OrderHistoryItem.objects.select_related('menuitem').order_by('id'))}
+
+
+class OrderHistoryItemsSerializerGet(OrderItemsSerializerGet):
+
+  class Meta(OrderItemsSerializerGet.Meta):
+    model = OrderHistoryItem
+
+
+class DailySalesSerializer(SparseFieldsetSerializer):
+
+  class Meta:
+    model = DailySales
+    fields = ['date', 'orders', 'quantity', 'revenue']
+
+
+class DailyMenuItemSalesSerializer(SparseFieldsetSerializer):
+  menuitem = serializers.CharField(source='title', read_only=True)
+
+  class Meta:
+    model = DailyMenuItemSales
+    fields = ['date', 'menuitem', 'quantity', 'revenue']
+
+
+class DailyCategorySalesSerializer(SparseFieldsetSerializer):
+  category = serializers.CharField(source='title', read_only=True)
+
+  class Meta:
+    model = DailyCategorySales
+    fields = ['date', 'category', 'quantity', 'revenue']
@@ -0,0 +1,86 @@
+import time
+from django.contrib.auth.models import User
+from django.utils.timezone import now
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from .models import RevokedToken
+from .roles import user_group_names
+
+
+# Signed (JWT) tokens of the opt-in stateless authentication mode
+# Access tokens carry the user id, username, staff flags and group names, so a request is authenticated
+# and its roles resolved without any query. A login session is identified by the jti of its refresh token,
+# copied as the sid claim into every access token made from it. Revoking a session stores that sid in
+# RevokedToken, every process keeps the unexpired sids in memory and reloads them every REVOCATION_SYNC_INTERVAL seconds.
+# Group changes reach the access token on its next refresh, at most ACCESS_TOKEN_LIFETIME later.
+
+SESSION_CLAIM = 'sid'
+ROLES_CLAIM = 'roles'
+REVOCATION_SYNC_INTERVAL = 5
+
+
+class RevocationList:
+
+  def __init__(self):
+    self.sids = frozenset()
+    self.synced_at = None
+
+  def due(self):
+    return self.synced_at is None or time.monotonic() - self.synced_at >= REVOCATION_SYNC_INTERVAL
+
+  def sync(self):
+    self.sids = frozenset(RevokedToken.objects.filter(expires_at__gt=now()).values_list('sid', flat=True))
+    self.synced_at = time.monotonic()
+
+  def add(self, sid):
+    self.sids = self.sids | {sid}
+
+  def __contains__(self, sid):
+    if self.due():
+      self.sync()
+    return sid in self.sids
+
+
+revocations = RevocationList()
+
+
+def access_token(user, sid):
+  token = AccessToken.for_user(user)
+  token['username'] = user.username
+  token['is_staff'] = user.is_staff
+  token['is_superuser'] = user.is_superuser
+  token[ROLES_CLAIM] = sorted(user_group_names(user))
+  token[SESSION_CLAIM] = sid
+  return token
+
+
+def signed_tokens(user):
+  refresh = RefreshToken.for_user(user)
+  sid = refresh[api_settings.JTI_CLAIM]
+  return {'refresh': str(refresh), 'access': str(access_token(user, sid))}
+
+
+# Roles are read again from the database, so a refresh picks up group changes
+def refresh_access(raw_token):
+  refresh = RefreshToken(raw_token)
+  sid = refresh[api_settings.JTI_CLAIM]
+
+  if sid in revocations:
+    raise TokenError('Token has been revoked')
+
+  user = User.objects.filter(pk=refresh[api_settings.USER_ID_CLAIM], is_active=True).first()
+  if user is None:
+    raise TokenError('User not found or inactive')
+
+  return str(access_token(user, sid))
+
+
+def revoke_session(raw_token):
+  refresh = RefreshToken(raw_token)
+  sid = refresh[api_settings.JTI_CLAIM]
+
+  RevokedToken.objects.filter(expires_at__lte=now()).delete()
+  RevokedToken.objects.get_or_create(sid=sid, defaults={'expires_at': datetime_from_epoch(refresh['exp'])})
+  revocations.add(sid)
@@ -0,0 +1,36 @@
+from django.http import StreamingHttpResponse
+from .renderers import dumps
+
+
+# Streamed JSON list responses for large querysets
+# Rows are read with a chunked iterator and each chunk is serialized and written on its own,
+# so worker memory stays bounded by the chunk size whatever the size of the result.
+
+STREAM_CHUNK_SIZE = 500
+
+
+def stream_json_list(queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE):
+  return StreamingHttpResponse(json_list_chunks(queryset, serializer_class, chunk_size), content_type='application/json')
+
+
+def json_list_chunks(queryset, serializer_class, chunk_size):
+  yield b'['
+  separator = b''
+  batch = []
+
+  for obj in queryset.iterator(chunk_size=chunk_size):
+    batch.append(obj)
+    if len(batch) == chunk_size:
+      yield separator + encode_rows(serializer_class(batch, many=True).data)
+      separator = b','
+      batch = []
+
+  if batch:
+    yield separator + encode_rows(serializer_class(batch, many=True).data)
+
+  yield b']'
+
+
+# The rows of a non-empty list without its brackets
+def encode_rows(rows):
+  return dumps(rows)[1:-1]
@@ -1,3 +1,1530 @@
-from django.test import TestCase
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.core.cache import cache, caches
+from django.conf import settings
+from django.contrib.auth.models import User, Group
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from asgiref.sync import async_to_sync
+from django.urls import resolve
+import asyncio
+import datetime
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
+from decimal import Decimal
+from django.core.management import call_command
+from .models import Category, MenuItem, Cart, Order, OrderItem, ArchivedOrder, ArchivedOrderItem, DailySales, DailyMenuItemSales, DailyCategorySales
+from . import asyncviews
+from .cart import build_cart_summary, cart_summary
+from .menucache import bump_menu_version, menu_version
+from .roles import ROLES_CACHE, user_roles, MANAGER_GROUP, DELIVERY_CREW_GROUP
+from .throttling import ThrottleStore, throttle_store
+from .valuesplan import values_plan
+from .pagination import encode_cursor
+from .archive import archive_orders
+from .sales import add_orders_sales
+from .serializers import MenuItemsSerializerGet, OrderSerializerGet, OrderItemsSerializerGet, OrderWithItemsSerializerGet, CartItemsSerializerGet
+from .renderers import FastJSONRenderer, msgpack_available
+from .middleware import negotiate_encoding
+from .database import STICKY_CACHE, ReadWriteRouter, apply_pragmas, mark_sticky, read_alias, read_database, request_read_alias
+from django.http import HttpResponse
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+from rest_framework.renderers import JSONRenderer
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.utils.serializer_helpers import ReturnList
+from django.test import override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
 
 # Create your tests here.
+
+# The per-process default cache and the shared one (a temporary directory of the test run, see
+# LittleLemon/testrunner.py), which outlives the test database
+def clear_caches():
+  for alias in settings.CACHES:
+    caches[alias].clear()
+
+
+class RoleResolutionTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.managers = Group.objects.create(name='Manager')
+    self.delivery_crew = Group.objects.create(name='Delivery crew')
+    self.manager = User.objects.create_user('manager', password='lemon@123!')
+    self.manager.groups.add(self.managers)
+    self.crew = User.objects.create_user('crew', password='lemon@123!')
+    self.client = APIClient()
+    self.client.force_authenticate(self.manager)
+
+  def test_roles_are_resolved_with_one_query_and_cached(self):
+    with self.assertNumQueries(1):
+      roles = user_roles(self.manager)
+    self.assertTrue(roles.is_manager)
+    self.assertFalse(roles.is_customer)
+
+    with self.assertNumQueries(0):
+      user_roles(self.manager)
+
+  def test_group_membership_change_invalidates_cache(self):
+    self.assertFalse(user_roles(self.crew).is_delivery_crew)
+
+    response = self.client.post('/api/groups/delivery-crew/users', {'username': 'crew'})
+    self.assertEqual(response.status_code, 201)
+    self.assertTrue(user_roles(self.crew).is_delivery_crew)
+
+  def test_cached_roles_stay_out_of_the_servers_cache(self):
+    user_roles(self.manager)
+    self.assertNotEqual(caches[ROLES_CACHE]._dir, os.path.abspath(os.path.join(settings.BASE_DIR, 'cache')))
+    self.assertTrue(os.listdir(caches[ROLES_CACHE]._dir))
+
+  def test_invalidation_reaches_every_worker(self):
+    user_roles(self.crew)
+    # Another worker process has its own cache objects on the same shared cache
+    worker_caches = {ROLES_CACHE: caches.create_connection(ROLES_CACHE)}
+    with mock.patch('LittleLemonAPI.roles.caches', worker_caches):
+      self.assertFalse(user_roles(self.crew).is_delivery_crew)
+
+    self.client.post('/api/groups/delivery-crew/users', {'username': 'crew'})
+    with mock.patch('LittleLemonAPI.roles.caches', worker_caches):
+      self.assertTrue(user_roles(self.crew).is_delivery_crew)
+
+
+class CheckoutTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.customer = User.objects.create_user('customer', password='lemon@123!')
+    self.category = Category.objects.create(slug='lunch', title='Lunch')
+    self.client = APIClient()
+    self.client.force_authenticate(self.customer)
+
+  def fill_cart(self, lines):
+    items = MenuItem.objects.bulk_create([
+      MenuItem(title='Item %d' % i, price=Decimal('2.50'), featured=False, category=self.category)
+      for i in range(lines)
+    ])
+    Cart.objects.bulk_create([
+      Cart(user=self.customer, menuitem=item, quantity=2, unit_price=item.price, price=Decimal('5.00'))
+      for item in items
+    ])
+    build_cart_summary(self.customer)
+
+  def checkout_queries(self, lines):
+    self.fill_cart(lines)
+    clear_caches()
+    with CaptureQueriesContext(connection) as context:
+      response = self.client.post('/api/orders')
+    self.assertEqual(response.status_code, 201)
+    return len(context.captured_queries)
+
+  def test_checkout_creates_order_and_clears_cart(self):
+    self.fill_cart(3)
+    response = self.client.post('/api/orders')
+    self.assertEqual(response.status_code, 201)
+
+    order = Order.objects.get(user=self.customer)
+    self.assertEqual(order.total, Decimal('15.00'))
+    self.assertEqual(OrderItem.objects.filter(order=order).count(), 3)
+    self.assertFalse(Cart.objects.filter(user=self.customer).exists())
+
+  def test_checkout_query_count_does_not_depend_on_cart_size(self):
+    small = self.checkout_queries(2)
+    large = self.checkout_queries(40)
+    self.assertEqual(small, large)
+
+  def test_checkout_total_is_rounded_to_cents(self):
+    item = MenuItem.objects.create(title='Falafel', price=Decimal('4.57'), featured=False, category=self.category)
+    Cart.objects.create(user=self.customer, menuitem=item, quantity=3, unit_price=item.price, price=Decimal('13.71'))
+    self.assertEqual(self.client.post('/api/orders').status_code, 201)
+    self.assertEqual(Order.objects.get(user=self.customer).total, Decimal('13.71'))
+
+  def test_checkout_total_of_prices_inexact_in_binary(self):
+    # None of these prices is exact as a float, their float sum is 18.580000000000002
+    for title, price, quantity in (('Falafel', '4.57', 1), ('Shawarma', '4.57', 3), ('Tea', '0.10', 1), ('Water', '0.20', 1)):
+      MenuItem.objects.create(title=title, price=Decimal(price), featured=False, category=self.category)
+      self.assertEqual(self.client.post('/api/cart/menu-items', {'menuitem': title, 'quantity': quantity}).status_code, 201)
+
+    response = self.client.post('/api/orders')
+    self.assertEqual(response.status_code, 201)
+    self.assertEqual(Order.objects.get(user=self.customer).total, Decimal('18.58'))
+
+  def test_checkout_total_matches_lines_edited_behind_the_summary(self):
+    self.fill_cart(2)
+    # An admin edit of a line: same line count, the stored summary is not updated
+    line = Cart.objects.filter(user=self.customer).first()
+    Cart.objects.filter(pk=line.pk).update(quantity=5, price=Decimal('12.50'))
+
+    self.assertEqual(self.client.post('/api/orders').status_code, 201)
+    order = Order.objects.get(user=self.customer)
+    self.assertEqual(order.total, Decimal('17.50'))
+    self.assertEqual(sum(item.price for item in OrderItem.objects.filter(order=order)), order.total)
+
+  def test_checkout_with_empty_cart(self):
+    response = self.client.post('/api/orders')
+    self.assertEqual(response.status_code, 404)
+
+
+class MenuItemsCursorPaginationTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.user = User.objects.create_user('customer', password='lemon@123!')
+    category = Category.objects.create(slug='lunch', title='Lunch')
+    MenuItem.objects.bulk_create([
+      MenuItem(title='Item %02d' % i, price=Decimal(i % 4 + 1), featured=False, category=category)
+      for i in range(10)
+    ])
+    self.client = APIClient()
+    self.client.force_authenticate(self.user)
+
+  def walk(self, ordering):
+    ids = []
+    pages = []
+    cursor = ''
+    while cursor is not None:
+      response = self.client.get('/api/menu-items', {'perpage': 3, 'cursor': cursor, 'ordering': ordering})
+      self.assertEqual(response.status_code, 200)
+      ids += [item['id'] for item in response.data['results']]
+      pages.append(response.data)
+      cursor = response.data['next']
+    return ids, pages
+
+  def test_cursor_pages_follow_ordering(self):
+    ids, pages = self.walk('-price')
+    expected = list(MenuItem.objects.order_by('-price', 'id').values_list('id', flat=True))
+    self.assertEqual(ids, expected)
+    self.assertIsNone(pages[0]['previous'])
+
+    response = self.client.get('/api/menu-items', {'perpage': 3, 'cursor': pages[2]['previous'], 'ordering': '-price'})
+    self.assertEqual([item['id'] for item in response.data['results']], expected[3:6])
+
+  def test_invalid_cursor(self):
+    response = self.client.get('/api/menu-items', {'cursor': 'not-a-cursor'})
+    self.assertEqual(response.status_code, 400)
+
+  def test_tampered_cursor(self):
+    for ordering, values in ((['id'], ['x']), (['id'], [10 ** 20]), (['id'], [[1]]), (['price', 'id'], ['abc', 1])):
+      cursor = encode_cursor(ordering, values, False)
+      response = self.client.get('/api/menu-items', {'cursor': cursor, 'ordering': ','.join(ordering[:-1])})
+      self.assertEqual(response.status_code, 400, values)
+      self.assertEqual(response.data, {'message': 'Invalid cursor'})
+    # A well-formed cursor on id whose value is not an integer ({"o": ["id"], "v": ["x"]}) is answered with 400
+    response = self.client.get('/api/menu-items', {'cursor': 'eyJvIjpbImlkIl0sInYiOlsieCJdLCJyIjpmYWxzZX0='})
+    self.assertEqual(response.status_code, 400)
+
+  def test_page_parameter_still_works(self):
+    response = self.client.get('/api/menu-items', {'perpage': 4, 'page': 3})
+    self.assertEqual(len(response.data), 2)
+
+
+class MenuResponseCacheTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.manager = User.objects.create_user('manager', password='lemon@123!')
+    self.manager.groups.add(Group.objects.create(name='Manager'))
+    self.category = Category.objects.create(slug='lunch', title='Lunch')
+    self.item = MenuItem.objects.create(title='Pancake', price=Decimal('4.00'), featured=False, category=self.category)
+    self.client = APIClient()
+    self.client.force_authenticate(self.manager)
+
+  def test_repeated_reads_are_served_from_cache(self):
+    first = self.client.get('/api/menu-items', {'ordering': 'price, title'})
+    with self.assertNumQueries(0):
+      second = self.client.get('/api/menu-items', {'ordering': 'price,title', 'page': 1})
+    self.assertEqual(first.data, second.data)
+
+    self.client.get('/api/menu-items/%d' % self.item.pk)
+    with self.assertNumQueries(0):
+      self.client.get('/api/menu-items/%d' % self.item.pk)
+
+  def test_writes_invalidate_cached_responses(self):
+    self.client.get('/api/menu-items')
+    self.client.get('/api/menu-items/%d' % self.item.pk)
+
+    self.client.put('/api/menu-items/%d' % self.item.pk, {'title': 'Waffle', 'category': 'Lunch', 'price': 5, 'featured': 1})
+
+    self.assertEqual(self.client.get('/api/menu-items').data[0]['title'], 'Waffle')
+    self.assertEqual(self.client.get('/api/menu-items/%d' % self.item.pk).data['title'], 'Waffle')
+
+
+class CatalogConditionalGetTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.manager = User.objects.create_user('manager', password='lemon@123!')
+    self.manager.groups.add(Group.objects.create(name='Manager'))
+    self.category = Category.objects.create(slug='lunch', title='Lunch')
+    self.item = MenuItem.objects.create(title='Pancake', price=Decimal('4.00'), featured=False, category=self.category)
+    self.client = APIClient()
+    self.client.force_authenticate(self.manager)
+
+  def test_matching_etag_returns_not_modified_without_queries(self):
+    for url in ('/api/menu-items', '/api/menu-items/%d' % self.item.pk, '/api/menu-items/category'):
+      response = self.client.get(url)
+      self.assertEqual(response.status_code, 200)
+      etag = response['ETag']
+
+      with self.assertNumQueries(0):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+      self.assertEqual(response.status_code, 304)
+      self.assertEqual(response['ETag'], etag)
+
+  def test_if_modified_since(self):
+    response = self.client.get('/api/menu-items')
+    response = self.client.get('/api/menu-items', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+    self.assertEqual(response.status_code, 304)
+
+  def test_catalog_write_changes_etag(self):
+    etag = self.client.get('/api/menu-items/category')['ETag']
+    self.client.post('/api/menu-items/category', {'slug': 'dinner', 'title': 'Dinner'})
+
+    response = self.client.get('/api/menu-items/category', HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(response.status_code, 200)
+    self.assertNotEqual(response['ETag'], etag)
+
+
+class MenuItemSearchTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.user = User.objects.create_user('customer', password='lemon@123!')
+    category = Category.objects.create(slug='lunch', title='Lunch')
+    for title in ('Pancake', 'Banana bread', 'Bread pudding', 'Garlic bread with bread dip'):
+      MenuItem.objects.create(title=title, price=Decimal('3.00'), featured=False, category=category)
+    self.client = APIClient()
+    self.client.force_authenticate(self.user)
+
+  def search(self, term, **params):
+    response = self.client.get('/api/menu-items', dict(search=term, **params))
+    self.assertEqual(response.status_code, 200)
+    return [item['title'] for item in response.data]
+
+  def test_prefix_matching_and_ranking(self):
+    titles = self.search('brea')
+    self.assertEqual(set(titles), {'Banana bread', 'Bread pudding', 'Garlic bread with bread dip'})
+    self.assertEqual(self.search('bread pud'), ['Bread pudding'])
+    self.assertEqual(self.search('brea', ordering='-title', perpage=2), ['Garlic bread with bread dip', 'Bread pudding'])
+
+  def test_index_follows_writes(self):
+    item = MenuItem.objects.get(title='Pancake')
+    item.title = 'Waffle'
+    item.save()
+    bump_menu_version()
+    self.assertEqual(self.search('pan'), [])
+    self.assertEqual(self.search('waf'), ['Waffle'])
+
+    item.delete()
+    bump_menu_version()
+    self.assertEqual(self.search('waf'), [])
+
+
+class MenuItemFilterTests(TestCase):
+
+  FILTERS = {
+    'category_slug': 'lunch',
+    'featured': '1',
+    'min_price': '2',
+    'max_price': '8',
+  }
+
+  def setUp(self):
+    clear_caches()
+    self.user = User.objects.create_user('customer', password='lemon@123!')
+    lunch = Category.objects.create(slug='lunch', title='Lunch')
+    dinner = Category.objects.create(slug='dinner', title='Dinner')
+    for price, featured, category in ((1, True, lunch), (3, True, lunch), (5, False, lunch), (7, True, dinner), (9, True, lunch)):
+      MenuItem.objects.create(title='Item %d' % price, price=Decimal(price), featured=featured, category=category)
+    self.client = APIClient()
+    self.client.force_authenticate(self.user)
+
+  def titles(self, **params):
+    response = self.client.get('/api/menu-items', params)
+    self.assertEqual(response.status_code, 200)
+    return sorted(item['title'] for item in response.data)
+
+  def test_range_slug_and_featured_filters(self):
+    self.assertEqual(self.titles(min_price=3, max_price=7), ['Item 3', 'Item 5', 'Item 7'])
+    self.assertEqual(self.titles(category_slug='lunch', featured='true', min_price=2), ['Item 3', 'Item 9'])
+    self.assertEqual(self.titles(featured='0'), ['Item 5'])
+    self.assertEqual(self.client.get('/api/menu-items', {'min_price': 'cheap'}).status_code, 400)
+
+  def test_every_filter_combination_uses_an_index(self):
+    names = list(self.FILTERS)
+    for mask in range(1, 2 ** len(names)):
+      params = {name: self.FILTERS[name] for i, name in enumerate(names) if mask & (1 << i)}
+      clear_caches()
+
+      with CaptureQueriesContext(connection) as context:
+        self.client.get('/api/menu-items', params)
+
+      for query in context.captured_queries:
+        if 'LittleLemonAPI_menuitem' not in query['sql'] or not query['sql'].startswith('SELECT'):
+          continue
+        with connection.cursor() as cursor:
+          cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+          plan = [row[-1] for row in cursor.fetchall()]
+        scans = [step for step in plan if step.startswith('SCAN')]
+        self.assertEqual(scans, [], '%s: %s' % (params, plan))
+
+
+class OrderListTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.manager = User.objects.create_user('manager', password='lemon@123!')
+    self.manager.groups.add(Group.objects.create(name='Manager'))
+    customers = [User.objects.create_user('customer%d' % i, password='lemon@123!') for i in range(3)]
+    crew = User.objects.create_user('crew', password='lemon@123!')
+    Order.objects.bulk_create([
+      Order(user=customers[i % 3], delivery_crew=crew if i % 2 else None, total=Decimal('12.50'))
+      for i in range(120)
+    ])
+    self.client = APIClient()
+    self.client.force_authenticate(self.manager)
+
+  def test_manager_list_is_paginated_without_n_plus_one(self):
+    user_roles(self.manager)
+    with self.assertNumQueries(3):
+      response = self.client.get('/api/orders', {'perpage': 40, 'page': 2})
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(len(response.data), 40)
+    self.assertEqual(response.data[0]['id'], Order.objects.order_by('id')[40].id)
+
+    response = self.client.get('/api/orders')
+    self.assertEqual(len(response.data), 50)
+
+  def test_non_integer_page_is_rejected(self):
+    for page in ('abc', '1.5', ''):
+      response = self.client.get('/api/orders', {'page': page})
+      self.assertEqual(response.status_code, 400, page)
+      self.assertEqual(response.data, {'message': 'page must be an integer'})
+    self.assertEqual(self.client.get('/api/menu-items', {'page': 'abc'}).status_code, 400)
+    self.assertEqual(self.client.get('/api/orders', {'page': 99}).data, [])
+    self.assertEqual(self.client.get('/api/menu-items', {'page': 99}).data, [])
+
+  def test_streamed_list_contains_every_order(self):
+    response = self.client.get('/api/orders', {'stream': 1})
+    self.assertTrue(response.streaming)
+    rows = json.loads(b''.join(response.streaming_content))
+    self.assertEqual(len(rows), 120)
+    self.assertEqual(rows[1]['delivery_crew'], 'crew')
+    self.assertEqual(rows[0]['total'], '12.50')
+
+
+class ListQueryCountTests(TestCase):
+
+  URLS = ('/api/menu-items', '/api/cart/menu-items', '/api/orders', '/api/orders/order-items')
+
+  def setUp(self):
+    clear_caches()
+    self.customer = User.objects.create_user('customer', password='lemon@123!')
+    self.category = Category.objects.create(slug='lunch', title='Lunch')
+    self.client = APIClient()
+    self.client.force_authenticate(self.customer)
+
+  def seed(self, size):
+    items = MenuItem.objects.bulk_create([
+      MenuItem(title='Item %d' % i, price=Decimal('2.00'), featured=False, category=self.category)
+      for i in range(size)
+    ])
+    orders = Order.objects.bulk_create([Order(user=self.customer, total=Decimal('2.00')) for i in range(size)])
+    OrderItem.objects.bulk_create([
+      OrderItem(order=order, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+      for order, item in zip(orders, items)
+    ])
+    Cart.objects.bulk_create([
+      Cart(user=self.customer, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+      for item in items
+    ])
+
+  def query_counts(self):
+    counts = {}
+    for url in self.URLS:
+      clear_caches()
+      with CaptureQueriesContext(connection) as context:
+        self.assertEqual(self.client.get(url).status_code, 200)
+      counts[url] = len(context.captured_queries)
+    return counts
+
+  def test_list_endpoints_run_a_constant_number_of_queries(self):
+    # Creates the catalog version row so it is not counted below
+    menu_version()
+    self.seed(3)
+    small = self.query_counts()
+    self.seed(9)
+    self.assertEqual(self.query_counts(), small)
+
+
+class SeedAndBenchmarkCommandTests(TestCase):
+
+  def test_seed_data_and_benchmark_api(self):
+    call_command('seed_data', scale=0.05, stdout=StringIO())
+    self.assertEqual(Order.objects.count(), 50)
+    self.assertTrue(OrderItem.objects.exists())
+
+    stdout = StringIO()
+    call_command('benchmark_api', iterations=2, warmup=0, only='menu,orders.list', stdout=stdout, stderr=StringIO())
+    self.assertIn('menu.list', stdout.getvalue())
+
+
+class MenuImportExportTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.lunch = Category.objects.create(slug='lunch', title='Lunch')
+    self.pancake = MenuItem.objects.create(title='Pancake', price=Decimal('4.00'), featured=False, category=self.lunch)
+    self.directory = tempfile.TemporaryDirectory()
+    self.addCleanup(self.directory.cleanup)
+
+  def write(self, name, content):
+    path = os.path.join(self.directory.name, name)
+    with open(path, 'w') as f:
+      f.write(content)
+    return path
+
+  def test_csv_import_upserts_and_creates_categories(self):
+    path = self.write('menu.csv', 'id,title,price,featured,category\n,Pancake,4.50,1,Lunch\n,Shawarma,13,0,Dinner\n,Broken,abc,0,Lunch\n')
+    call_command('import_menu', path, create_categories=True, stdout=StringIO(), stderr=StringIO())
+
+    self.pancake.refresh_from_db()
+    self.assertEqual(self.pancake.price, Decimal('4.50'))
+    self.assertTrue(self.pancake.featured)
+    self.assertEqual(MenuItem.objects.get(title='Shawarma').category.title, 'Dinner')
+    self.assertEqual(MenuItem.objects.count(), 2)
+
+  def test_bad_rows_are_skipped_without_aborting_the_import(self):
+    path = self.write('menu.ndjson', '\n'.join([
+      json.dumps({'title': 'Soup', 'price': '5.00', 'featured': False, 'category': 'Lunch'}),
+      '{"title": "Broken",',
+      '[1, 2]',
+      json.dumps({'title': 'Caviar', 'price': '12345.00', 'featured': False, 'category': 'Lunch'}),
+      json.dumps({'title': 'Air', 'price': 'Infinity', 'featured': False, 'category': 'Lunch'}),
+      json.dumps({'title': 'Refund', 'price': '-5.00', 'featured': False, 'category': 'Lunch'}),
+      json.dumps({'title': 'Salad', 'price': '9999.99', 'featured': True, 'category': 'Lunch'}),
+    ]) + '\n')
+    stderr = StringIO()
+    call_command('import_menu', path, stdout=StringIO(), stderr=stderr)
+
+    self.assertEqual(set(MenuItem.objects.values_list('title', flat=True)), {'Pancake', 'Soup', 'Salad'})
+    self.assertEqual([line.split(':')[0] for line in stderr.getvalue().splitlines()], ['Row %d skipped' % i for i in (2, 3, 4, 5, 6)])
+
+  def test_rows_for_the_same_item_by_id_and_title_are_counted_once(self):
+    path = self.write('menu.csv', 'id,title,price,featured,category\n%d,Pancake,4.50,0,Lunch\n,Pancake,4.75,1,Lunch\n,Waffle,5,0,Lunch\n' % self.pancake.id)
+    stdout = StringIO()
+    call_command('import_menu', path, stdout=stdout)
+
+    self.assertIn('1 created, 1 updated, 0 skipped', stdout.getvalue())
+    self.pancake.refresh_from_db()
+    self.assertEqual((self.pancake.price, self.pancake.featured), (Decimal('4.75'), True))
+    self.assertEqual(MenuItem.objects.count(), 2)
+
+  def test_import_batches_run_a_constant_number_of_queries(self):
+    def queries(lines, batch_size):
+      path = self.write('menu.ndjson', ''.join(
+        json.dumps({'title': 'Dish %d-%d' % (lines, i), 'price': '3.00', 'featured': False, 'category': 'Lunch'}) + '\n' for i in range(lines)
+      ))
+      with CaptureQueriesContext(connection) as context:
+        call_command('import_menu', path, batch_size=batch_size, stdout=StringIO())
+      return len(context.captured_queries)
+
+    menu_version()
+    # Three batches each time, only the batch size changes
+    self.assertEqual(queries(30, 10), queries(300, 100))
+
+  def test_export_round_trip(self):
+    path = os.path.join(self.directory.name, 'menu.ndjson')
+    call_command('export_menu', path, stderr=StringIO())
+    with open(path) as f:
+      rows = [json.loads(line) for line in f]
+    self.assertEqual(rows, [{'id': self.pancake.id, 'title': 'Pancake', 'price': '4.00', 'featured': False, 'category': 'Lunch'}])
+
+
+class CartBatchAddTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.customer = User.objects.create_user('customer', password='lemon@123!')
+    category = Category.objects.create(slug='lunch', title='Lunch')
+    for i in range(20):
+      MenuItem.objects.create(title='Item %d' % i, price=Decimal('2.25'), featured=False, category=category)
+    self.client = APIClient()
+    self.client.force_authenticate(self.customer)
+    user_roles(self.customer)
+    cart_summary(self.customer)
+
+  def test_single_add_twice_increments_quantity(self):
+    response = self.client.post('/api/cart/menu-items', {'menuitem': 'Item 1', 'quantity': 2})
+    self.assertEqual(response.status_code, 201)
+    self.assertEqual(response.data['quantity'], 2)
+
+    response = self.client.post('/api/cart/menu-items', {'menuitem': 'Item 1', 'quantity': 3})
+    self.assertEqual(response.status_code, 201)
+    line = Cart.objects.get(user=self.customer)
+    self.assertEqual((line.quantity, line.price), (5, Decimal('11.25')))
+
+  def test_batch_add_costs_the_same_queries_for_any_size(self):
+    def add(titles):
+      with CaptureQueriesContext(connection) as context:
+        response = self.client.post('/api/cart/menu-items', [{'menuitem': title, 'quantity': 1} for title in titles], format='json')
+      self.assertEqual(response.status_code, 201)
+      self.assertEqual(len(response.data), len(set(titles)))
+      return len(context.captured_queries)
+
+    self.assertEqual(add(['Item 0', 'Item 1']), add(['Item %d' % i for i in range(20)] + ['Item 0']))
+    self.assertEqual(Cart.objects.get(user=self.customer, menuitem__title='Item 0').quantity, 3)
+
+  def test_unknown_menu_item(self):
+    response = self.client.post('/api/cart/menu-items', {'items': [{'menuitem': 'Nope', 'quantity': 1}]}, format='json')
+    self.assertEqual(response.status_code, 400)
+    self.assertFalse(Cart.objects.exists())
+
+  def test_invalid_lines_are_rejected(self):
+    for payload in (
+      {'menuitem': ['Item 1'], 'quantity': 1},
+      {'menuitem': 'Item 1', 'quantity': 1.5},
+      {'menuitem': 'Item 1', 'quantity': 40000},
+      # 5000 x 2.25 is over the 6 digits of the line price
+      {'menuitem': 'Item 1', 'quantity': 5000},
+      # Lines that fit on their own, but not in one order total
+      [{'menuitem': 'Item %d' % i, 'quantity': 4000} for i in range(2)],
+    ):
+      response = self.client.post('/api/cart/menu-items', payload, format='json')
+      self.assertEqual(response.status_code, 400, payload)
+      self.assertIn('message', response.data)
+    self.assertFalse(Cart.objects.exists())
+
+    # The quantity already in the cart counts
+    self.client.post('/api/cart/menu-items', {'menuitem': 'Item 1', 'quantity': 4000}, format='json')
+    self.assertEqual(self.client.post('/api/cart/menu-items', {'menuitem': 'Item 1', 'quantity': 1000}, format='json').status_code, 400)
+    self.assertEqual(Cart.objects.get(user=self.customer).quantity, 4000)
+
+  def test_anonymous_users_are_rejected(self):
+    self.client.force_authenticate(None)
+    response = self.client.post('/api/cart/menu-items', {'menuitem': 'Item 1', 'quantity': 1})
+    self.assertEqual(response.status_code, 401)
+    self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 401)
+
+
+class CartSummaryTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.customer = User.objects.create_user('customer', password='lemon@123!')
+    category = Category.objects.create(slug='lunch', title='Lunch')
+    MenuItem.objects.create(title='Pancake', price=Decimal('4.50'), featured=False, category=category)
+    MenuItem.objects.create(title='Waffle', price=Decimal('3.25'), featured=False, category=category)
+    self.client = APIClient()
+    self.client.force_authenticate(self.customer)
+
+  def summary(self):
+    response = self.client.get('/api/cart/summary')
+    self.assertEqual(response.status_code, 200)
+    return response.data
+
+  def test_summary_follows_cart_writes_and_checkout(self):
+    self.assertEqual(self.summary(), {'lines': 0, 'quantity': 0, 'total': '0.00'})
+
+    self.client.post('/api/cart/menu-items', [{'menuitem': 'Pancake', 'quantity': 2}, {'menuitem': 'Waffle', 'quantity': 1}], format='json')
+    self.client.post('/api/cart/menu-items', {'menuitem': 'Pancake', 'quantity': 1})
+    self.assertEqual(self.summary(), {'lines': 2, 'quantity': 4, 'total': '16.75'})
+
+    with self.assertNumQueries(1):
+      self.client.get('/api/cart/summary')
+
+    self.assertEqual(self.client.post('/api/orders').status_code, 201)
+    self.assertEqual(Order.objects.get(user=self.customer).total, Decimal('16.75'))
+    self.assertEqual(self.summary(), {'lines': 0, 'quantity': 0, 'total': '0.00'})
+
+  def test_missing_summary_is_rebuilt_from_cart(self):
+    item = MenuItem.objects.get(title='Waffle')
+    Cart.objects.create(user=self.customer, menuitem=item, quantity=2, unit_price=item.price, price=Decimal('6.50'))
+    self.assertEqual(self.summary(), {'lines': 1, 'quantity': 2, 'total': '6.50'})
+
+    self.client.delete('/api/cart/menu-items')
+    self.assertEqual(self.summary()['lines'], 0)
+
+
+class AsyncReadViewTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    lunch = Category.objects.create(slug='lunch', title='Lunch')
+    items = MenuItem.objects.bulk_create([
+      MenuItem(title='Pancake %d' % i, price=Decimal(i + 1), featured=bool(i % 2), category=lunch)
+      for i in range(12)
+    ])
+    self.customer = User.objects.create_user('customer', password='lemon@123!')
+    self.manager = User.objects.create_user('manager', password='lemon@123!')
+    self.manager.groups.add(Group.objects.create(name='Manager'))
+    Cart.objects.create(user=self.customer, menuitem=items[0], quantity=2, unit_price=items[0].price, price=items[0].price * 2)
+    self.orders = Order.objects.bulk_create([Order(user=self.customer, total=Decimal('12.50')) for i in range(5)])
+    self.tokens = {user.username: Token.objects.create(user=user).key for user in (self.customer, self.manager)}
+    self.client = APIClient()
+
+  def sync_get(self, username, url, params=None, **headers):
+    if username:
+      headers['HTTP_AUTHORIZATION'] = 'Token ' + self.tokens[username]
+    return self.client.get(url, params, **headers)
+
+  def async_get(self, username, url, params=None, **headers):
+    if username:
+      headers['authorization'] = 'Token ' + self.tokens[username]
+    async def get():
+      return await self.async_client.get(url, params or {}, **headers)
+    with self.settings(ROOT_URLCONF='LittleLemon.asgi_urls'):
+      return async_to_sync(get)()
+
+  def test_read_routes_are_async(self):
+    for url in ('/api/menu-items', '/api/menu-items/1', '/api/menu-items/category', '/api/cart/menu-items', '/api/orders', '/api/orders/1'):
+      self.assertTrue(asyncio.iscoroutinefunction(resolve(url, urlconf='LittleLemon.asgi_urls').func), url)
+
+  def test_async_responses_match_drf_views(self):
+    requests = [
+      ('customer', '/api/menu-items', {'perpage': 5, 'page': 2, 'ordering': '-price'}),
+      ('customer', '/api/menu-items', {'featured': 1, 'min_price': 3}),
+      ('customer', '/api/menu-items', {'search': 'panc'}),
+      ('customer', '/api/menu-items', {'featured': 'maybe'}),
+      ('customer', '/api/menu-items', {'cursor': '', 'perpage': 4, 'ordering': 'price'}),
+      ('customer', '/api/menu-items/%d' % MenuItem.objects.first().pk, None),
+      ('customer', '/api/menu-items/999', None),
+      ('customer', '/api/menu-items/category', None),
+      ('customer', '/api/cart/menu-items', None),
+      ('manager', '/api/cart/menu-items', None),
+      ('customer', '/api/orders', {'perpage': 2, 'page': 2}),
+      ('customer', '/api/orders', {'page': 'abc'}),
+      ('customer', '/api/menu-items', {'page': '1.5'}),
+      ('manager', '/api/orders', {'cursor': '', 'perpage': 3}),
+      ('customer', '/api/orders/%d' % self.orders[0].pk, None),
+      ('customer', '/api/orders/999', None),
+      (None, '/api/menu-items', None),
+    ]
+
+    for username, url, params in requests:
+      clear_caches()
+      expected = self.sync_get(username, url, params)
+      clear_caches()
+      with mock.patch('LittleLemonAPI.asyncviews.json_response', wraps=asyncviews.json_response) as json_response:
+        response = self.async_get(username, url, params)
+      # Unauthenticated requests fall through to the DRF view for its exact error
+      self.assertEqual(json_response.called, username is not None, url)
+      self.assertEqual(response.status_code, expected.status_code, url)
+      self.assertEqual(response.content, expected.content, url)
+      self.assertEqual(response.get('ETag'), expected.get('ETag'), url)
+      self.assertEqual(response['Content-Type'], expected['Content-Type'], url)
+
+  def test_conditional_get_and_fallbacks(self):
+    etag = self.async_get('customer', '/api/menu-items')['ETag']
+    self.assertEqual(self.async_get('customer', '/api/menu-items', **{'if-none-match': etag}).status_code, 304)
+
+    # Other renderers and streamed lists are answered by the DRF views
+    response = self.async_get('customer', '/api/menu-items', accept='text/html')
+    self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+    response = self.async_get('customer', '/api/orders', {'stream': 1})
+    self.assertTrue(response.streaming)
+
+  def test_asgi_requests_are_routed_and_writes_succeed(self):
+    json_response = asyncviews.json_response
+    aliases = []
+    def capture(*args, **kwargs):
+      aliases.append(read_alias.get())
+      return json_response(*args, **kwargs)
+
+    # Creating the catalog version row would be a write, which pins the request to the primary
+    menu_version()
+    with mock.patch('LittleLemonAPI.middleware.request_read_alias', return_value='read'), mock.patch('LittleLemonAPI.asyncviews.json_response', side_effect=capture):
+      self.assertEqual(self.async_get('customer', '/api/menu-items').status_code, 200)
+    # The alias is still set while the async view runs
+    self.assertEqual(aliases, ['read'])
+
+    async def post():
+      return await self.async_client.post(
+        '/api/cart/menu-items', {'menuitem': 'Pancake 3', 'quantity': 2}, content_type='application/json',
+        authorization='Token ' + self.tokens['customer'],
+      )
+    with self.settings(ROOT_URLCONF='LittleLemon.asgi_urls'):
+      response = async_to_sync(post)()
+    self.assertEqual(response.status_code, 201)
+    self.assertEqual(Cart.objects.get(user=self.customer, menuitem__title='Pancake 3').quantity, 2)
+
+
+class SignedTokenAuthTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.customer = User.objects.create_user('customer', password='lemon@123!')
+    self.manager = User.objects.create_user('manager', password='lemon@123!')
+    self.manager.groups.add(Group.objects.create(name='Manager'))
+    self.order = Order.objects.create(user=self.customer, total=Decimal('12.50'))
+    self.client = APIClient()
+
+  def login(self, username, **data):
+    response = self.client.post('/token/login/', {'username': username, 'password': 'lemon@123!', **data})
+    self.assertEqual(response.status_code, 200)
+    return response.data
+
+  def get(self, url, access):
+    return self.client.get(url, HTTP_AUTHORIZATION='Bearer ' + access)
+
+  def test_plain_login_still_returns_a_token(self):
+    self.assertEqual(set(self.login('customer')), {'token'})
+
+  def test_signed_tokens_authenticate_without_queries(self):
+    access = self.login('manager', signed=1)['access']
+    self.get('/api/cart/summary', access)
+
+    # Only the cart summary read is left, the token and group lookups are gone
+    with self.assertNumQueries(1):
+      response = self.get('/api/cart/summary', access)
+    self.assertEqual(response.status_code, 200)
+
+    # Roles come from the token
+    self.assertEqual(self.get('/api/groups/manager/users', access).status_code, 200)
+
+    access = self.login('customer', signed='true')['access']
+    self.assertEqual(self.get('/api/orders/%d' % self.order.pk, access).status_code, 200)
+    self.assertEqual(self.get('/api/users/users/me/', access).data['username'], 'customer')
+
+  def test_refresh_picks_up_group_changes(self):
+    tokens = self.login('customer', signed=1)
+    self.assertEqual(self.get('/api/groups/manager/users', tokens['access']).status_code, 401)
+
+    manager_access = self.login('manager', signed=1)['access']
+    self.client.post('/api/groups/manager/users', {'username': 'customer'}, HTTP_AUTHORIZATION='Bearer ' + manager_access)
+    # The old access token keeps its roles until it is refreshed
+    self.assertEqual(self.get('/api/groups/manager/users', tokens['access']).status_code, 401)
+    access = self.client.post('/token/login/', {'refresh': tokens['refresh']}).data['access']
+    self.assertEqual(self.get('/api/groups/manager/users', access).status_code, 200)
+
+  def test_revoked_session_is_rejected(self):
+    tokens = self.login('customer', signed=1)
+    self.assertEqual(self.client.post('/token/logout/', {'refresh': tokens['refresh']}).status_code, 200)
+
+    self.assertEqual(self.get('/api/orders', tokens['access']).status_code, 401)
+    self.assertEqual(self.client.post('/token/login/', {'refresh': tokens['refresh']}).status_code, 401)
+    self.assertEqual(self.get('/api/orders', 'not-a-token').status_code, 401)
+
+  def test_async_views_accept_signed_tokens(self):
+    access = self.login('customer', signed=1)['access']
+
+    async def get():
+      return await self.async_client.get('/api/orders', authorization='Bearer ' + access)
+
+    with self.settings(ROOT_URLCONF='LittleLemon.asgi_urls'):
+      with mock.patch('LittleLemonAPI.asyncviews.json_response', wraps=asyncviews.json_response) as json_response:
+        response = async_to_sync(get)()
+    self.assertTrue(json_response.called)
+    self.assertEqual(json.loads(response.content)[0]['id'], self.order.pk)
+
+
+class SharedThrottleTests(TestCase):
+
+  RATES = {'browse': '3/minute', 'checkout': '2/minute'}
+
+  def setUp(self):
+    throttle_store().clear()
+    self.customer = User.objects.create_user('customer', password='lemon@123!')
+    self.token = Token.objects.create(user=self.customer).key
+    self.client = APIClient()
+    self.client.force_authenticate(self.customer)
+    rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': self.RATES}
+    self.enterContext(self.settings(REST_FRAMEWORK=rest_framework))
+
+  def test_scopes_have_separate_budgets(self):
+    self.assertEqual([self.client.post('/api/orders').status_code for i in range(3)], [404, 404, 429])
+    # Orders can still be listed and the menu browsed
+    self.assertNotEqual(self.client.get('/api/orders').status_code, 429)
+    self.assertEqual([self.client.get('/api/menu-items').status_code for i in range(4)], [200, 200, 200, 429])
+    self.assertEqual(self.client.get('/api/menu-items/category').status_code, 429)
+
+  def test_async_views_share_the_budget(self):
+    self.assertEqual(self.client.get('/api/menu-items').status_code, 200)
+
+    async def get():
+      return await self.async_client.get('/api/menu-items/category', authorization='Token ' + self.token)
+
+    with self.settings(ROOT_URLCONF='LittleLemon.asgi_urls'):
+      self.assertEqual([async_to_sync(get)().status_code for i in range(3)], [200, 200, 429])
+
+  def test_counters_are_shared_between_connections(self):
+    with tempfile.TemporaryDirectory() as directory:
+      database = os.path.join(directory, 'throttle.sqlite3')
+      # Two stores on the same file stand for two worker processes
+      workers = [ThrottleStore(database), ThrottleStore(database)]
+      allowed = [workers[i % 2].hit('checkout_1', 100, 1.0, 5)[0] for i in range(8)]
+      self.assertEqual(allowed, [True] * 5 + [False] * 3)
+
+      # Half way through the next window, half of the previous count still applies: 2.5 + 3 would exceed 5
+      self.assertEqual(sum(workers[i % 2].hit('checkout_1', 101, 0.5, 5)[0] for i in range(8)), 3)
+
+
+class SalesRollupTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    throttle_store().clear()
+    self.customer = User.objects.create_user('customer', password='lemon@123!')
+    self.manager = User.objects.create_user('manager', password='lemon@123!')
+    self.manager.groups.add(Group.objects.create(name=MANAGER_GROUP))
+    lunch = Category.objects.create(slug='lunch', title='Lunch')
+    dessert = Category.objects.create(slug='dessert', title='Dessert')
+    self.soup = MenuItem.objects.create(title='Soup', price=Decimal('4.50'), featured=False, category=lunch)
+    self.salad = MenuItem.objects.create(title='Salad', price=Decimal('6.25'), featured=False, category=lunch)
+    self.cake = MenuItem.objects.create(title='Cake', price=Decimal('3.10'), featured=False, category=dessert)
+    self.client = APIClient()
+
+  def checkout(self, lines):
+    Cart.objects.bulk_create([
+      Cart(user=self.customer, menuitem=item, quantity=quantity, unit_price=item.price, price=item.price * quantity)
+      for item, quantity in lines
+    ])
+    build_cart_summary(self.customer)
+    self.client.force_authenticate(self.customer)
+    self.assertEqual(self.client.post('/api/orders').status_code, 201)
+    return Order.objects.latest('id')
+
+  def rollups(self):
+    return (
+      list(DailySales.objects.order_by('date').values_list('date', 'orders', 'quantity', 'revenue')),
+      list(DailyMenuItemSales.objects.order_by('date', 'menuitem_id').values_list('date', 'menuitem_id', 'quantity', 'revenue')),
+      list(DailyCategorySales.objects.order_by('date', 'category_id').values_list('date', 'category_id', 'quantity', 'revenue')),
+    )
+
+  def test_checkout_and_delete_update_the_rollups(self):
+    order = self.checkout([(self.soup, 2), (self.cake, 1)])
+    self.checkout([(self.soup, 1), (self.salad, 3)])
+    day = order.date_created
+
+    self.assertEqual(DailySales.objects.get(date=day).revenue, Decimal('35.35'))
+    self.assertEqual((DailySales.objects.get(date=day).orders, DailySales.objects.get(date=day).quantity), (2, 7))
+    self.assertEqual(DailyMenuItemSales.objects.get(date=day, menuitem=self.soup).quantity, 3)
+    self.assertEqual(DailyCategorySales.objects.get(date=day, category=self.soup.category).revenue, Decimal('32.25'))
+
+    self.client.force_authenticate(self.manager)
+    self.assertEqual(self.client.delete('/api/orders/%d' % order.id).status_code, 200)
+    self.assertEqual(DailySales.objects.get(date=day).revenue, Decimal('23.25'))
+    self.assertEqual(DailyMenuItemSales.objects.get(date=day, menuitem=self.soup).quantity, 1)
+    self.assertEqual(DailyCategorySales.objects.get(date=day, category=self.cake.category).revenue, Decimal('0.00'))
+
+  def test_backfill_matches_incremental_rollups(self):
+    for lines in ([(self.soup, 2), (self.cake, 1)], [(self.salad, 1)], [(self.cake, 4), (self.soup, 1)]):
+      self.checkout(lines)
+    incremental = self.rollups()
+
+    call_command('backfill_sales', batch_size=2, stdout=StringIO())
+    self.assertEqual(self.rollups(), incremental)
+
+  def test_report_reads_only_the_rollups(self):
+    order = self.checkout([(self.soup, 2), (self.cake, 1)])
+    self.client.force_authenticate(self.manager)
+
+    with CaptureQueriesContext(connection) as context:
+      response = self.client.get('/api/reports/sales', {'by': 'category'})
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response.data[0]['category'], 'Lunch')
+    self.assertEqual(response.data[0]['revenue'], '9.00')
+    self.assertFalse(any('littlelemonapi_order' in query['sql'].lower() for query in context.captured_queries))
+
+    response = self.client.get('/api/reports/sales')
+    self.assertEqual(response.data, [{'date': order.date_created.isoformat(), 'orders': 1, 'quantity': 3, 'revenue': '12.10'}])
+    self.assertEqual(self.client.get('/api/reports/sales', {'to': '2000-01-01'}).data, [])
+    self.assertEqual(self.client.get('/api/reports/sales', {'from': 'yesterday'}).status_code, 400)
+    self.assertEqual(self.client.get('/api/reports/sales', {'by': 'week'}).status_code, 400)
+
+  def test_sales_of_deleted_menu_items_are_kept(self):
+    order = self.checkout([(self.soup, 2), (self.cake, 1)])
+    self.checkout([(self.cake, 2), (self.salad, 1)])
+    day = order.date_created
+    self.cake.delete()
+    self.assertEqual(DailyMenuItemSales.objects.get(date=day, menuitem=None).title, 'Cake')
+
+    self.client.force_authenticate(self.manager)
+    response = self.client.get('/api/reports/sales', {'by': 'menuitem'})
+    self.assertEqual([(row['menuitem'], row['quantity']) for row in response.data], [('Cake', 3), ('Soup', 2), ('Salad', 1)])
+
+    # The order loses its cake line with the menu item, the day total keeps agreeing with the other tables
+    self.assertEqual(self.client.delete('/api/orders/%d' % order.id).status_code, 200)
+    days, items, categories = self.rollups()
+    self.assertEqual(days, [(day, 1, 4, Decimal('15.55'))])
+    for rows in (items, categories):
+      self.assertEqual((sum(row[2] for row in rows), sum(row[3] for row in rows)), (4, Decimal('15.55')))
+
+  def test_orders_deleted_outside_the_api_leave_the_rollups(self):
+    self.checkout([(self.soup, 2), (self.cake, 1)])
+    self.checkout([(self.salad, 1)])
+    Order.objects.filter(total=Decimal('6.25')).delete()
+    self.assertEqual(self.rollups()[0], [(Order.objects.get().date_created, 1, 3, Decimal('12.10'))])
+
+    # Deleting the customer deletes the orders by cascade
+    self.customer.delete()
+    days, items, categories = self.rollups()
+    self.assertEqual([row[1:] for row in days], [(0, 0, Decimal('0.00'))])
+    self.assertEqual({row[2:] for row in items + categories}, {(0, Decimal('0.00'))})
+
+  def test_report_range_is_bounded(self):
+    self.client.force_authenticate(self.manager)
+    self.assertEqual(self.client.get('/api/reports/sales', {'from': '2023-01-01', 'to': '2023-12-31'}).status_code, 200)
+    response = self.client.get('/api/reports/sales', {'from': '2023-01-01', 'to': '2024-12-31'})
+    self.assertEqual(response.status_code, 400)
+    self.assertEqual(response.data, {'message': 'from and to must span at most 366 days'})
+
+  def test_report_is_for_managers_only(self):
+    self.client.force_authenticate(self.customer)
+    self.assertEqual(self.client.get('/api/reports/sales').status_code, 401)
+
+
+class AutoAssignTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.customer = User.objects.create_user('customer', password='lemon@123!')
+    self.manager = User.objects.create_user('manager', password='lemon@123!')
+    self.manager.groups.add(Group.objects.create(name=MANAGER_GROUP))
+    crew_group = Group.objects.create(name=DELIVERY_CREW_GROUP)
+    self.crew = [User.objects.create_user('crew-%d' % i, password='lemon@123!') for i in range(3)]
+    crew_group.user_set.add(*self.crew)
+    self.client = APIClient()
+    self.client.force_authenticate(self.manager)
+
+  def create_orders(self, count, **fields):
+    return Order.objects.bulk_create([Order(user=self.customer, total=Decimal('10.00'), **fields) for i in range(count)])
+
+  def open_orders(self, crew):
+    return Order.objects.filter(delivery_crew=crew, status=False).count()
+
+  def test_orders_are_spread_by_open_order_load(self):
+    self.create_orders(4, delivery_crew=self.crew[0])
+    self.create_orders(1, delivery_crew=self.crew[1])
+    # Delivered orders do not count towards the load
+    self.create_orders(5, delivery_crew=self.crew[1], status=True)
+    self.create_orders(7)
+
+    response = self.client.post('/api/orders/assign')
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response.data['assigned'], 7)
+    self.assertEqual([self.open_orders(crew) for crew in self.crew], [4, 4, 4])
+    self.assertEqual([row['open_orders'] for row in response.data['delivery_crew']], [4, 4, 4])
+    self.assertFalse(Order.objects.filter(delivery_crew__isnull=True).exists())
+
+    self.assertEqual(self.client.post('/api/orders/assign').status_code, 404)
+
+  def test_query_count_does_not_depend_on_order_count(self):
+    def assign_queries(count):
+      self.create_orders(count)
+      with CaptureQueriesContext(connection) as context:
+        self.assertEqual(self.client.post('/api/orders/assign').status_code, 200)
+      return len(context.captured_queries)
+
+    # Resolves and caches the manager roles
+    self.assertEqual(self.client.post('/api/orders/assign').status_code, 404)
+    self.assertEqual(assign_queries(9), assign_queries(300))
+
+  def test_limit_assigns_oldest_orders_first(self):
+    orders = self.create_orders(5)
+    response = self.client.post('/api/orders/assign', {'limit': 2})
+    self.assertEqual(response.data['assigned'], 2)
+    self.assertEqual(list(Order.objects.filter(delivery_crew__isnull=False).values_list('id', flat=True)), [order.id for order in orders[:2]])
+
+  def test_managers_only_and_crew_required(self):
+    self.create_orders(1)
+    self.client.force_authenticate(self.customer)
+    self.assertEqual(self.client.post('/api/orders/assign').status_code, 401)
+
+    Group.objects.get(name=DELIVERY_CREW_GROUP).user_set.clear()
+    self.client.force_authenticate(self.manager)
+    self.assertEqual(self.client.post('/api/orders/assign').status_code, 400)
+
+
+class BulkOrderStatusTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.customer = User.objects.create_user('customer', password='lemon@123!')
+    self.manager = User.objects.create_user('manager', password='lemon@123!')
+    self.manager.groups.add(Group.objects.create(name=MANAGER_GROUP))
+    crew_group = Group.objects.create(name=DELIVERY_CREW_GROUP)
+    self.crew = User.objects.create_user('crew', password='lemon@123!')
+    self.other_crew = User.objects.create_user('other-crew', password='lemon@123!')
+    crew_group.user_set.add(self.crew, self.other_crew)
+    self.orders = Order.objects.bulk_create(
+      [Order(user=self.customer, delivery_crew=self.crew, total=Decimal('10.00')) for i in range(3)]
+      + [Order(user=self.customer, delivery_crew=self.other_crew, total=Decimal('10.00'))]
+    )
+    self.client = APIClient()
+
+  def update(self, user, order_ids, order_status=1):
+    self.client.force_authenticate(user)
+    return self.client.patch('/api/orders/status', {'orders': order_ids, 'status': order_status}, format='json')
+
+  def test_crew_only_update_their_own_orders(self):
+    ids = [order.id for order in self.orders]
+    response = self.update(self.crew, ids + [9999])
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response.data['updated'], 3)
+    self.assertEqual([row['result'] for row in response.data['results']], ['updated'] * 3 + ['not_assigned_to_you', 'not_found'])
+    self.assertEqual(list(Order.objects.order_by('id').values_list('status', flat=True)), [True, True, True, False])
+
+  def test_managers_update_any_order_with_one_update(self):
+    ids = [order.id for order in self.orders]
+    self.update(self.manager, ids[:1])
+    with CaptureQueriesContext(connection) as context:
+      response = self.update(self.manager, ids)
+    self.assertEqual(response.data['updated'], 4)
+    self.assertEqual(sum(query['sql'].startswith('UPDATE') for query in context.captured_queries), 1)
+
+    self.update(self.manager, ids, 0)
+    self.assertFalse(Order.objects.filter(status=True).exists())
+
+  def test_form_payload(self):
+    self.client.force_authenticate(self.crew)
+    response = self.client.patch('/api/orders/status', {'orders': [self.orders[0].id, self.orders[1].id], 'status': '1'})
+    self.assertEqual(response.data['updated'], 2)
+
+  def test_invalid_requests(self):
+    self.assertEqual(self.update(self.customer, [self.orders[0].id]).status_code, 401)
+    self.assertEqual(self.update(self.crew, []).status_code, 400)
+    self.assertEqual(self.update(self.crew, ['first']).status_code, 400)
+    self.assertEqual(self.update(self.crew, [self.orders[0].id], 'delivered').status_code, 400)
+    # Out of SQLite's 64-bit integer range, floats and booleans are not order ids
+    for order_id in (10 ** 20, -10 ** 20, str(10 ** 20), self.orders[0].id + 0.9, True):
+      self.assertEqual(self.update(self.manager, [order_id]).status_code, 400, order_id)
+    self.assertFalse(Order.objects.filter(status=True).exists())
+    self.assertEqual(self.update(self.manager, [str(self.orders[0].id)]).data['updated'], 1)
+
+
+class OrderWithItemsTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.customer = User.objects.create_user('customer', password='lemon@123!')
+    self.token = Token.objects.create(user=self.customer).key
+    category = Category.objects.create(slug='lunch', title='Lunch')
+    items = MenuItem.objects.bulk_create([
+      MenuItem(title='Item %d' % i, price=Decimal('2.00'), featured=False, category=category) for i in range(4)
+    ])
+    self.orders = Order.objects.bulk_create([Order(user=self.customer, total=Decimal('8.00')) for i in range(30)])
+    OrderItem.objects.bulk_create([
+      OrderItem(order=order, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+      for order in self.orders
+      for item in items[:1 + order.id % 4]
+    ])
+    self.client = APIClient()
+    self.client.force_authenticate(self.customer)
+
+  def test_orders_embed_their_lines_with_a_fixed_number_of_queries(self):
+    user_roles(self.customer)
+    with self.assertNumQueries(4):
+      small = self.client.get('/api/orders', {'include': 'items', 'perpage': 5})
+    with self.assertNumQueries(4):
+      large = self.client.get('/api/orders', {'include': 'items', 'perpage': 25, 'page': 1})
+    self.assertEqual(len(small.data), 5)
+    self.assertEqual(len(large.data), 25)
+
+    order = large.data[2]
+    self.assertEqual(order['id'], self.orders[2].id)
+    self.assertEqual(len(order['items']), 1 + order['id'] % 4)
+    self.assertEqual(order['items'][0], {'id': order['items'][0]['id'], 'menuitem': 'Item 0', 'quantity': 1, 'unit_price': '2.00', 'price': '2.00'})
+    # Without the option the list is unchanged
+    self.assertNotIn('items', self.client.get('/api/orders').data[0])
+
+  def test_cursor_stream_and_detail(self):
+    response = self.client.get('/api/orders', {'include': 'items', 'cursor': '', 'perpage': 10})
+    self.assertEqual([len(order['items']) for order in response.data['results']], [1 + order.id % 4 for order in self.orders[:10]])
+
+    rows = json.loads(b''.join(self.client.get('/api/orders', {'include': 'items', 'stream': 1}).streaming_content))
+    self.assertEqual(sum(len(order['items']) for order in rows), OrderItem.objects.count())
+
+    response = self.client.get('/api/orders/%d' % self.orders[3].id, {'include': 'items'})
+    self.assertEqual(len(response.data['items']), 1 + self.orders[3].id % 4)
+
+  def test_async_views_embed_the_same_lines(self):
+    async def get(path):
+      return await self.async_client.get(path, {'include': 'items', 'perpage': 10}, authorization='Token ' + self.token)
+
+    sync_data = self.client.get('/api/orders', {'include': 'items', 'perpage': 10}).content
+    with self.settings(ROOT_URLCONF='LittleLemon.asgi_urls'):
+      self.assertEqual(async_to_sync(get)('/api/orders').content, sync_data)
+
+
+class SparseFieldsetTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.customer = User.objects.create_user('customer', password='lemon@123!')
+    self.token = Token.objects.create(user=self.customer).key
+    self.admin = User.objects.create_superuser('admin', password='lemon@123!')
+    category = Category.objects.create(slug='lunch', title='Lunch')
+    self.items = MenuItem.objects.bulk_create([
+      MenuItem(title='Item %d' % i, price=Decimal(i + 1), featured=False, category=category) for i in range(12)
+    ])
+    self.orders = Order.objects.bulk_create([Order(user=self.customer, total=Decimal('8.00')) for i in range(3)])
+    OrderItem.objects.bulk_create([
+      OrderItem(order=order, menuitem=self.items[0], quantity=1, unit_price=Decimal('1.00'), price=Decimal('1.00')) for order in self.orders
+    ])
+    self.client = APIClient()
+    self.client.force_authenticate(self.customer)
+    user_roles(self.customer)
+    menu_version()
+
+  def get_sql(self, path, params):
+    connection.queries_log.clear()
+    with CaptureQueriesContext(connection) as context:
+      response = self.client.get(path, params)
+    self.assertEqual(response.status_code, 200)
+    return response, [query['sql'] for query in context.captured_queries]
+
+  def test_fields_narrow_output_and_sql(self):
+    response, queries = self.get_sql('/api/menu-items', {'fields': 'id, title'})
+    self.assertEqual(response.data[0], {'id': self.items[0].id, 'title': 'Item 0'})
+    select = [sql for sql in queries if 'littlelemonapi_menuitem' in sql.lower()][-1]
+    self.assertNotIn('JOIN', select)
+    self.assertNotIn('"price"', select)
+
+    response, queries = self.get_sql('/api/menu-items', {'exclude': 'category,featured'})
+    self.assertEqual(list(response.data[0]), ['id', 'title', 'price'])
+    self.assertFalse(any('JOIN' in sql for sql in queries))
+
+    response, queries = self.get_sql('/api/menu-items', {'fields': 'title,category'})
+    self.assertEqual(response.data[0], {'title': 'Item 0', 'category': 'Lunch'})
+
+  def test_unknown_fields_are_rejected(self):
+    response = self.client.get('/api/menu-items', {'fields': 'id,colour'})
+    self.assertEqual(response.status_code, 400)
+    self.assertIn('colour', response.data['message'])
+    self.assertEqual(self.client.get('/api/orders', {'exclude': 'items'}).status_code, 400)
+
+  def test_cursor_pages_load_their_ordering_columns(self):
+    with self.assertNumQueries(1):
+      response = self.client.get('/api/menu-items', {'fields': 'title', 'cursor': '', 'ordering': '-price', 'perpage': 5})
+    self.assertEqual([row['title'] for row in response.data['results']], ['Item 11', 'Item 10', 'Item 9', 'Item 8', 'Item 7'])
+    response = self.client.get('/api/menu-items', {'fields': 'title', 'cursor': response.data['next'], 'ordering': '-price', 'perpage': 5})
+    self.assertEqual(response.data['results'][0], {'title': 'Item 6'})
+
+  def test_dropped_nested_lists_are_not_prefetched(self):
+    with self.assertNumQueries(3):
+      response = self.client.get('/api/orders', {'include': 'items', 'fields': 'id,total'})
+    self.assertEqual(response.data[0], {'id': self.orders[0].id, 'total': '8.00'})
+
+    response = self.client.get('/api/orders/%d' % self.orders[0].id, {'include': 'items', 'exclude': 'user,delivery_crew'})
+    self.assertEqual(len(response.data['items']), 1)
+    self.assertNotIn('user', response.data)
+
+    rows = json.loads(b''.join(self.client.get('/api/orders', {'stream': 1, 'fields': 'id'}).streaming_content))
+    self.assertEqual(rows, [{'id': order.id} for order in self.orders])
+
+  def test_other_read_endpoints(self):
+    self.assertEqual(self.client.get('/api/orders/order-items', {'fields': 'menuitem'}).data[0], {'menuitem': 'Item 0'})
+    self.assertEqual(self.client.get('/api/cart/summary', {'fields': 'total'}).data, {'total': '0.00'})
+    self.assertEqual(self.client.get('/api/menu-items/category', {'exclude': 'id'}).data, [{'slug': 'lunch', 'title': 'Lunch'}])
+    self.assertEqual(self.client.get('/api/users/users/me/', {'fields': 'username'}).data, {'username': 'customer'})
+
+    self.client.force_authenticate(self.admin)
+    response = self.client.get('/api/users/users/', {'fields': 'username,groups'})
+    self.assertEqual(response.data[1], {'username': 'customer', 'groups': []})
+
+  def test_async_views_render_the_same_fieldsets(self):
+    async def get(path, params):
+      return await self.async_client.get(path, params, authorization='Token ' + self.token)
+
+    for path, params in (('/api/menu-items', {'fields': 'id,title'}), ('/api/orders', {'exclude': 'user'}), ('/api/menu-items/category', {'fields': 'title'})):
+      sync_response = self.client.get(path, params)
+      with self.settings(ROOT_URLCONF='LittleLemon.asgi_urls'):
+        async_response = async_to_sync(get)(path, params)
+      self.assertEqual(async_response.content, sync_response.content)
+      self.assertEqual(async_response.get('ETag'), sync_response.get('ETag'))
+
+    with self.settings(ROOT_URLCONF='LittleLemon.asgi_urls'):
+      response = async_to_sync(get)('/api/menu-items', {'fields': 'colour'})
+    self.assertEqual(response.status_code, 400)
+
+
+class ValuesPlanTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.customer = User.objects.create_user('customer', password='lemon@123!')
+    self.crew = User.objects.create_user('crew', password='lemon@123!')
+    category = Category.objects.create(slug='lunch', title='Lunch')
+    items = MenuItem.objects.bulk_create([
+      MenuItem(title='Item %d' % i, price=Decimal('%d.%02d' % (i, i * 7 % 100)), featured=i % 2 == 0, category=category) for i in range(6)
+    ])
+    Order.objects.bulk_create([
+      Order(user=self.customer, delivery_crew=self.crew if i % 2 else None, status=i % 3 == 0, total=Decimal('1.10') * i) for i in range(6)
+    ])
+    Cart.objects.bulk_create([Cart(user=self.customer, menuitem=item, quantity=2, unit_price=item.price, price=item.price * 2) for item in items])
+
+  def assertSameJSON(self, serializer_class, queryset):
+    plan = values_plan(serializer_class)
+    queryset = serializer_class.setup_eager_loading(queryset)
+    self.assertEqual(
+      JSONRenderer().render(plan.render(plan.values(queryset))),
+      JSONRenderer().render(serializer_class(queryset, many=True).data),
+    )
+
+  def test_plans_render_byte_identical_json(self):
+    self.assertSameJSON(MenuItemsSerializerGet, MenuItem.objects.order_by('id'))
+    self.assertSameJSON(OrderSerializerGet, Order.objects.order_by('id'))
+    self.assertSameJSON(CartItemsSerializerGet, Cart.objects.order_by('id'))
+    # Datetimes follow the current time zone as DateTimeField does
+    with timezone.override('Africa/Lagos'):
+      self.assertSameJSON(MenuItemsSerializerGet, MenuItem.objects.order_by('id'))
+
+  def test_fields_without_a_column_keep_the_serializer(self):
+    # Order.__str__ is built from the username, order lines are a nested list
+    self.assertIsNone(values_plan(OrderItemsSerializerGet))
+    self.assertIsNone(values_plan(OrderWithItemsSerializerGet))
+    self.assertIsNotNone(values_plan(OrderItemsSerializerGet, ('id', 'menuitem', 'price')))
+    self.assertIsNotNone(values_plan(OrderWithItemsSerializerGet, ('id', 'total')))
+
+  def test_list_endpoints_read_values_rows(self):
+    self.client.force_login(self.customer)
+    with mock.patch.object(MenuItemsSerializerGet, 'to_representation', side_effect=AssertionError):
+      response = self.client.get('/api/menu-items', {'perpage': 3})
+      self.assertEqual([row['title'] for row in response.json()], ['Item 0', 'Item 1', 'Item 2'])
+      response = self.client.get('/api/menu-items', {'cursor': '', 'ordering': '-price', 'perpage': 2})
+      self.assertEqual(response.json()['results'][0]['price'], '5.35')
+      self.assertEqual(self.client.get('/api/menu-items', {'cursor': response.json()['next'], 'ordering': '-price', 'perpage': 2}).json()['results'][0]['title'], 'Item 3')
+
+  def test_benchmark_serializers(self):
+    stdout = StringIO()
+    call_command('benchmark_serializers', rows=50, repeat=1, stdout=stdout)
+    self.assertEqual(stdout.getvalue().count(' yes'), 2)
+    self.assertFalse(MenuItem.objects.filter(title__startswith='Bench item').exists())
+
+
+class RendererCompressionTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    self.customer = User.objects.create_user('customer', password='lemon@123!')
+    category = Category.objects.create(slug='lunch', title='Lunch')
+    MenuItem.objects.bulk_create([
+      MenuItem(title='Dish %d' % i, price=Decimal('%d.50' % i), featured=False, category=category) for i in range(40)
+    ])
+    self.client = APIClient()
+    self.client.force_authenticate(self.customer)
+
+  def test_fast_renderer_matches_json_renderer(self):
+    data = ReturnList([{
+      'price': Decimal('4.50'), 'day': datetime.date(2024, 1, 2), 'at': timezone.now(), 'title': 'Crème brûlée',
+      'empty': None, 1: True, 'detail': ErrorDetail('Not found.'), 'lazy': gettext_lazy('Not found.'),
+    }], serializer=None)
+    self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+    self.assertEqual(FastJSONRenderer().render(None), b'')
+    # Indented JSON is left to JSONRenderer
+    self.assertIn(b'\n  ', FastJSONRenderer().render(data, 'application/json; indent=2'))
+
+  def test_accept_encoding_negotiation(self):
+    self.assertEqual(negotiate_encoding('gzip, deflate, br', ('br', 'gzip')), 'br')
+    self.assertEqual(negotiate_encoding('br;q=0.5, gzip', ('br', 'gzip')), 'gzip')
+    self.assertEqual(negotiate_encoding('*', ('gzip',)), 'gzip')
+    self.assertEqual(negotiate_encoding('gzip;q=0, identity', ('gzip',)), None)
+    self.assertEqual(negotiate_encoding('', ('gzip',)), None)
+
+  def test_large_responses_are_compressed(self):
+    response = self.client.get('/api/menu-items', {'perpage': 40}, HTTP_ACCEPT_ENCODING='gzip')
+    self.assertEqual(response['Content-Encoding'], 'gzip')
+    self.assertIn('Accept-Encoding', response['Vary'])
+    self.assertEqual(len(json.loads(gzip.decompress(response.content))), 40)
+
+    # Weak tag of the compressed body still matches
+    self.assertTrue(response['ETag'].startswith('W/'))
+    response = self.client.get('/api/menu-items', {'perpage': 40}, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+    self.assertEqual(response.status_code, 304)
+
+    Order.objects.create(user=self.customer, total=Decimal('9.00'))
+    rows = json.loads(gzip.decompress(b''.join(self.client.get('/api/orders', {'stream': 1}, HTTP_ACCEPT_ENCODING='gzip').streaming_content)))
+    self.assertEqual(rows[0]['total'], '9.00')
+
+  @override_settings(COMPRESSION_MIN_SIZE=1024)
+  def test_small_responses_are_not_compressed(self):
+    response = self.client.get('/api/menu-items/category', HTTP_ACCEPT_ENCODING='gzip')
+    self.assertFalse(response.has_header('Content-Encoding'))
+    response = self.client.get('/api/menu-items', HTTP_ACCEPT_ENCODING='identity')
+    self.assertFalse(response.has_header('Content-Encoding'))
+
+  @skipUnless(msgpack_available(), 'msgpack is not installed')
+  def test_msgpack_format(self):
+    import msgpack
+    response = self.client.get('/api/menu-items', {'format': 'msgpack'})
+    self.assertEqual(response['Content-Type'], 'application/msgpack')
+    self.assertEqual(len(msgpack.unpackb(response.content)), 10)
+
+  def test_benchmark_renderers(self):
+    stdout = StringIO()
+    stderr = StringIO()
+    call_command('benchmark_renderers', rows=50, repeat=1, stdout=stdout, stderr=stderr)
+    self.assertIn('FastJSONRenderer', stdout.getvalue())
+    self.assertEqual(stderr.getvalue(), '')
+
+
+class DatabaseRoutingTests(SimpleTestCase):
+  databases = {'default'}
+
+  def setUp(self):
+    clear_caches()
+    self.factory = RequestFactory()
+    self.router = ReadWriteRouter()
+
+  def test_connections_run_the_pragmas(self):
+    connection.ensure_connection()
+    apply_pragmas(None, connection)
+    with connection.cursor() as cursor:
+      cursor.execute('PRAGMA busy_timeout')
+      self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+      cursor.execute('PRAGMA cache_size')
+      self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['cache_size'])
+
+  def test_test_mirror_reads_from_primary(self):
+    self.assertIsNone(read_database())
+    self.assertIsNone(request_read_alias(self.factory.get('/api/menu-items')))
+
+  @mock.patch('LittleLemonAPI.database.read_database', return_value='read')
+  def test_safe_requests_read_from_read_database(self, read_database):
+    self.assertEqual(request_read_alias(self.factory.get('/api/menu-items')), 'read')
+    self.assertIsNone(request_read_alias(self.factory.post('/api/cart/menu-items')))
+
+    token = read_alias.set('read')
+    try:
+      self.assertEqual(self.router.db_for_read(MenuItem), 'read')
+      # A write pins the rest of the request to the primary
+      self.assertEqual(self.router.db_for_write(Cart), 'default')
+      self.assertEqual(self.router.db_for_read(MenuItem), 'default')
+    finally:
+      read_alias.reset(token)
+    self.assertFalse(self.router.allow_migrate('read', 'LittleLemonAPI'))
+
+  @mock.patch('LittleLemonAPI.database.read_database', return_value='read')
+  def test_cart_and_order_writes_are_sticky(self, read_database):
+    customer = {'HTTP_AUTHORIZATION': 'Token customer'}
+    other = {'HTTP_AUTHORIZATION': 'Token other'}
+
+    mark_sticky(self.factory.post('/api/cart/menu-items', **customer), HttpResponse(status=400))
+    mark_sticky(self.factory.post('/api/menu-items', **customer), HttpResponse(status=201))
+    self.assertEqual(request_read_alias(self.factory.get('/api/cart/menu-items', **customer)), 'read')
+
+    mark_sticky(self.factory.post('/api/orders', **customer), HttpResponse(status=201))
+    self.assertIsNone(request_read_alias(self.factory.get('/api/orders', **customer)))
+    self.assertEqual(request_read_alias(self.factory.get('/api/orders', **other)), 'read')
+
+    # Another worker process has its own cache objects, the mark is in the shared cache
+    with mock.patch('LittleLemonAPI.database.caches', {STICKY_CACHE: caches.create_connection(STICKY_CACHE)}):
+      self.assertIsNone(request_read_alias(self.factory.get('/api/orders', **customer)))
+    # The marks of the test run are kept out of the shared cache of running servers
+    self.assertNotEqual(caches[STICKY_CACHE]._dir, os.path.abspath(os.path.join(settings.BASE_DIR, 'cache')))
+
+  # The test database is in memory and mirrored, this runs the routing against a database file
+  # with a primary in WAL mode and a genuinely separate read-only connection
+  def test_file_database_with_read_connection(self):
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    path = os.path.join(directory.name, 'db.sqlite3')
+    handler = ConnectionHandler({
+      'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path, 'PRAGMAS': {'journal_mode': 'WAL', 'busy_timeout': 0}},
+      'read': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'file:%s?mode=ro' % path, 'PRAGMAS': {'busy_timeout': 0}},
+    })
+    self.addCleanup(handler.close_all)
+    primary, read = handler['default'], handler['read']
+
+    with primary.cursor() as cursor:
+      cursor.execute('CREATE TABLE dish (title TEXT)')
+      cursor.execute("INSERT INTO dish VALUES ('Soup')")
+      cursor.execute('PRAGMA journal_mode')
+      self.assertEqual(cursor.fetchone()[0], 'wal')
+
+    with mock.patch('LittleLemonAPI.database.connections', handler):
+      self.assertEqual(read_database(), 'read')
+      self.assertEqual(request_read_alias(self.factory.get('/api/menu-items')), 'read')
+
+    with read.cursor() as cursor:
+      with self.assertRaises(OperationalError):
+        cursor.execute("INSERT INTO dish VALUES ('Cake')")
+
+      # An open write transaction on the primary neither blocks the reader nor shows to it before the commit
+      with primary.cursor() as writer:
+        writer.execute('BEGIN IMMEDIATE')
+        writer.execute("INSERT INTO dish VALUES ('Cake')")
+        cursor.execute('SELECT title FROM dish')
+        self.assertEqual(cursor.fetchall(), [('Soup',)])
+        writer.execute('COMMIT')
+      cursor.execute('SELECT title FROM dish ORDER BY title')
+      self.assertEqual(cursor.fetchall(), [('Cake',), ('Soup',)])
+
+
+class OrderArchiveTests(TestCase):
+
+  def setUp(self):
+    clear_caches()
+    throttle_store().clear()
+    self.customer = User.objects.create_user('customer', password='lemon@123!')
+    self.crew = User.objects.create_user('crew', password='lemon@123!')
+    self.manager = User.objects.create_user('manager', password='lemon@123!')
+    self.manager.groups.add(Group.objects.create(name=MANAGER_GROUP))
+    category = Category.objects.create(slug='lunch', title='Lunch')
+    self.soup = MenuItem.objects.create(title='Soup', price=Decimal('4.50'), featured=False, category=category)
+    self.cake = MenuItem.objects.create(title='Cake', price=Decimal('3.10'), featured=False, category=category)
+
+    # Three old delivered orders, an old open order and a recent delivered order
+    self.orders = []
+    for delivered, days in ((True, 100), (True, 100), (True, 100), (False, 100), (True, 1)):
+      order = Order.objects.create(user=self.customer, delivery_crew=self.crew, status=delivered, total=Decimal('7.60'))
+      OrderItem.objects.bulk_create([
+        OrderItem(order=order, menuitem=self.soup, quantity=1, unit_price=Decimal('4.50'), price=Decimal('4.50')),
+        OrderItem(order=order, menuitem=self.cake, quantity=1, unit_price=Decimal('3.10'), price=Decimal('3.10')),
+      ])
+      Order.objects.filter(pk=order.pk).update(date_updated=datetime.date.today() - datetime.timedelta(days=days))
+      self.orders.append(order)
+    add_orders_sales(Order.objects.all())
+    self.archived_ids = [order.pk for order in self.orders[:3]]
+    self.client = APIClient()
+
+  def test_old_delivered_orders_are_moved_in_batches(self):
+    self.assertEqual(archive_orders(days=30, batch_size=2), (3, 6))
+
+    self.assertEqual(sorted(ArchivedOrder.objects.values_list('id', flat=True)), self.archived_ids)
+    self.assertEqual(sorted(Order.objects.values_list('id', flat=True)), [self.orders[3].pk, self.orders[4].pk])
+    self.assertEqual(ArchivedOrderItem.objects.filter(order_id=self.archived_ids[0]).count(), 2)
+    self.assertFalse(OrderItem.objects.filter(order_id__in=self.archived_ids).exists())
+    self.assertEqual(ArchivedOrder.objects.get(pk=self.archived_ids[0]).date_created, self.orders[0].date_created)
+    # Nothing left to move
+    self.assertEqual(archive_orders(days=30), (0, 0))
+
+  def test_reads_fall_back_to_the_archive(self):
+    archive_orders(days=30)
+    self.client.force_authenticate(self.customer)
+
+    self.assertEqual([row['id'] for row in self.client.get('/api/orders').json()], [order.pk for order in self.orders])
+    response = self.client.get('/api/orders', {'cursor': '', 'perpage': 2})
+    self.assertEqual([row['id'] for row in response.json()['results']], self.archived_ids[:2])
+
+    response = self.client.get('/api/orders/%d' % self.archived_ids[0], {'include': 'items'})
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response.json()['user'], 'customer')
+    self.assertEqual([line['menuitem'] for line in response.json()['items']], ['Soup', 'Cake'])
+
+    self.assertEqual(len(self.client.get('/api/orders/order-items').json()), 10)
+
+  def test_archived_orders_are_read_only(self):
+    archive_orders(days=30)
+    self.client.force_authenticate(self.manager)
+
+    self.assertEqual(self.client.delete('/api/orders/%d' % self.archived_ids[0]).status_code, 404)
+    response = self.client.patch('/api/orders/status', {'orders': self.archived_ids[:1], 'status': False}, format='json')
+    self.assertEqual(response.json()['results'], [{'id': self.archived_ids[0], 'result': 'not_found'}])
+
+  def test_command_and_sales_backfill(self):
+    rollups = list(DailySales.objects.values_list('date', 'orders', 'revenue'))
+    stdout = StringIO()
+    call_command('archive_orders', days=30, stdout=stdout)
+    self.assertIn('Archived 3 orders and 6 order items', stdout.getvalue())
+
+    # Archived orders stay in the rollups when they are rebuilt
+    call_command('backfill_sales', stdout=StringIO())
+    self.assertEqual(list(DailySales.objects.values_list('date', 'orders', 'revenue')), rollups)
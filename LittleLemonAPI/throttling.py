@@ -0,0 +1,162 @@
+import os
+import random
+import sqlite3
+import threading
+from django.conf import settings
+from django.db import connection
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+# Throttles whose counters are shared by every worker process of the host
+# Counters live in a small SQLite database in WAL mode (settings.THROTTLE_DATABASE) and use a sliding
+# window counter: the count of the current fixed window plus the count of the previous one weighted by
+# how much of it still overlaps the sliding window. Each request is one UPSERT ... RETURNING statement,
+# which moves the window, increments the count only when the request is allowed and returns the decision.
+
+THROTTLE_TABLE = 'throttle_window'
+THROTTLE_BUSY_TIMEOUT = 5
+# Keys idle for more than one window are deleted on about one request in PRUNE_ONE_IN
+PRUNE_ONE_IN = 1000
+
+CREATE_SQL = '''
+CREATE TABLE IF NOT EXISTS {table} (
+  key TEXT PRIMARY KEY,
+  window INTEGER NOT NULL,
+  current INTEGER NOT NULL,
+  previous INTEGER NOT NULL,
+  allowed INTEGER NOT NULL
+) WITHOUT ROWID
+'''.format(table=THROTTLE_TABLE)
+
+# Counts of the previous and current windows as seen by the incoming request
+PREVIOUS_SQL = 'CASE excluded.window - {table}.window WHEN 0 THEN {table}.previous WHEN 1 THEN {table}.current ELSE 0 END'.format(table=THROTTLE_TABLE)
+CURRENT_SQL = 'CASE excluded.window - {table}.window WHEN 0 THEN {table}.current ELSE 0 END'.format(table=THROTTLE_TABLE)
+ALLOWED_SQL = '({previous} * :weight + {current} < :limit)'.format(previous=PREVIOUS_SQL, current=CURRENT_SQL)
+
+HIT_SQL = '''
+INSERT INTO {table} (key, window, current, previous, allowed) VALUES (:key, :window, 1, 0, 1)
+ON CONFLICT (key) DO UPDATE SET
+  window = excluded.window,
+  previous = {previous},
+  current = {current} + {allowed},
+  allowed = {allowed}
+RETURNING allowed, current, previous
+'''.format(table=THROTTLE_TABLE, previous=PREVIOUS_SQL, current=CURRENT_SQL, allowed=ALLOWED_SQL)
+
+PRUNE_SQL = 'DELETE FROM {table} WHERE window < :window - 1'.format(table=THROTTLE_TABLE)
+
+
+class ThrottleStore:
+
+  def __init__(self, database):
+    self.database = database
+    self.local = threading.local()
+
+  def connection(self):
+    # One connection per thread, opened again in forked workers
+    if getattr(self.local, 'pid', None) != os.getpid():
+      db = sqlite3.connect(self.database, timeout=THROTTLE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False, uri=True)
+      db.execute('PRAGMA journal_mode=WAL')
+      # Losing the last counts on a power failure is fine for rate limits
+      db.execute('PRAGMA synchronous=OFF')
+      db.execute(CREATE_SQL)
+      self.local.connection = db
+      self.local.pid = os.getpid()
+    return self.local.connection
+
+  # Returns (allowed, current, previous), the counts are those after this request
+  def hit(self, key, window, weight, limit):
+    db = self.connection()
+    allowed, current, previous = db.execute(HIT_SQL, {'key': key, 'window': window, 'weight': weight, 'limit': limit}).fetchone()
+
+    if random.randrange(PRUNE_ONE_IN) == 0:
+      db.execute(PRUNE_SQL, {'window': window})
+
+    return bool(allowed), current, previous
+
+  def clear(self):
+    self.connection().execute('DELETE FROM ' + THROTTLE_TABLE)
+
+
+_stores = {}
+
+
+def throttle_database():
+  # Test databases live in memory, the throttle counters of a test run do as well
+  if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+    return 'file:littlelemon-throttle?mode=memory&cache=shared'
+  return str(settings.THROTTLE_DATABASE)
+
+
+def throttle_store():
+  database = throttle_database()
+  if database not in _stores:
+    _stores[database] = ThrottleStore(database)
+  return _stores[database]
+
+
+class SharedRateThrottle(SimpleRateThrottle):
+  # HTTP methods counted by the throttle, None counts every method
+  methods = None
+
+  def get_rate(self):
+    # Read on every request so a scope without a rate (or an overridden setting) disables the throttle
+    return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+  def get_cache_key(self, request, view):
+    if request.user and request.user.is_authenticated:
+      ident = request.user.pk
+    else:
+      ident = self.get_ident(request)
+
+    return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+  def allow_request(self, request, view):
+    if self.rate is None or (self.methods and request.method not in self.methods):
+      return True
+
+    self.key = self.get_cache_key(request, view)
+    if self.key is None:
+      return True
+
+    self.now = self.timer()
+    window, self.elapsed = divmod(self.now, self.duration)
+    weight = 1 - self.elapsed / self.duration
+    allowed, self.current, self.previous = throttle_store().hit(self.key, int(window), weight, self.num_requests)
+    return allowed
+
+  def wait(self):
+    weight = 1 - self.elapsed / self.duration
+
+    # The previous window fades out until the estimate drops under the limit
+    if self.current < self.num_requests:
+      return max(self.duration * (weight - (self.num_requests - self.current) / self.previous), 0)
+
+    # Otherwise the current window has to become the previous one and fade out in turn
+    return self.duration * weight + self.duration * (1 - self.num_requests / self.current)
+
+
+class SharedAnonRateThrottle(SharedRateThrottle):
+  scope = 'anon'
+
+  def get_cache_key(self, request, view):
+    if request.user and request.user.is_authenticated:
+      return None
+    return super().get_cache_key(request, view)
+
+
+class SharedUserRateThrottle(SharedRateThrottle):
+  scope = 'user'
+
+
+# Menu and category reads
+class BrowseRateThrottle(SharedRateThrottle):
+  scope = 'browse'
+  methods = ('GET',)
+
+
+# Order creation from the cart
+class CheckoutRateThrottle(SharedRateThrottle):
+  scope = 'checkout'
+  methods = ('POST',)
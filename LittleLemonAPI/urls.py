@@ -18,8 +18,13 @@ urlpatterns = [
     path('groups/delivery-crew/users/<int:pk>', views.delivery_crew_remove_user_view),
     # cart
     path('cart/menu-items', views.cart_view),
+    path('cart/summary', views.cart_summary_view),
     # orders
     path('orders', views.order_view),
     path('orders/order-items', views.order_items_view),
+    path('orders/assign', views.order_assign_view),
+    path('orders/status', views.order_status_view),
     path('orders/<int:pk>', views.SingleOrderView.as_view()),
+    # reports
+    path('reports/sales', views.sales_report_view),
 ]
@@ -0,0 +1,148 @@
+import decimal
+from functools import lru_cache
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+
+# Fast path of the read serializers for lists
+# A plan maps every rendered field to a values() key and a formatter, built once per serializer and
+# fieldset. Rows are then read with values() and turned into dicts without model instances or the
+# per-field machinery of Serializer.to_representation. Formatters reproduce the DRF field output, so
+# the rendered body is byte-identical to the serializer's. A serializer with a field the plan cannot
+# read from a column (nested lists, many to many, __str__ built from several columns) keeps the
+# regular serializer.
+
+SENTINEL = '\x00littlelemon\x00'
+
+
+class ValuesPlan:
+
+  def __init__(self, fields):
+    # [(name, values() key, formatter or None)]
+    self.fields = fields
+    self.keys = tuple(dict.fromkeys(key for name, key, formatter in fields))
+
+  # columns are read as well, e.g. the cursor ordering fields
+  def values(self, queryset, columns=()):
+    # Extra select columns (search rank) stay selectable so they can still be ordered on
+    return queryset.values(*dict.fromkeys(self.keys + tuple(columns) + tuple(queryset.query.extra_select)))
+
+  def render(self, rows):
+    fields = [(name, key, formatter.prepare() if hasattr(formatter, 'prepare') else formatter) for name, key, formatter in self.fields]
+    return [
+      {name: value if (value := row[key]) is None or formatter is None else formatter(value) for name, key, formatter in fields}
+      for row in rows
+    ]
+
+
+def decimal_formatter(field):
+  if not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING) or field.localize or field.decimal_places is None:
+    return field.to_representation
+
+  exponent = decimal.Decimal('.1') ** field.decimal_places
+  context = decimal.getcontext().copy()
+  if field.max_digits is not None:
+    context.prec = field.max_digits
+  rounding = field.rounding
+
+  def formatter(value):
+    if not isinstance(value, decimal.Decimal):
+      value = decimal.Decimal(str(value).strip())
+    return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+
+  return formatter
+
+
+def date_formatter(field):
+  output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+  if isinstance(output_format, str) and output_format.lower() == ISO_8601:
+    return lambda value: value.isoformat()
+  return field.to_representation
+
+
+# Aware datetimes in the current time zone, UTC written as Z, as DateTimeField.to_representation does
+# The current time zone is looked up once per list through prepare()
+def datetime_formatter(field):
+  output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+  if hasattr(field, 'timezone') or not settings.USE_TZ or not (isinstance(output_format, str) and output_format.lower() == ISO_8601):
+    return field.to_representation
+
+  def formatter_in(current_timezone):
+    def formatter(value):
+      if value.tzinfo is None:
+        return field.to_representation(value)
+      value = value.astimezone(current_timezone).isoformat()
+      return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return formatter
+
+  def formatter(value):
+    return formatter_in(timezone.get_current_timezone())(value)
+
+  formatter.prepare = lambda: formatter_in(timezone.get_current_timezone())
+  return formatter
+
+
+# __str__ of the related model returns this column as is: relation__column
+def str_is_column(model, path):
+  relation, _, column = path.partition('__')
+  if not column or '__' in column:
+    return False
+
+  related_model = model._meta.get_field(relation).related_model
+  try:
+    return str(related_model(**{column: SENTINEL})) == SENTINEL
+  except Exception:
+    return False
+
+
+def field_plan(serializer_class, name, field):
+  model = serializer_class.Meta.model
+
+  if isinstance(field, serializers.StringRelatedField):
+    columns = serializer_class.related_columns.get(name, [])
+    if len(columns) == 1 and str_is_column(model, columns[0]):
+      return name, columns[0], None
+    return None
+
+  if isinstance(field, serializers.PrimaryKeyRelatedField):
+    return (name, field.source, None) if field.pk_field is None else None
+
+  if isinstance(field, (serializers.ManyRelatedField, serializers.BaseSerializer)) or field.source == '*' or '.' in field.source:
+    return None
+
+  # Plain columns, values() returns the int, str or bool the DRF field would render
+  if type(field) in (serializers.IntegerField, serializers.CharField, serializers.BooleanField, serializers.SlugField, serializers.EmailField):
+    return name, field.source, None
+  if isinstance(field, serializers.DecimalField):
+    return name, field.source, decimal_formatter(field)
+  if type(field) is serializers.DateField:
+    return name, field.source, date_formatter(field)
+  if type(field) is serializers.DateTimeField:
+    return name, field.source, datetime_formatter(field)
+  return name, field.source, field.to_representation
+
+
+@lru_cache(maxsize=None)
+def values_plan(serializer_class, fields=None):
+  plan = []
+  for name, field in serializer_class(fields=fields).fields.items():
+    if field.write_only:
+      continue
+    entry = field_plan(serializer_class, name, field)
+    if entry is None:
+      return None
+    plan.append(entry)
+  return ValuesPlan(plan)
+
+
+# values() rows when the serializer has a plan for the fieldset, the queryset itself otherwise
+def read_rows(serializer_class, queryset, fields=None, columns=()):
+  plan = values_plan(serializer_class, fields)
+  return plan.values(queryset, columns) if plan else queryset
+
+
+def render_rows(serializer_class, rows, fields=None):
+  plan = values_plan(serializer_class, fields)
+  return plan.render(rows) if plan else serializer_class(rows, many=True, fields=fields).data
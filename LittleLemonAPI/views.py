@@ -1,25 +1,43 @@
 from django.shortcuts import render
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from .models import Category, MenuItem, Cart, Order, OrderItem
+from .models import Category, MenuItem, Cart, Order, OrderItem, OrderHistory, OrderHistoryItem, DailySales, DailyMenuItemSales, DailyCategorySales
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User, Group
 from rest_framework import generics, status, viewsets
 from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.views import APIView
+from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework_simplejwt.exceptions import TokenError
 from django.shortcuts import get_object_or_404
-from .serializers import UserSerializer, MenuItemsSerializer, MenuItemsSerializerGet, CategorySerializer, UserGroupSerializer, CartItemsSerializer, CartItemsSerializerGet, OrderSerializer, OrderSerializerGet, OrderItemsSerializer, OrderItemsSerializerGet
-from django.core.paginator import Paginator, EmptyPage
+from .serializers import UserSerializer, MenuItemsSerializer, MenuItemsSerializerGet, CategorySerializer, UserGroupSerializer, CartItemsSerializer, CartItemsSerializerGet, OrderSerializer, OrderItemsSerializer, OrderHistorySerializerGet, OrderHistoryWithItemsSerializerGet, OrderHistoryItemsSerializerGet, CartSummarySerializer, DailySalesSerializer, DailyMenuItemSalesSerializer, DailyCategorySalesSerializer
+from django.core.paginator import Paginator
+from django.db import transaction
+from functools import partial
 from decimal import Decimal
+from datetime import date, timedelta
 from django.contrib.auth.hashers import make_password
-from .todict import dotdict
+from .cart import CartLineError, parse_cart_lines, upsert_cart_lines, cart_summary, clear_cart_summary, invalidate_cart_summaries
+from .conditional import catalog_validators, not_modified, not_modified_response, with_validators
+from .menucache import menu_cache_key, get_cached_menu, set_cached_menu, bump_menu_version
+from .pagination import CursorError, PageError, page_rows, parse_ordering, cursor_paginate
+from .streaming import stream_json_list
+from .filters import MENU_ITEM_CURSOR_FIELDS, MenuFilterError, filter_menu_items
+from .fieldsets import SparseFieldsetViewMixin, requested_fields
+from .valuesplan import read_rows, render_rows
+from .authentication import is_token_user
+from .signedtokens import signed_tokens, refresh_access, revoke_session
+from .sales import SALE_LINE_COLUMNS, record_order_sales
+from .dispatch import DispatchError, auto_assign_orders, parse_status_update, update_order_status
+from .throttling import BrowseRateThrottle, CheckoutRateThrottle
+from .roles import request_roles, user_roles, invalidate_user_roles, MANAGER_GROUP, DELIVERY_CREW_GROUP
 
 
 
 # Additional view to see all menuitems category
 # Any authenticated user can view
 # http://127.0.0.1:8000/api/users/users/
-class GenericUsersView(generics.ListCreateAPIView):
+class GenericUsersView(SparseFieldsetViewMixin, generics.ListCreateAPIView):
   permission_classes = [IsAuthenticated, IsAdminUser]
   queryset = User.objects.all()
   serializer_class = UserSerializer
@@ -47,6 +65,46 @@ class UsersView(APIView):
   
 
 
+# Token login
+# http://127.0.0.1:8000/token/login/
+# username + password returns a token as before, send it as Authorization: Token <token>
+# Add signed: 1 to the payload to get signed tokens instead: {"access": "...", "refresh": "..."}
+# send the access token as Authorization: Bearer <access>, it is verified without any database query.
+# Access tokens expire after 5 minutes, post refresh: <refresh> alone to get a new one.
+
+class LoginView(ObtainAuthToken):
+  def post(self, request, *args, **kwargs):
+    refresh = request.data.get('refresh')
+    
+    if refresh:
+      try:
+        return Response({'access': refresh_access(refresh)}, status.HTTP_200_OK)
+      except TokenError as error:
+        return Response({'message': str(error)}, status.HTTP_401_UNAUTHORIZED)
+    
+    if str(request.data.get('signed', '')).lower() not in ('1', 'true'):
+      return super().post(request, *args, **kwargs)
+    
+    serializer = self.get_serializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return Response(signed_tokens(serializer.validated_data['user']), status.HTTP_200_OK)
+
+
+# Signed token logout
+# http://127.0.0.1:8000/token/logout/
+# Payload refresh: <refresh> revokes the refresh token and every access token made from it
+
+class LogoutView(APIView):
+  permission_classes = []
+  
+  def post(self, request):
+    try:
+      revoke_session(request.data.get('refresh') or '')
+    except TokenError as error:
+      return Response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
+    return Response({'message': 'Token has been revoked'}, status.HTTP_200_OK)
+
+
 # GET Request to see currently logged in/authenticated user
 # First generate a token for the user here http://127.0.0.1:8000/token/login/
 # http://127.0.0.1:8000/api/users/users/me/
@@ -56,34 +114,50 @@ class UserView(APIView):
   
   def get(self, request):
     logged_in_user = request.user
-    serialized_item = UserSerializer(logged_in_user, many=False)
+    if is_token_user(logged_in_user):
+      # Signed tokens only carry some of the user fields
+      logged_in_user = get_object_or_404(User, pk=logged_in_user.pk)
+    serialized_item = UserSerializer(logged_in_user, many=False, fields=requested_fields(UserSerializer, request.query_params))
     return Response(serialized_item.data, status.HTTP_200_OK)
   
 
 # Additional view to see all user groups
 # http://127.0.0.1:8000/api/users/users/me/
 
-class UsersGroupsView(generics.ListCreateAPIView):
+class UsersGroupsView(SparseFieldsetViewMixin, generics.ListCreateAPIView):
   queryset = Group.objects.all()
   serializer_class = UserGroupSerializer
 
 
+# The querysets, messages and parameter checks of the read views below are shared with their async
+# versions in asyncviews.py, which only add the async I/O
+
+def category_queryset(fields):
+  return CategorySerializer.setup_eager_loading(Category.objects.all(), fields)
+
+
 # Additional view to see all menuitems category
 # Any authenticated user can view
 # http://127.0.0.1:8000/api/menu-items/category
 
 class CategoryView(APIView):
   permission_classes = [IsAuthenticated]
+  throttle_classes = [BrowseRateThrottle]
   
   def get(self, request):
-    categories = Category.objects.all()
-    serialized_item = CategorySerializer(categories, many=True)
-    return Response(serialized_item.data, status.HTTP_200_OK)
+    fields = requested_fields(CategorySerializer, request.query_params)
+    etag, last_modified = catalog_validators(request, 'categories', request.query_params)
+    if not_modified(request, etag, last_modified):
+      return not_modified_response(etag, last_modified)
+    
+    serialized_item = CategorySerializer(category_queryset(fields), many=True, fields=fields)
+    return with_validators(Response(serialized_item.data, status.HTTP_200_OK), etag, last_modified)
     
   def post(self, request):
     serialized_item = CategorySerializer(data=request.data)
     serialized_item.is_valid(raise_exception=True)
     serialized_item.save()
+    bump_menu_version()
     return Response(serialized_item.data, status.HTTP_201_CREATED)
   
 
@@ -93,10 +167,15 @@ class CategoryView(APIView):
 
 # Use the following URLS for Filter, Search, Ordering and Sorting queries:
 # CATEGORY = http://127.0.0.1:8000/api/menu-items?category=lunch
+# CATEGORY SLUG (exact) = http://127.0.0.1:8000/api/menu-items?category_slug=lunch
 # PRICE = http://127.0.0.1:8000/api/menu-items?to_price=10
+# PRICE RANGE = http://127.0.0.1:8000/api/menu-items?min_price=5&max_price=10
+# FEATURED = http://127.0.0.1:8000/api/menu-items?featured=1
 # SEARCH = http://127.0.0.1:8000/api/menu-items?search=bread
 # ORDERING = http://127.0.0.1:8000/api/menu-items?ordering=price
 # PAGINATION = http://127.0.0.1:8000/api/menu-items?perpage=4&page=1
+# CURSOR PAGINATION = http://127.0.0.1:8000/api/menu-items?perpage=4&cursor=
+# (follow the returned next/previous cursors, e.g. ?perpage=4&cursor=eyJvIjpb...)
 
 # Create menu item sample payload data:
 # title: Shawarma
@@ -105,42 +184,66 @@ class CategoryView(APIView):
 # price: 13
 # featured: 1
 
+MENU_DEFAULT_PERPAGE = 10
+
+
+# Raises MenuFilterError
+def menu_item_rows(query_params, fields):
+  # Cursors are built from the ordering columns, which are loaded even when they are not rendered
+  columns = MENU_ITEM_CURSOR_FIELDS if 'cursor' in query_params else ()
+  items = filter_menu_items(MenuItemsSerializerGet.setup_eager_loading(MenuItem.objects.all(), fields, columns), query_params)
+  return read_rows(MenuItemsSerializerGet, items, fields, columns)
+
+
+def menu_item_queryset(fields):
+  return MenuItemsSerializerGet.setup_eager_loading(MenuItem.objects.all(), fields)
+
+
 @api_view(['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([BrowseRateThrottle])
 def menu_items(request):
-  is_manager = request.user.groups.filter(name='Manager').exists()
+  is_manager = request_roles(request).is_manager
   
   if(request.method == 'GET'):
-    items = MenuItem.objects.select_related('category').all()
-    category_name = request.query_params.get('category')
-    to_price = request.query_params.get('to_price')
-    search = request.query_params.get('search')
+    fields = requested_fields(MenuItemsSerializerGet, request.query_params)
+    etag, last_modified = catalog_validators(request, 'menu-items', request.query_params)
+    if not_modified(request, etag, last_modified):
+      return not_modified_response(etag, last_modified)
+    
+    cache_key = menu_cache_key('menu-items', request.query_params)
+    cached_data = get_cached_menu(cache_key)
+    if cached_data is not None:
+      return with_validators(Response(cached_data, status.HTTP_200_OK), etag, last_modified)
+    
+    try:
+      items = menu_item_rows(request.query_params, fields)
+    except MenuFilterError as error:
+      return Response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
+    
     ordering = request.query_params.get('ordering')
-    perpage = request.query_params.get('perpage', default=10)
+    perpage = request.query_params.get('perpage', default=MENU_DEFAULT_PERPAGE)
     page = request.query_params.get('page', default=1)
     
-    if category_name:
-      items = items.filter(category__title__icontains=category_name)
-    
-    if to_price:
-      items = items.filter(price=to_price)
-      
-    if search:
-      items = items.filter(title__icontains=search)
+    if 'cursor' in request.query_params:
+      try:
+        ordering_fields = parse_ordering(ordering, MENU_ITEM_CURSOR_FIELDS)
+        items, next_cursor, previous_cursor = cursor_paginate(items, ordering_fields, request.query_params.get('cursor'), perpage)
+      except CursorError as error:
+        return Response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
       
-    if ordering:
-      ordering_fields = ordering.split(',')
-      items = items.order_by(*ordering_fields)
+      data = {'next': next_cursor, 'previous': previous_cursor, 'results': render_rows(MenuItemsSerializerGet, items, fields)}
+      set_cached_menu(cache_key, data)
+      return with_validators(Response(data, status.HTTP_200_OK), etag, last_modified)
       
-    paginator = Paginator(items, per_page=perpage)
-    
     try:
-      items = paginator.page(number=page)
-    except EmptyPage:
-      items = []
+      items = page_rows(Paginator(items, per_page=perpage), page)
+    except PageError as error:
+      return Response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
     
-    serialized_item = MenuItemsSerializerGet(items, many=True)
-    return Response(serialized_item.data, status.HTTP_200_OK)
+    data = render_rows(MenuItemsSerializerGet, items, fields)
+    set_cached_menu(cache_key, data)
+    return with_validators(Response(data, status.HTTP_200_OK), etag, last_modified)
   
   elif (request.method == 'POST' or request.method == 'PUT' or request.method == 'PATCH' or request.method == 'DELETE') and (is_manager == False):
     return Response({'message': 'You are not authorized!'}, status.HTTP_401_UNAUTHORIZED)
@@ -160,6 +263,7 @@ def menu_items(request):
     serialized_item = MenuItemsSerializer(data=menuitem_data)
     if serialized_item.is_valid(raise_exception=True):
       serialized_item.save()
+      bump_menu_version()
       return Response({'message': 'New menu item ' + new_title + ' has been created!'}, status.HTTP_201_CREATED)
     return Response(serialized_item.errors, status.HTTP_400_BAD_REQUEST)
 
@@ -182,13 +286,25 @@ def menu_items(request):
 
 @api_view(['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([BrowseRateThrottle])
 def single_menu_item(request, pk):
-  is_manager = request.user.groups.filter(name='Manager').exists()
+  is_manager = request_roles(request).is_manager
   
   if request.method == 'GET':
-    item = get_object_or_404(MenuItem, pk=pk)
-    serialized_item = MenuItemsSerializerGet(item)
-    return Response(serialized_item.data, status.HTTP_200_OK)
+    fields = requested_fields(MenuItemsSerializerGet, request.query_params)
+    etag, last_modified = catalog_validators(request, 'menu-item', request.query_params, pk=pk)
+    if not_modified(request, etag, last_modified):
+      return not_modified_response(etag, last_modified)
+    
+    cache_key = menu_cache_key('menu-item', request.query_params, pk=pk)
+    cached_data = get_cached_menu(cache_key)
+    if cached_data is not None:
+      return with_validators(Response(cached_data, status.HTTP_200_OK), etag, last_modified)
+    
+    item = get_object_or_404(menu_item_queryset(fields), pk=pk)
+    serialized_item = MenuItemsSerializerGet(item, fields=fields)
+    set_cached_menu(cache_key, serialized_item.data)
+    return with_validators(Response(serialized_item.data, status.HTTP_200_OK), etag, last_modified)
   
   elif (request.method == 'POST' or request.method == 'PUT' or request.method == 'PATCH' or request.method == 'DELETE') and (is_manager == False):
     return Response({'message': 'You are not authorized!'}, status.HTTP_401_UNAUTHORIZED)
@@ -211,12 +327,17 @@ def single_menu_item(request, pk):
     serialized_item = MenuItemsSerializer(item, data=menuitem_data)
     if serialized_item.is_valid():
       serialized_item.save()
+      bump_menu_version()
       return Response({'message': 'Menu item has been updated!'}, status.HTTP_200_OK)
     return Response(serialized_item.errors, status.HTTP_400_BAD_REQUEST)
 
   elif (request.method == 'DELETE' and is_manager == True):
     item = get_object_or_404(MenuItem, pk=pk)
-    item.delete()
+    with transaction.atomic():
+      # Cart lines of this item are removed by the cascade, so the affected cart summaries are rebuilt on next read
+      invalidate_cart_summaries(Cart.objects.filter(menuitem=item).values('user'))
+      item.delete()
+    bump_menu_version()
     return Response({'message': 'Menu item has been deleted!'}, status.HTTP_200_OK)
 
   else:
@@ -231,22 +352,24 @@ def single_menu_item(request, pk):
 class ManagersGroupView(APIView):
   
   def get(self, request):
-    if (request.user.groups.filter(name='Manager').exists()):
-      managers_group = Group.objects.get(name='Manager')
-      managers = User.objects.filter(groups=managers_group.id)
-      serialized_item = UserSerializer(managers, many=True)
+    if (request_roles(request).is_manager):
+      managers_group = Group.objects.get(name=MANAGER_GROUP)
+      fields = requested_fields(UserSerializer, request.query_params)
+      managers = UserSerializer.setup_eager_loading(User.objects.filter(groups=managers_group.id), fields)
+      serialized_item = UserSerializer(managers, many=True, fields=fields)
       return Response(serialized_item.data, status.HTTP_200_OK)
     
     else:
       return Response({'message': 'You are not authorized!'}, status.HTTP_401_UNAUTHORIZED)
     
   def post(self, request):
-    if (request.user.groups.filter(name='Manager').exists()):
+    if (request_roles(request).is_manager):
       username = request.data['username']
       if username:
         user = get_object_or_404(User, username=username)
-        managers = Group.objects.get(name='Manager')
+        managers = Group.objects.get(name=MANAGER_GROUP)
         managers.user_set.add(user)
+        invalidate_user_roles(user)
         return Response({'message': 'User has been added to Manager group'}, status.HTTP_201_CREATED)
       
 
@@ -259,11 +382,12 @@ class ManagerGroupView(APIView):
   permission_classes = [IsAuthenticated, IsAdminUser]
   
   def delete(self, request, pk):
-    if (request.user.groups.filter(name='Manager').exists()):
+    if (request_roles(request).is_manager):
       user = get_object_or_404(User, pk=pk)
-      if (user.groups.filter(name='Manager').exists()):
-        managers = Group.objects.get(name='Manager')
+      if (user_roles(user).is_manager):
+        managers = Group.objects.get(name=MANAGER_GROUP)
         managers.user_set.remove(user)
+        invalidate_user_roles(user)
         return Response({'message': 'User has been deleted from Manager group'}, status.HTTP_200_OK)
       
       return Response({'message': 'User not found in the Manager group'}, status.HTTP_404_NOT_FOUND)
@@ -276,20 +400,22 @@ class ManagerGroupView(APIView):
 @api_view(['GET', 'POST', 'DELETE'])
 @permission_classes([IsAuthenticated])
 def delivery_crew_user_group_view(request):
-  is_manager = request.user.groups.filter(name='Manager').exists()
+  is_manager = request_roles(request).is_manager
   
   if(request.method == 'GET' and is_manager == True):
-    delivery_crew_group = Group.objects.get(name='Delivery crew')
-    delivery_crew = User.objects.filter(groups=delivery_crew_group.id)
-    serialized_item = UserSerializer(delivery_crew, many=True)
+    delivery_crew_group = Group.objects.get(name=DELIVERY_CREW_GROUP)
+    fields = requested_fields(UserSerializer, request.query_params)
+    delivery_crew = UserSerializer.setup_eager_loading(User.objects.filter(groups=delivery_crew_group.id), fields)
+    serialized_item = UserSerializer(delivery_crew, many=True, fields=fields)
     return Response(serialized_item.data, status.HTTP_200_OK)
   
   elif (request.method == 'POST' and is_manager == True):
     username = request.data['username']
     if username:
       user = get_object_or_404(User, username=username)
-      delivery_crew_group = Group.objects.get(name='Delivery crew')
+      delivery_crew_group = Group.objects.get(name=DELIVERY_CREW_GROUP)
       delivery_crew_group.user_set.add(user)
+      invalidate_user_roles(user)
       return Response({'message': 'User has been added to Delivery crew group'}, status.HTTP_201_CREATED)
   
   else:
@@ -303,13 +429,14 @@ def delivery_crew_user_group_view(request):
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated, IsAdminUser])
 def delivery_crew_remove_user_view(request, pk):
-  is_manager = request.user.groups.filter(name='Manager').exists()
+  is_manager = request_roles(request).is_manager
   
   if(request.method == 'DELETE' and is_manager == True):
     user = get_object_or_404(User, pk=pk)
-    if (user.groups.filter(name='Delivery crew').exists()):
-      delivery_crew = Group.objects.get(name='Delivery crew')
+    if (user_roles(user).is_delivery_crew):
+      delivery_crew = Group.objects.get(name=DELIVERY_CREW_GROUP)
       delivery_crew.user_set.remove(user)
+      invalidate_user_roles(user)
       return Response({'message': 'User has been deleted from Delivery crew group'}, status.HTTP_200_OK)
 
     return Response({'message': 'User not found in the Delivery crew group'}, status.HTTP_404_NOT_FOUND)
@@ -319,6 +446,13 @@ def delivery_crew_remove_user_view(request, pk):
     
 
 
+EMPTY_CART_MESSAGE = 'You do not have any items in your cart'
+
+
+def cart_rows(user, fields):
+  return read_rows(CartItemsSerializerGet, CartItemsSerializerGet.setup_eager_loading(Cart.objects.filter(user=user), fields), fields)
+
+
 # ENSURE YOU PERFORM ALL TESTS WITH INSOMNIA INSTEAD OF THE WEB BROWSER
 # Menu Items view
 # http://127.0.0.1:8000/api/cart/menu-items
@@ -327,94 +461,179 @@ def delivery_crew_remove_user_view(request, pk):
 # Enter only the menuitem title and quantity as payload example:
 # menuitem: Pancake
 # quantity: 15
+# Several items can be added at once by posting a JSON list (or {"items": [...]}) example:
+# [{"menuitem": "Pancake", "quantity": 2}, {"menuitem": "Shawarma", "quantity": 1}]
+# Adding an item that is already in the cart increases its quantity
 
 @api_view(['GET', 'POST', 'DELETE'])
 def cart_view(request):
+  if not request.user.is_authenticated:
+    return Response({'message': 'You are not authorized!'}, status.HTTP_401_UNAUTHORIZED)
+  
   if (request.method == 'GET'):
-    cart_items = Cart.objects.select_related('user', 'menuitem').filter(user=request.user).all()
+    fields = requested_fields(CartItemsSerializerGet, request.query_params)
+    cart_items = cart_rows(request.user, fields)
     
     if cart_items:
-    
-      serialized_item = CartItemsSerializerGet(cart_items, many=True)
       
-      return Response(serialized_item.data, status.HTTP_200_OK)
+      return Response(render_rows(CartItemsSerializerGet, cart_items, fields), status.HTTP_200_OK)
     
-    return Response({'message': 'You do not have any items in your cart'}, status.HTTP_200_OK)
+    return Response({'message': EMPTY_CART_MESSAGE}, status.HTTP_200_OK)
   
   elif (request.method == 'POST'):
-    menuitem_data = request.data['menuitem']
-    item = MenuItem.objects.get(title=menuitem_data)
-    
-    unit_price = item.price
-    quantity = request.data['quantity']
-    total_price = float(quantity) * float(unit_price)
-    
-    cart_data = {
-      'user': request.user.id,
-      'menuitem': item.id,
-      'quantity': request.data['quantity'],
-      'unit_price': item.price,
-      'price': round(total_price, 2),
-    }
+    try:
+      quantities = parse_cart_lines(request.data)
+      with transaction.atomic():
+        menuitem_ids = upsert_cart_lines(request.user, quantities)
+    except CartLineError as error:
+      return Response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
     
-    serialized_item = CartItemsSerializer(data=cart_data)
-    if serialized_item.is_valid(raise_exception=True):
-      serialized_item.save()
-      return Response(serialized_item.data, status.HTTP_201_CREATED)
+    cart_items = Cart.objects.filter(user=request.user, menuitem_id__in=menuitem_ids)
     
-    return Response(serialized_item.errors, status.HTTP_400_BAD_REQUEST)
+    if isinstance(request.data, list) or 'items' in request.data:
+      serialized_item = CartItemsSerializer(cart_items, many=True)
+    else:
+      serialized_item = CartItemsSerializer(cart_items.first())
+    
+    return Response(serialized_item.data, status.HTTP_201_CREATED)
     
   elif (request.method == 'DELETE'):
-    cart_items = Cart.objects.select_related('user', 'menuitem').filter(user=request.user).all()
-    cart_items.delete()
+    with transaction.atomic():
+      Cart.objects.filter(user=request.user).delete()
+      clear_cart_summary(request.user)
     return Response({'message': 'Cart items has been deleted!'}, status.HTTP_200_OK)
   
   else:
     return Response({'message': request.method + ' method not allowed for Managers'}, status.HTTP_405_METHOD_NOT_ALLOWED)
     
 
+# Cart summary view
+# Line count, item quantity and total of the cart for badges, read from the stored summary without scanning the cart
+# http://127.0.0.1:8000/api/cart/summary
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def cart_summary_view(request):
+  summary = cart_summary(request.user)
+  serialized_item = CartSummarySerializer(summary, fields=requested_fields(CartSummarySerializer, request.query_params))
+  return Response(serialized_item.data, status.HTTP_200_OK)
+
  
 # ENSURE YOU PERFORM ALL TESTS WITH INSOMNIA INSTEAD OF THE WEB BROWSER
 # Order view
 # After adding menu items to your cart, simple send a POST request with your token to create an order and order items from the cart items
 # http://127.0.0.1:8000/api/orders
 
+# Order lists are paginated, use the following URLS to walk them:
+# PAGINATION = http://127.0.0.1:8000/api/orders?perpage=50&page=2
+# CURSOR PAGINATION = http://127.0.0.1:8000/api/orders?perpage=50&cursor=
+# STREAMED JSON (whole list, constant memory) = http://127.0.0.1:8000/api/orders?stream=1
+
+ORDER_DEFAULT_PERPAGE = 50
+ORDER_MAX_PERPAGE = 500
+
+
+# ?include=items embeds the lines of every order, so an order history needs a single request
+# Orders are read from the OrderHistory view, archived orders are listed with the live ones
+def order_serializer_class(query_params):
+  return OrderHistoryWithItemsSerializerGet if query_params.get('include') == 'items' else OrderHistorySerializerGet
+
+
+# Orders a user may list: their own for a customer, the assigned ones for the delivery crew, all for managers
+def order_list_queryset(user, user_role, serializer_class, fields):
+  orders = serializer_class.setup_eager_loading(OrderHistory.objects.order_by('id'), fields)
+  
+  if (user_role.is_customer):
+    orders = orders.filter(user=user)
+    
+  if (user_role.is_delivery_crew):
+    orders = orders.filter(delivery_crew=user)
+  
+  return orders
+
+
+# Message of the 404 answered for an empty order list
+def no_orders_message(user_role):
+  if (user_role.is_delivery_crew):
+    return 'You have not been assigned to deliver any orders yet!'
+  return 'You have not created any orders!'
+
+
+# Raises PageError
+def order_perpage(query_params):
+  try:
+    return min(max(int(query_params.get('perpage', ORDER_DEFAULT_PERPAGE)), 1), ORDER_MAX_PERPAGE)
+  except ValueError:
+    raise PageError('perpage must be an integer')
+
+
+def order_detail_queryset(serializer_class, fields):
+  # The owner is compared by the view, keep its column when the fieldset leaves it out
+  return serializer_class.setup_eager_loading(OrderHistory.objects.all(), fields, ['user'])
+
+
+ORDER_NOT_OWNED_MESSAGE = 'You are a customer and this order does not belong to you'
+
+
+def order_hidden_from(user, user_role, order):
+  return user_role.is_customer and order.user_id != user.pk
+
 @api_view(['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+@throttle_classes([CheckoutRateThrottle])
 def order_view(request):
-  is_manager = request.user.groups.filter(name='Manager').exists()
-  is_delivery_crew = request.user.groups.filter(name='Delivery crew').exists()
-  is_admin = request.user.is_superuser
-  is_customer = (is_manager == False and is_delivery_crew == False and is_admin == False)
+  user_role = request_roles(request)
+  is_manager = user_role.is_manager
+  is_delivery_crew = user_role.is_delivery_crew
+  is_admin = user_role.is_admin
+  is_customer = user_role.is_customer
     
   if (request.method == 'GET'):
     
-    if (is_customer):
-      orders = Order.objects.select_related('user').filter(user=request.user).all()
+    serializer_class = order_serializer_class(request.query_params)
+    fields = requested_fields(serializer_class, request.query_params)
+    orders = order_list_queryset(request.user, user_role, serializer_class, fields)
     
-    if (is_manager or is_admin):
-      orders = Order.objects.select_related('user').all()
-      
-    if (is_delivery_crew):
-      orders = Order.objects.select_related('user').filter(delivery_crew=request.user).all()
-      
-      if orders:
-        pass
-      else:
-        return Response({'message': 'You have not been assigned to deliver any orders yet!'}, status.HTTP_404_NOT_FOUND)
+    if not orders.exists():
+      return Response({'message': no_orders_message(user_role)}, status.HTTP_404_NOT_FOUND)
+    
+    if request.query_params.get('stream'):
+      return stream_json_list(orders, partial(serializer_class, fields=fields))
+    
+    orders = read_rows(serializer_class, orders, fields, ['id'])
+    
+    try:
+      perpage = order_perpage(request.query_params)
+    except PageError as error:
+      return Response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
+    
+    if 'cursor' in request.query_params:
+      try:
+        orders, next_cursor, previous_cursor = cursor_paginate(orders, ['id'], request.query_params.get('cursor'), perpage)
+      except CursorError as error:
+        return Response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
       
-    if orders:
-      serialized_item = OrderSerializerGet(orders, many=True)
-      return Response(serialized_item.data, status.HTTP_200_OK)
+      return Response({'next': next_cursor, 'previous': previous_cursor, 'results': render_rows(serializer_class, orders, fields)}, status.HTTP_200_OK)
     
-    return Response({'message': 'You have not created any orders!'}, status.HTTP_404_NOT_FOUND)
+    try:
+      orders = page_rows(Paginator(orders, per_page=perpage), request.query_params.get('page', default=1))
+    except PageError as error:
+      return Response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
+    
+    return Response(render_rows(serializer_class, orders, fields), status.HTTP_200_OK)
   
   elif (request.method == 'POST'):
 
-    cart_items = Cart.objects.select_related('user', 'menuitem').filter(user=request.user).all()
-    
-    if cart_items.exists():
-    
-      total = calculate_total(cart_items)
+    # Checkout runs in one transaction with a fixed number of queries whatever the cart size:
+    # the total is summed from the cart lines read for the order items, order items are bulk inserted, the sales rollups are moved
+    # with one upsert per rollup table and the cart is cleared with one DELETE
+    with transaction.atomic():
+      cart_items = Cart.objects.select_for_update().filter(user=request.user)
+      cart_lines = list(cart_items.values('unit_price', *SALE_LINE_COLUMNS))
+      
+      if not cart_lines:
+        return Response({'message': 'This user has 0 items in cart!'}, status.HTTP_404_NOT_FOUND)
+      
+      total = calculate_total(cart_lines)
       
       order_data = {
         'user': request.user.id,
@@ -425,35 +644,32 @@ def order_view(request):
       
       if serialized_item.is_valid(raise_exception=True):
         order = serialized_item.save()
-
-      for cart_item in cart_items:
-        
-        orderitem = {
-          'order': order.id,
-          'menuitem': cart_item.menuitem.id,
-          'quantity': cart_item.quantity,
-          'unit_price': cart_item.unit_price,
-          'price': cart_item.price,
-        }
-        
-        serialized_item = OrderItemsSerializer(data=orderitem)
-        if serialized_item.is_valid(raise_exception=True):
-          serialized_item.save()
-        
-        cart_item.delete()
+      
+      order_items = [
+        OrderItem(
+          order=order,
+          menuitem_id=cart_item['menuitem_id'],
+          quantity=cart_item['quantity'],
+          unit_price=cart_item['unit_price'],
+          price=cart_item['price'],
+        )
+        for cart_item in cart_lines
+      ]
+      
+      OrderItem.objects.bulk_create(order_items)
+      record_order_sales(order, cart_lines)
+      cart_items.delete()
+      clear_cart_summary(request.user)
         
-      return Response({'message': 'Order and order items has been created!'}, status.HTTP_201_CREATED)
-    
-    else:
-      return Response({'message': 'This user has 0 items in cart!'}, status.HTTP_404_NOT_FOUND)
+    return Response({'message': 'Order and order items has been created!'}, status.HTTP_201_CREATED)
   
   
 # Supporting function for order_view
-def calculate_total(cart_items):
-  total = Decimal(0)
-  for item in cart_items:
-    total += item.price
-  return total
+# The total is the sum of the cart lines copied to the order items, so the amount charged always matches
+# them, whatever the stored cart summary says (a cart edited in the admin does not update it).
+# Prices are summed as Decimal and rounded to cents so the total fits Order.total
+def calculate_total(cart_lines):
+  return sum((Decimal(str(line['price'])) for line in cart_lines), Decimal(0)).quantize(Decimal('0.01'))
 
 
 
@@ -467,50 +683,114 @@ def calculate_total(cart_items):
 def order_items_view(request):
   
   if (request.method == 'GET'):
-    order_items = OrderItem.objects.select_related('order', 'menuitem').filter(order__user=request.user).all()
+    fields = requested_fields(OrderHistoryItemsSerializerGet, request.query_params)
+    order_items = OrderHistoryItemsSerializerGet.setup_eager_loading(OrderHistoryItem.objects.filter(order__user=request.user), fields)
+    order_items = read_rows(OrderHistoryItemsSerializerGet, order_items, fields)
     
     if order_items:
       
-      serialized_item = OrderItemsSerializerGet(order_items, many=True)
-      return Response(serialized_item.data, status.HTTP_200_OK)
+      return Response(render_rows(OrderHistoryItemsSerializerGet, order_items, fields), status.HTTP_200_OK)
     
     return Response({'message': 'You have not created any orders!'}, status.HTTP_404_NOT_FOUND)
     
     
     
 
+# ENSURE YOU PERFORM ALL TESTS WITH INSOMNIA INSTEAD OF THE WEB BROWSER
+# Automatic delivery crew assignment
+# Managers assign every unassigned open order to the delivery crew in one go, balancing the number of
+# open orders per crew member. An optional limit assigns only the oldest orders:
+# limit: 100
+# http://127.0.0.1:8000/api/orders/assign
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def order_assign_view(request):
+  if not request_roles(request).is_manager:
+    return Response({'message': 'You are not authorized!'}, status.HTTP_401_UNAUTHORIZED)
+  
+  try:
+    limit = int(request.data.get('limit') or 0)
+  except (TypeError, ValueError):
+    return Response({'message': 'limit must be an integer'}, status.HTTP_400_BAD_REQUEST)
+  
+  try:
+    with transaction.atomic():
+      assignments = auto_assign_orders(max(limit, 0))
+  except DispatchError as error:
+    return Response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
+  
+  assigned = sum(len(order_ids) for username, order_ids, load in assignments)
+  if not assigned:
+    return Response({'message': 'There are no unassigned orders!'}, status.HTTP_404_NOT_FOUND)
+  
+  return Response({
+    'assigned': assigned,
+    'delivery_crew': [
+      {'delivery_crew': username, 'orders': order_ids, 'open_orders': load}
+      for username, order_ids, load in assignments
+    ],
+  }, status.HTTP_200_OK)
+    
+    
+    
+
+# ENSURE YOU PERFORM ALL TESTS WITH INSOMNIA INSTEAD OF THE WEB BROWSER
+# Bulk order status update
+# Delivery crew can update the status of the orders assigned to them, managers the status of any order
+# Payload:
+# orders: [4, 5, 6]
+# status: 1 or 0
+# Every id gets a result: updated, not_assigned_to_you or not_found
+# http://127.0.0.1:8000/api/orders/status
+
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated])
+def order_status_view(request):
+  user_role = request_roles(request)
+  if not (user_role.is_manager or user_role.is_delivery_crew):
+    return Response({'message': 'You are not authorized!'}, status.HTTP_401_UNAUTHORIZED)
+  
+  try:
+    order_ids, order_status = parse_status_update(request.data)
+  except DispatchError as error:
+    return Response({'message': str(error)}, status.HTTP_400_BAD_REQUEST)
+  
+  with transaction.atomic():
+    results = update_order_status(order_ids, order_status, crew=None if user_role.is_manager else request.user)
+  
+  return Response({
+    'status': order_status,
+    'updated': sum(result == 'updated' for result in results.values()),
+    'results': [{'id': order_id, 'result': result} for order_id, result in results.items()],
+  }, status.HTTP_200_OK)
+    
+    
+    
+
 # ENSURE YOU PERFORM ALL TESTS WITH INSOMNIA INSTEAD OF THE WEB BROWSER
 # Order items single view
 # View and edit individual order item belonging to logged in/authenticated user
+# Archived orders (see LittleLemonAPI/archive.py) can be viewed but not edited or deleted
 # http://127.0.0.1:8000/api/orders/6
 
 class SingleOrderView(APIView):
   permission_classes = [IsAuthenticated]
   
   def user_permission(self):
-    is_manager = self.request.user.groups.filter(name='Manager').exists()
-    is_delivery_crew = self.request.user.groups.filter(name='Delivery crew').exists()
-    is_admin = self.request.user.is_superuser
-    is_customer = (is_manager == False and is_delivery_crew == False and is_admin == False)
-    
-    user_role = {
-      'is_manager': is_manager,
-      'is_delivery_crew': is_delivery_crew,
-      'is_admin': is_admin,
-      'is_customer': is_customer,
-    }
-    
-    return dotdict(user_role)
+    return request_roles(self.request)
     
   def get(self, request, pk):
-    order = get_object_or_404(Order, pk=pk)
+    serializer_class = order_serializer_class(request.query_params)
+    fields = requested_fields(serializer_class, request.query_params)
+    order = get_object_or_404(order_detail_queryset(serializer_class, fields), pk=pk)
     
     user_role = self.user_permission()
     
-    if (user_role.is_customer) and (order.user != request.user):
-      return Response({'message': 'You are a customer and this order does not belong to you'}, status.HTTP_401_UNAUTHORIZED)
+    if order_hidden_from(request.user, user_role, order):
+      return Response({'message': ORDER_NOT_OWNED_MESSAGE}, status.HTTP_401_UNAUTHORIZED)
     else: 
-      serialized_item = OrderSerializerGet(order)
+      serialized_item = serializer_class(order, fields=fields)
       return Response(serialized_item.data, status.HTTP_200_OK)
     
 
@@ -531,7 +811,7 @@ class SingleOrderView(APIView):
     user_role = self.user_permission()
     
     if (user_role.is_customer) and (order.user != request.user):
-      return Response({'message': 'You are a customer and this order does not belong to you'}, status.HTTP_401_UNAUTHORIZED)
+      return Response({'message': ORDER_NOT_OWNED_MESSAGE}, status.HTTP_401_UNAUTHORIZED)
     elif (user_role.is_delivery_crew):
       return Response({'message': request.method + ' method not allowed for Delivery crew'}, status.HTTP_405_METHOD_NOT_ALLOWED)
     elif ('delivery_crew' not in request.data.keys()):
@@ -604,7 +884,48 @@ class SingleOrderView(APIView):
       user_role = self.user_permission()
       if (user_role.is_manager):
         item = get_object_or_404(Order, pk=pk)
+        # The pre_delete receiver of Order takes its sales out of the rollups
         item.delete()
         return Response({'message': 'Order has been deleted!'}, status.HTTP_200_OK)
     
-      return Response({'message': 'You are not authorized!'}, status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+      return Response({'message': 'You are not authorized!'}, status.HTTP_401_UNAUTHORIZED)
+
+
+
+# Sales report for managers, read from the daily rollup tables only
+# http://127.0.0.1:8000/api/reports/sales
+# Revenue per day (default), per day and menu item or per day and category over a date range:
+# http://127.0.0.1:8000/api/reports/sales?by=menuitem&from=2023-03-01&to=2023-03-31
+# The range defaults to the last 30 days and spans at most SALES_REPORT_MAX_DAYS days
+
+SALES_REPORTS = {
+  'day': (DailySales, DailySalesSerializer, ('date',)),
+  'menuitem': (DailyMenuItemSales, DailyMenuItemSalesSerializer, ('date', '-revenue', 'menuitem_id')),
+  'category': (DailyCategorySales, DailyCategorySalesSerializer, ('date', '-revenue', 'category_id')),
+}
+SALES_REPORT_DEFAULT_DAYS = 30
+SALES_REPORT_MAX_DAYS = 366
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sales_report_view(request):
+  if not request_roles(request).is_manager:
+    return Response({'message': 'You are not authorized!'}, status.HTTP_401_UNAUTHORIZED)
+  
+  by = request.query_params.get('by', 'day')
+  if by not in SALES_REPORTS:
+    return Response({'message': 'by must be one of ' + ', '.join(SALES_REPORTS)}, status.HTTP_400_BAD_REQUEST)
+  
+  try:
+    date_to = date.fromisoformat(request.query_params['to']) if request.query_params.get('to') else date.today()
+    date_from = date.fromisoformat(request.query_params['from']) if request.query_params.get('from') else date_to - timedelta(days=SALES_REPORT_DEFAULT_DAYS - 1)
+  except ValueError:
+    return Response({'message': 'from and to must be dates formatted as YYYY-MM-DD'}, status.HTTP_400_BAD_REQUEST)
+  
+  if (date_to - date_from).days >= SALES_REPORT_MAX_DAYS:
+    return Response({'message': 'from and to must span at most %d days' % SALES_REPORT_MAX_DAYS}, status.HTTP_400_BAD_REQUEST)
+  
+  model, serializer_class, ordering = SALES_REPORTS[by]
+  fields = requested_fields(serializer_class, request.query_params)
+  rows = serializer_class.setup_eager_loading(model.objects.filter(date__range=(date_from, date_to)), fields).order_by(*ordering)
+  return Response(render_rows(serializer_class, read_rows(serializer_class, rows, fields), fields), status.HTTP_200_OK)